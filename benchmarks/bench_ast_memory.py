@@ -0,0 +1,74 @@
+"""
+bench_ast_memory.py
+
+Measures how much memory parsed ASTs take compared with the data they
+describe: one big list literal and a long multi-statement script.
+
+Run from the repository root:
+    python -m benchmarks.bench_ast_memory
+"""
+
+import sys
+import tracemalloc
+from src.lexer import lex
+from src.parser import Parser
+
+
+def measure(build):
+    """Return (result, bytes still allocated by build())"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def payload_size(values):
+    """Bytes of the plain Python list the literal denotes"""
+    return sys.getsizeof(values) + sum(sys.getsizeof(v) for v in values)
+
+
+def count_nodes(node):
+    seen, stack = 0, [node]
+    while stack:
+        n = stack.pop()
+        seen += 1
+        for attr in ("values", "statements"):
+            children = getattr(n, attr, None)
+            if isinstance(children, list):
+                stack.extend(children)
+        for attr in ("first", "second", "target", "left", "right", "expr", "action"):
+            child = getattr(n, attr, None)
+            if child is not None and hasattr(child, "debug_info"):
+                stack.append(child)
+    return seen
+
+
+def bench_list_literal(n):
+    values = [i * 0.5 for i in range(n)]
+    text = "set data to [" + ", ".join(str(v) for v in values) + "]"
+    tokens = lex(text)
+    node, size = measure(lambda: Parser(tokens).parse())
+    data = payload_size(values)
+    print(f"list literal n={n:>7}: AST {size / 1024:9.1f} KiB, data {data / 1024:9.1f} KiB, "
+          f"ratio {size / data:5.2f}x, {size / count_nodes(node):6.1f} B/node")
+
+
+def bench_script(lines):
+    text = "\n".join(f"set v{i} to sum [{i}, {i + 1}, {i + 2}] * 2" for i in range(lines))
+    tokens = lex(text)
+    node, size = measure(lambda: Parser(tokens).parse())
+    print(f"script lines={lines:>6}: AST {size / 1024:9.1f} KiB, {count_nodes(node):7d} nodes, "
+          f"{size / count_nodes(node):6.1f} B/node")
+
+
+def main():
+    for n in (1_000, 10_000, 100_000):
+        bench_list_literal(n)
+    for lines in (100, 1_000, 10_000):
+        bench_script(lines)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+bench_compiler.py
+
+Re-runs small commands with changing variable values, interpreted with
+Interpreter.eval versus compiled once with compiler.compile_ast.
+
+Run from the repository root:
+    python -m benchmarks.bench_compiler
+"""
+
+import timeit
+from src.compiler import compile_ast
+from src.interpreter import Interpreter
+from src.lexer import lex
+from src.parser import Parser
+
+COMMANDS = [
+    "set y to (x + 2) * 3 - x / 4",
+    "if x > 10 then set y to x * 2",
+    "set y to sum [x, x + 1, x + 2, x * 3]",
+    "map add x over [1, 2, 3, 4] then reduce sum over _",
+    "filter > 7 over [x, 5, 10, x + 15, 20]",
+]
+
+
+def main(runs=20_000):
+    interp = Interpreter()
+    interp._log_resolution = lambda node: None # keep the output readable
+    for text in COMMANDS:
+        node = Parser(lex(text)).parse()
+        program = compile_ast(node)
+
+        def interpreted():
+            for x in range(runs):
+                interp.vars["x"] = x
+                interp.eval(node)
+
+        def compiled():
+            for x in range(runs):
+                interp.vars["x"] = x
+                program(interp)
+
+        t0 = min(timeit.repeat(interpreted, number=1, repeat=3))
+        t1 = min(timeit.repeat(compiled, number=1, repeat=3))
+        print(f"{text:55} eval {t0 / runs * 1e6:6.2f} us | compiled {t1 / runs * 1e6:6.2f} us "
+              f"({t0 / t1:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+bench_compute_backends.py
+
+Times the compute operations and the map/filter kernels on a
+million-element dataset with the pure Python backend and the NumPy backend, both for a Python list (a variable
+holding data) and for a packed list literal (array-backed NumericVectorNode).
+
+Run from the repository root:
+    python -m benchmarks.bench_compute_backends
+"""
+
+import random
+import timeit
+from array import array
+from src import ast
+from src.backends import NumpyBackend, PythonBackend, np
+from src.interpreter import Interpreter
+
+OPS = ["OP_SUM", "OP_MEAN", "OP_MAX", "OP_MIN", "OP_PRODUCT", "OP_SORT_ASC"]
+
+
+def best(fn, repeat=3):
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def report(label, slow, listed, viewed):
+    print(f"{label:18} python {slow * 1e3:8.2f} ms | numpy list {listed * 1e3:8.2f} ms "
+          f"({slow / listed:5.1f}x) | numpy packed {viewed * 1e3:8.2f} ms ({slow / viewed:6.1f}x)")
+
+
+def main(n=1_000_000):
+    if np is None:
+        print("numpy is not installed")
+        return
+    rng = random.Random(0)
+    datasets = {
+        "float": [rng.uniform(0.999, 1.001) for _ in range(n)],
+        "int": [rng.randint(0, 10**6) for _ in range(n)],
+    }
+    python, fast = Interpreter(PythonBackend()), Interpreter(NumpyBackend())
+    for kind, values in datasets.items():
+        packed = array("d" if kind == "float" else "q", values)
+        for op in OPS:
+            if kind == "int" and op == "OP_PRODUCT":
+                continue # a million-digit Python int; NumPy declines it anyway
+            slow = best(lambda: python.apply_compute(op, values))
+            listed = best(lambda: fast.apply_compute(op, values))
+            viewed = best(lambda: fast.apply_compute(op, packed))
+            report(f"{kind:5} {op}", slow, listed, viewed)
+
+        threshold = sorted(values)[n // 2]
+        kernels = {
+            "map add": lambda interp, v: interp.apply_map(ast.MapNode("add", 2.0, None), v),
+            "map divide": lambda interp, v: interp.apply_map(ast.MapNode("divide", 3.0, None), v),
+            "filter >": lambda interp, v: interp.apply_filter(ast.FilterNode(">", None, None), v, threshold),
+        }
+        for label, run in kernels.items():
+            slow = best(lambda: run(python, values))
+            listed = best(lambda: run(fast, values))
+            viewed = best(lambda: run(fast, packed))
+            report(f"{kind:5} {label}", slow, listed, viewed)
+
+
+if __name__ == "__main__":
+    main()
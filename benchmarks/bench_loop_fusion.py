@@ -0,0 +1,55 @@
+"""
+bench_loop_fusion.py
+
+Time and peak memory of a map/filter/reduce pipeline evaluated stage by
+stage versus as one fused loop (optimizer.fuse_loops).
+
+Run from the repository root:
+    python -m benchmarks.bench_loop_fusion
+"""
+
+import random
+import time
+import tracemalloc
+from src.backends import PythonBackend
+from src.interpreter import Interpreter
+from src.lexer import lex
+from src.optimizer import optimize
+from src.parser import Parser
+
+PIPELINES = [
+    "map add 2 over map multiply 3 over filter > 5 in data then reduce sum over _",
+    "map subtract 1 over map divide 2 over map add 2 over map multiply 3 over filter > 5 in data",
+]
+
+
+def measure(interp, node):
+    start = time.perf_counter()
+    interp.eval(node)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start() # traced separately: tracing slows evaluation down
+    interp.eval(node)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(n=1_000_000):
+    rng = random.Random(0)
+    values = [rng.uniform(0, 10) for _ in range(n)]
+    for text in PIPELINES:
+        node = Parser(lex(text)).parse()
+        fused = optimize(node)
+        print(text)
+        for backend in (PythonBackend(), None):
+            interp = Interpreter(backend)
+            interp.vars["data"] = values
+            interp._log_resolution = lambda node: None # keep the output readable
+            t0, m0 = measure(interp, node)
+            t1, m1 = measure(interp, fused)
+            print(f"  {interp.backend.name:6}: staged {t0 * 1e3:7.1f} ms {m0 / 2**20:7.1f} MiB peak | "
+                  f"fused {t1 * 1e3:7.1f} ms {m1 / 2**20:7.1f} MiB peak")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+bench_numeric_vector.py
+
+Memory of a stored dataset and time of repeated operations on it, held as a
+plain list of Python numbers versus as a packed NumericVector (what
+'set <name> to ...' now stores).
+
+Run from the repository root:
+    python -m benchmarks.bench_numeric_vector
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+from src.backends import PythonBackend
+from src.interpreter import Interpreter
+from src.lexer import lex
+from src.parser import Parser
+from src.vector import NumericVector
+
+COMMANDS = ["sum (data)", "max (data)", "sort data", "map multiply 3 over data then reduce sum over _"]
+
+
+def stored_size(make):
+    tracemalloc.start()
+    value = make()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def best_of(interp, node, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        interp.eval_value(node)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(n=1_000_000):
+    rng = random.Random(0)
+    source = [rng.randint(0, 10**6) for _ in range(n)]
+    values, list_size = stored_size(lambda: [float(x) for x in source])
+    vector, vector_size = stored_size(lambda: NumericVector.pack(values))
+    print(f"stored {n} floats: list {list_size / 2**20:6.1f} MiB | "
+          f"NumericVector {vector_size / 2**20:6.1f} MiB ({list_size / vector_size:.1f}x smaller)")
+
+    for text in COMMANDS:
+        node = Parser(lex(text)).parse()
+        print(text)
+        for backend in (PythonBackend(), None):
+            interp = Interpreter(backend)
+            interp._log_resolution = lambda node: None # keep the output readable
+            interp.vars["data"] = values
+            t_list = best_of(interp, node)
+            interp.vars["data"] = vector
+            t_vector = best_of(interp, node)
+            print(f"  {interp.backend.name:6}: list {t_list * 1e3:7.1f} ms | "
+                  f"vector {t_vector * 1e3:7.1f} ms ({t_list / t_vector:.1f}x)")
+
+
+if __name__ == "__main__":
+    sys.set_int_max_str_digits(0)
+    main()
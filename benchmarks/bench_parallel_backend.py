@@ -0,0 +1,55 @@
+"""
+bench_parallel_backend.py
+
+Times sum, max, map and filter on a large packed vector with the serial
+NumPy backend and with ParallelBackend (one chunk per CPU core). The first
+parallel run also copies the vector into shared memory; later runs reuse it.
+
+Run from the repository root:
+    python -m benchmarks.bench_parallel_backend
+"""
+
+import os
+import time
+from src.backends import NumpyBackend, ParallelBackend, np
+from src.interpreter import Interpreter
+from src.lexer import lex
+from src.parser import Parser
+from src.vector import NumericVector
+
+COMMANDS = ["sum (data)", "max (data)", "map multiply 3 over data", "filter > 0.5 over data"]
+
+
+def best_of(interp, node, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        interp.eval_value(node)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(n=20_000_000):
+    if np is None:
+        print("numpy is not installed")
+        return
+    data = NumericVector(np.random.default_rng(0).random(n))
+    parallel = ParallelBackend()
+    print(f"{n} floats, {parallel.workers} workers ({os.cpu_count()} CPUs)")
+    try:
+        for text in COMMANDS:
+            node = Parser(lex(text)).parse()
+            timings = []
+            for backend in (NumpyBackend(), parallel):
+                interp = Interpreter(backend)
+                interp._log_resolution = lambda node: None # keep the output readable
+                interp.vars["data"] = data
+                timings.append(best_of(interp, node))
+            serial, fast = timings
+            print(f"{text:26} serial {serial * 1e3:8.1f} ms | parallel {fast * 1e3:8.1f} ms ({serial / fast:.1f}x)")
+    finally:
+        parallel.close()
+
+
+if __name__ == "__main__":
+    main()
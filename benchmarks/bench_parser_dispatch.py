@@ -0,0 +1,78 @@
+"""
+bench_parser_dispatch.py
+
+Compares command dispatch through the generated LL(1) tables with the
+hand-written if-chain it replaced, and the cost of generating the tables
+from the grammar against loading them from the disk cache.
+
+Run from the repository root:
+    python -m benchmarks.bench_parser_dispatch
+"""
+
+import tempfile
+import timeit
+from src import grammar
+from src.lexer import lex
+from src.parser import Parser
+
+
+class IfChainParser(Parser):
+    """The pre-table command dispatch, for comparison"""
+
+    def parse_single_command(self):
+        c = self.cur()
+        if c.type == "SET":
+            return self.parse_assign()
+        if c.type == "IF":
+            return self.parse_if()
+        if c.type == "PRINT":
+            return self.parse_print()
+        if c.type == "MAP":
+            return self.parse_map()
+        if c.type == "REDUCE":
+            return self.parse_reduce()
+        if c.type == "FILTER":
+            return self.parse_filter()
+        if c.type == "SORT":
+            return self.parse_sort()
+        return self.parse_compute_command()
+
+
+SCRIPT_LINES = [
+    "set x{i} to ({i} + 2) * -3 - sum [1, 2, {i}]",
+    "if x{i} > 2 then print x{i}",
+    "sort [{i}, 3, 1] descending",
+    "map add {i} over [1, 2, 3] then reduce sum over _",
+    "filter > {i} over [1, 5, 10]",
+    "sum of [{i}, 1]",
+]
+
+
+def bench_parse(parser_cls, tokens, repeat):
+    return min(timeit.repeat(lambda: parser_cls(tokens, track_spans=False).parse(),
+                             number=1, repeat=repeat))
+
+
+def bench_tables(repeat=20):
+    cold = min(timeit.repeat(lambda: grammar.build_tables(grammar.read_grammar()),
+                             number=1, repeat=repeat))
+    with tempfile.TemporaryDirectory() as cache_dir:
+        grammar.CACHE_DIR = cache_dir
+        grammar.load_tables()
+        warm = min(timeit.repeat(grammar.load_tables, number=1, repeat=repeat))
+    print(f"tables: generate {cold * 1e3:7.2f} ms, load cached {warm * 1e3:7.2f} ms")
+
+
+def main():
+    bench_tables()
+    for lines in (600, 6_000):
+        text = "\n".join(SCRIPT_LINES[i % len(SCRIPT_LINES)].format(i=i) for i in range(lines))
+        tokens = lex(text)
+        table = bench_parse(Parser, tokens, 5)
+        chain = bench_parse(IfChainParser, tokens, 5)
+        print(f"script lines={lines:>6}: tables {table * 1e3:8.2f} ms, "
+              f"if-chain {chain * 1e3:8.2f} ms, ratio {chain / table:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+bench_pipeline.py
+
+Times a long 'then' pipeline of elementwise stages ending in a reduction,
+streamed (the default: one pass, no intermediate lists) and run stage by
+stage with Interpreter(profile=True), then prints the per-stage profile.
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline
+"""
+
+import random
+import time
+from src.backends import PythonBackend
+from src.interpreter import Interpreter
+from src.lexer import lex
+from src.parser import Parser
+
+PIPELINE = ("map multiply 3 over data then filter > 0.5 over _ then map add 1 over _ "
+            "then map divide 2 over _ then filter < 2 over _ then map subtract 1 over _ "
+            "then reduce sum over _")
+
+
+def best_of(interp, node, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        interp.eval_value(node)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(n=1_000_000):
+    rng = random.Random(0)
+    data = [rng.random() for _ in range(n)]
+    node = Parser(lex(PIPELINE)).parse()
+    print(f"{len(node.stages)} stages over {n} floats")
+    timings = []
+    for profile in (False, True):
+        interp = Interpreter(PythonBackend(), profile=profile)
+        interp._log_resolution = lambda node: None # keep the output readable
+        interp.vars["data"] = data
+        timings.append(best_of(interp, node))
+    streamed, staged = timings
+    print(f"streamed {streamed * 1e3:8.1f} ms | stage by stage {staged * 1e3:8.1f} ms ({staged / streamed:.1f}x)")
+    for record in interp.profiles[-1]:
+        print(f"  {record.stage.source_text():28} {record.seconds * 1e3:8.1f} ms {record.rows:>9} rows")
+
+
+if __name__ == "__main__":
+    main()
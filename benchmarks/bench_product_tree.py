@@ -0,0 +1,51 @@
+"""
+bench_product_tree.py
+
+Times 'product' over lists of random ints with the product tree now used
+by Interpreter._compute_product against the previous left-to-right loop,
+for 10^4 to 10^6 elements. The loop is quadratic in the result's digit
+count, so it is skipped for the largest size.
+
+Run from the repository root:
+    python -m benchmarks.bench_product_tree
+"""
+
+import random
+import time
+from src.backends import PythonBackend
+from src.interpreter import Interpreter
+
+LOOP_MAX_SIZE = 100_000
+
+
+def left_to_right(values):
+    prod = 1
+    for x in values:
+        prod *= x
+    return prod
+
+
+def timed(fn, values):
+    start = time.perf_counter()
+    result = fn(values)
+    return result, time.perf_counter() - start
+
+
+def main(sizes=(10_000, 100_000, 1_000_000)):
+    rng = random.Random(0)
+    interp = Interpreter(PythonBackend())
+    for n in sizes:
+        values = [rng.randint(2, 10**6) for _ in range(n)]
+        tree, t_tree = timed(lambda v: interp.apply_compute("OP_PRODUCT", v), values)
+        line = f"n={n:>9}: {tree.bit_length():>10} bits | product tree {t_tree:8.3f} s"
+        if n <= LOOP_MAX_SIZE:
+            loop, t_loop = timed(left_to_right, values)
+            assert loop == tree
+            line += f" | loop {t_loop:8.3f} s ({t_loop / t_tree:.0f}x)"
+        else:
+            line += " | loop skipped (quadratic)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+bench_summation.py
+
+Accuracy and throughput of the summation algorithms (see summation.py) on
+adversarial float inputs, through 'sum (data)' with the pure Python backend
+and, for pairwise summation, the NumPy backend. The error is measured in
+units in the last place (ulps) of the exact sum, computed with fractions.
+
+Run from the repository root:
+    python -m benchmarks.bench_summation
+"""
+
+import math
+import random
+import time
+from fractions import Fraction
+from src.backends import NumpyBackend, PythonBackend, np
+from src.interpreter import Interpreter
+from src.lexer import lex
+from src.parser import Parser
+from src.summation import SUMMATION_ALGORITHMS
+
+
+def inputs(n, rng):
+    return {
+        "cancelling 1e16, 1, -1e16": [1e16, 1.0, -1e16] * (n // 3),
+        "mixed magnitudes": [rng.uniform(-1, 1) * 10**rng.randint(-12, 12) for _ in range(n)],
+        "one large, many small": [1e12] + [rng.uniform(0, 1e-4) for _ in range(n - 1)],
+        "repeated 0.1": [0.1] * n,
+    }
+
+
+def ulps(value, exact):
+    return abs(Fraction(value) - exact) / Fraction(math.ulp(float(exact)) or math.ulp(0.0))
+
+
+def timed(interp, node, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = interp.eval(node)
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main(n=1_000_000):
+    rng = random.Random(0)
+    node = Parser(lex("sum (data)")).parse()
+    configs = [(name, PythonBackend()) for name in SUMMATION_ALGORITHMS]
+    if np is not None:
+        configs.append(("pairwise", NumpyBackend()))
+    for label, values in inputs(n, rng).items():
+        exact = sum(map(Fraction, values), Fraction(0))
+        print(f"{label} ({len(values)} floats)")
+        for name, backend in configs:
+            interp = Interpreter(backend, summation=name)
+            interp._log_resolution = lambda node: None # keep the output readable
+            interp.vars["data"] = values
+            result, seconds = timed(interp, node)
+            print(f"  {name:8} {backend.name:6}: error {float(ulps(result, exact)):12.1f} ulps | "
+                  f"{len(values) / seconds / 1e6:7.1f} M elements/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,96 @@
-
 # ast.py
+from array import array
+
 class ASTNode:
+    # Nodes use __slots__ (no per-instance __dict__); optional metadata
+    # dicts are only allocated when something is actually stored.
+    __slots__ = ("_debug_info", "_span")
+
     def __init__(self):
-        self.debug_info = {} # Stores visualizer/debugger metadata like source text
+        self._debug_info = None
+        self._span = None # (start, end, source text) recorded by the parser
+
+    def set_span(self, start, end, source):
+        self._span = (start, end, source)
+
+    @property
+    def span(self):
+        """(start, end) character offsets of the node's source, if tracked"""
+        return self._span[:2] if self._span else None
+
+    def source_text(self):
+        """Source text of the node, sliced from the input only when asked for"""
+        if not self._span:
+            return None
+        start, end, source = self._span
+        return source[start:end].strip()
+
+    @property
+    def debug_info(self):
+        """Visualizer/debugger metadata like source text"""
+        if self._debug_info is None:
+            self._debug_info = {}
+        if self._span and 'source' not in self._debug_info:
+            self._debug_info['source'] = self.source_text()
+        return self._debug_info
+
+    @debug_info.setter
+    def debug_info(self, value):
+        self._debug_info = value
+
+
+class OperationNode(ASTNode):
+    """Base for nodes whose operator may come from phrase/LLM resolution."""
+    __slots__ = ("op", "is_llm_resolved", "_llm_metadata")
+
+    def __init__(self, op, is_llm_resolved=False, llm_metadata=None):
+        super().__init__()
+        self.op = op
+        self.is_llm_resolved = is_llm_resolved
+        self._llm_metadata = llm_metadata or None
+
+    @property
+    def llm_metadata(self):
+        """Resolution metadata (original phrase, source, reasoning)"""
+        if self._llm_metadata is None:
+            self._llm_metadata = {}
+        return self._llm_metadata
+
+    @llm_metadata.setter
+    def llm_metadata(self, value):
+        self._llm_metadata = value
 
 
 class CommandNode(ASTNode):
+    __slots__ = ("cmd",)
     def __init__(self, cmd):
+        super().__init__()
         self.cmd = cmd
     def __repr__(self):
         return f"CommandNode({self.cmd})"
 
-class ComputeNode(ASTNode):
+class ComputeNode(OperationNode):
+    __slots__ = ("target",)
     def __init__(self, op, target, is_llm_resolved=False, llm_metadata=None):
-        self.op = op  # canonical op, e.g., OP_SUM
+        super().__init__(op, is_llm_resolved, llm_metadata)  # canonical op, e.g., OP_SUM
         self.target = target
-        self.is_llm_resolved = is_llm_resolved
-        self.llm_metadata = llm_metadata or {}
     def __repr__(self):
         llm_flag = " [LLM]" if self.is_llm_resolved else ""
         return f"ComputeNode({self.op}, {self.target}){llm_flag}"
 
 class AssignNode(ASTNode):
+    __slots__ = ("varname", "expr")
     def __init__(self, varname, expr):
+        super().__init__()
         self.varname = varname
         self.expr = expr
     def __repr__(self):
         return f"AssignNode({self.varname}, {self.expr})"
 
 class IfNode(ASTNode):
+    __slots__ = ("left", "comp", "right", "action")
     def __init__(self, left, comp, right, action):
+        super().__init__()
         self.left = left
         self.comp = comp
         self.right = right
@@ -38,31 +99,83 @@ class IfNode(ASTNode):
         return f"IfNode({self.left} {self.comp} {self.right} then {self.action})"
 
 class PrintNode(ASTNode):
+    __slots__ = ("expr",)
     def __init__(self, expr):
+        super().__init__()
         self.expr = expr
     def __repr__(self):
         return f"PrintNode({self.expr})"
 
 class ListNode(ASTNode):
+    __slots__ = ("values",)
     def __init__(self, values):
+        super().__init__()
         self.values = values
     def __repr__(self):
         return f"ListNode({self.values})"
 
+class NumericVectorNode(ListNode):
+    """
+    All-constant numeric list literal packed into an array buffer
+    ('q' for int64, 'd' for float64) instead of one NumberNode per element.
+    """
+    __slots__ = ()
+    def __init__(self, values):
+        super().__init__(values)
+    @property
+    def typecode(self):
+        return self.values.typecode
+    def __repr__(self):
+        shown = ", ".join(str(v) for v in self.values[:8])
+        more = f", ... ({len(self.values)} values)" if len(self.values) > 8 else ""
+        return f"NumericVectorNode({self.values.typecode}[{shown}{more}])"
+
+def pack_numeric(values):
+    """
+    Pack all-int or all-float values into an array('q') or array('d').
+    Returns None otherwise (mixed lists keep their exact int/float values).
+    """
+    if not values:
+        return None
+    t = type(values[0])
+    if t is not int and t is not float:
+        return None
+    if len(set(map(type, values))) != 1:
+        return None
+    typecode = "q" if t is int else "d"
+    try:
+        return array(typecode, values)
+    except OverflowError: # ints beyond int64 stay as Python ints
+        return None
+
+def list_literal(elements):
+    """ListNode for parsed elements, packed when every element is a number literal."""
+    if all(type(e) is NumberNode for e in elements):
+        packed = pack_numeric([e.value for e in elements])
+        if packed is not None:
+            return NumericVectorNode(packed)
+    return ListNode(elements)
+
 class NumberNode(ASTNode):
+    __slots__ = ("value",)
     def __init__(self, value):
+        super().__init__()
         self.value = value
     def __repr__(self):
         return f"NumberNode({self.value})"
 
 class VariableNode(ASTNode):
+    __slots__ = ("name",)
     def __init__(self, name):
+        super().__init__()
         self.name = name
     def __repr__(self):
         return f"VariableNode({self.name})"
 
 class BinaryOpNode(ASTNode):
+    __slots__ = ("left", "op", "right")
     def __init__(self, left, op, right):
+        super().__init__()
         self.left = left
         self.op = op
         self.right = right
@@ -70,37 +183,148 @@ class BinaryOpNode(ASTNode):
         return f"BinaryOpNode({self.left} {self.op} {self.right})"
 
 class FilterNode(ASTNode):
+    __slots__ = ("op", "value", "target")
     def __init__(self, op, value, target):
+        super().__init__()
         self.op = op
         self.value = value
         self.target = target
     def __repr__(self):
         return f"FilterNode({self.op}, {self.value}, {self.target})"
 
-class MapNode(ASTNode):
+class MapNode(OperationNode):
+    __slots__ = ("arg", "target")
     def __init__(self, op, arg, target, is_llm_resolved=False, llm_metadata=None):
-        self.op = op  # canonical or operation name
+        super().__init__(op, is_llm_resolved, llm_metadata)  # canonical or operation name
         self.arg = arg
         self.target = target
-        self.is_llm_resolved = is_llm_resolved
-        self.llm_metadata = llm_metadata or {}
     def __repr__(self):
         llm_flag = " [LLM]" if self.is_llm_resolved else ""
         return f"MapNode({self.op}, {self.arg}, {self.target}){llm_flag}"
 
-class ReduceNode(ASTNode):
+class ReduceNode(OperationNode):
+    __slots__ = ("target",)
     def __init__(self, op, target, is_llm_resolved=False, llm_metadata=None):
-        self.op = op
+        super().__init__(op, is_llm_resolved, llm_metadata)
         self.target = target
-        self.is_llm_resolved = is_llm_resolved
-        self.llm_metadata = llm_metadata or {}
     def __repr__(self):
         llm_flag = " [LLM]" if self.is_llm_resolved else ""
         return f"ReduceNode({self.op}, {self.target}){llm_flag}"
 
 class SequenceNode(ASTNode):
+    __slots__ = ("first", "second")
     def __init__(self, first, second):
+        super().__init__()
         self.first = first
         self.second = second
     def __repr__(self):
         return f"SequenceNode({self.first} then {self.second})"
+
+class PipelineNode(ASTNode):
+    __slots__ = ("stages",)
+    def __init__(self, stages):
+        super().__init__()
+        self.stages = stages  # three or more commands joined by 'then', in order
+    def __repr__(self):
+        return f"PipelineNode({' then '.join(map(str, self.stages))})"
+
+class ProgramNode(ASTNode):
+    __slots__ = ("statements",)
+    def __init__(self, statements):
+        super().__init__()
+        self.statements = statements  # newline- or ';'-separated commands, in order
+    def __repr__(self):
+        return f"ProgramNode({self.statements})"
+
+class FusedLoopNode(ASTNode):
+    """
+    A chain of map/filter stages (and an optional final reduce/compute)
+    over one source, produced by the optimizer's loop fusion. Evaluated in a
+    single pass without materializing the intermediate lists.
+
+    stages: ("map", kind, arg) / ("filter", comparator, value node), in order
+    sink:   None (the result is the list), ("reduce", kind) or ("compute", op)
+    logged: the original operation nodes, in evaluation order, whose
+            resolution info is reported when the loop starts
+    after:  those of stages after a 'then', reported once the loop has its
+            result (as they would be after the first half had run)
+    """
+    __slots__ = ("source", "stages", "sink", "logged", "after")
+    def __init__(self, source, stages, sink=None, logged=(), after=()):
+        super().__init__()
+        self.source = source
+        self.stages = stages
+        self.sink = sink
+        self.logged = list(logged)
+        self.after = list(after)
+    def __repr__(self):
+        return f"FusedLoopNode({self.source}, {self.stages}, {self.sink})"
+
+class FoldedNode(ASTNode):
+    """
+    A subtree replaced by its value by the optimizer's constant folding.
+
+    value:  the constant node (NumberNode, NumericVectorNode or ListNode)
+    logged: the folded operation nodes, in evaluation order, whose
+            resolution info is still reported when the node is evaluated
+    """
+    __slots__ = ("value", "logged")
+    def __init__(self, value, logged=()):
+        super().__init__()
+        self.value = value
+        self.logged = list(logged)
+    def __repr__(self):
+        return f"FoldedNode({self.value})"
+
+class RewrittenNode(ASTNode):
+    """
+    A two-operation chain ('B over A over x', or 'A over x then B over _')
+    replaced by one of the optimizer's algebraic rewrite rules.
+
+    The operand is evaluated once. fast(interp, value) computes the chain's
+    result directly, or returns NotImplemented when the rule's run-time
+    precondition (element types, emptiness, ...) does not hold; the original
+    operations then run on the value.
+
+    rule:    name of the rule that fired
+    operand: the innermost target (x)
+    steps:   (operation node, after_then) pairs, innermost first
+    logged:  operation nodes whose resolution info is reported before the
+             operand is evaluated
+    """
+    __slots__ = ("rule", "operand", "steps", "logged", "fast")
+    def __init__(self, rule, operand, steps, logged, fast):
+        super().__init__()
+        self.rule = rule
+        self.operand = operand
+        self.steps = list(steps)
+        self.logged = list(logged)
+        self.fast = fast
+    def __repr__(self):
+        return f"RewrittenNode({self.rule}, {self.operand})"
+
+class SharedNode(ASTNode):
+    """
+    One occurrence of a pure subexpression that appears more than once
+    (see optimizer.eliminate_common_subexpressions). All occurrences share
+    a slot: the first one evaluated stores its value, the others reuse it
+    and only report the resolution info of their own operations (logged).
+    """
+    __slots__ = ("expr", "slot", "logged")
+    def __init__(self, expr, slot, logged=()):
+        super().__init__()
+        self.expr = expr
+        self.slot = slot
+        self.logged = list(logged)
+    def __repr__(self):
+        return f"SharedNode(#{self.slot} {self.expr})"
+
+class SharedScopeNode(ASTNode):
+    """Root of a tree holding SharedNodes: their values live for one evaluation of body"""
+    __slots__ = ("body", "slots")
+    def __init__(self, body, slots):
+        super().__init__()
+        self.body = body
+        self.slots = slots
+    def __repr__(self):
+        return f"SharedScopeNode({self.body})"
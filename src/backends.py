@@ -0,0 +1,548 @@
+"""
+backends.py
+
+Execution backends for the Interpreter's compute operations (sum, mean,
+product, max, min, sort) and its map/filter kernels.
+
+PythonBackend keeps the original pure-Python behaviour. NumpyBackend runs
+the operations on contiguous int64/float64 arrays: validation is a single
+dtype check instead of an isinstance test per element, and packed values
+(NumericVectors and list literals) are viewed without copying. List and
+sort results come back as NumericVectors backed by the result arrays. NumPy
+is an optional dependency; without it the Python backend is used.
+ParallelBackend (opt-in) additionally splits very large NumericVectors
+across a process pool.
+
+A backend's compute()/map()/filter() return NotImplemented for input they
+do not handle (small lists, non-numeric data, ints that could overflow
+int64 or round in float64), and the Interpreter then falls back to its own
+Python implementation, which also owns all error reporting.
+"""
+
+import os
+import weakref
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import compress
+from multiprocessing import resource_tracker, shared_memory
+from .vector import NumericVector
+
+try:
+    import numpy as np
+except ImportError: # optional dependency
+    np = None
+
+# Below this many elements converting a Python list to an array costs more
+# than it saves
+NUMPY_MIN_SIZE = 2048
+
+# Below this many elements ParallelBackend stays serial: shipping chunks to
+# worker processes costs more than the cores save
+PARALLEL_MIN_SIZE = 1 << 22
+
+INT64_MAX = 2**63 - 1
+FLOAT_EXACT_INT = 2**53 # ints up to this convert to float64 exactly
+
+# Reduce kinds (see interpreter.REDUCE_OPS) -> equivalent compute op
+REDUCE_TO_COMPUTE = {"sum": "OP_SUM", "product": "OP_PRODUCT", "max": "OP_MAX", "min": "OP_MIN"}
+
+
+class PythonBackend:
+    """Leaves every operation to the Interpreter's pure-Python compute_dispatch."""
+    name = "python"
+
+    def compute(self, op, values):
+        return NotImplemented
+
+    def map(self, kind, values, arg):
+        return NotImplemented
+
+    def filter(self, comp, values, threshold):
+        return NotImplemented
+
+    def fused(self, values, stages, sink):
+        return NotImplemented
+
+
+class NumpyBackend:
+    """
+    Vectorized compute operations over int64/float64 arrays.
+
+    Results match the Python implementation: integer sums and means are
+    exact (falling back to Python when int64 could overflow), max/min
+    return the original elements, and sorting keeps equal elements in input
+    order. Float sums and products use NumPy's reductions, which can differ
+    in the last bits on long lists from a left-to-right loop and from
+    summation.pairwise_sum, whose blocking is not NumPy's: pairwise float
+    sums are rounded the backend's way (see summation.py).
+    """
+    name = "numpy"
+
+    # Timsort on a list is as fast as converting it first, so sorting is only
+    # vectorized for packed arrays
+    PACKED_ONLY = frozenset({"OP_SORT_ASC", "OP_SORT_DESC"})
+
+    def __init__(self, min_size: int = NUMPY_MIN_SIZE):
+        if np is None:
+            raise ImportError("NumpyBackend requires numpy")
+        self.min_size = min_size
+        self._ops = {
+            "OP_SUM": self._sum,
+            "OP_MEAN": self._mean,
+            "OP_PRODUCT": self._product,
+            "OP_MAX": self._max,
+            "OP_MIN": self._min,
+            "OP_SORT_ASC": self._sort_asc,
+            "OP_SORT_DESC": self._sort_desc,
+        }
+        self._map_kernels = {
+            "add": np.add, "subtract": np.subtract,
+            "multiply": np.multiply, "divide": np.true_divide,
+        }
+        self._comparators = {
+            ">": np.greater, "<": np.less, "==": np.equal,
+            "!=": np.not_equal, ">=": np.greater_equal, "<=": np.less_equal,
+        }
+
+    def as_array(self, values):
+        """int64/float64 view or copy of values, or None if they are not suitable"""
+        if isinstance(values, NumericVector):
+            if len(values) < self.min_size:
+                return None # already validated; plain Python is faster on short vectors
+            values = values.data
+        if isinstance(values, array):
+            if values.typecode == "q":
+                return np.frombuffer(values, dtype=np.int64)
+            if values.typecode == "d":
+                return np.frombuffer(values, dtype=np.float64)
+            return None
+        if isinstance(values, np.ndarray):
+            arr = values
+        elif isinstance(values, list) and len(values) >= self.min_size:
+            try:
+                arr = np.array(values)
+            except (OverflowError, ValueError):
+                return None
+        else:
+            return None
+        if arr.ndim != 1 or arr.dtype not in (np.int64, np.float64):
+            return None # strings, bools, big ints (object), ...
+        if arr.dtype == np.float64 and isinstance(values, list) and not (np.abs(arr) < FLOAT_EXACT_INT).all():
+            # A mixed list: its ints may not convert to float64 exactly
+            if any(type(x) is int and abs(x) > FLOAT_EXACT_INT for x in values):
+                return None
+        return arr
+
+    def compute(self, op, values):
+        handler = self._ops.get(op)
+        if handler is None or len(values) == 0:
+            return NotImplemented
+        if op in self.PACKED_ONLY and isinstance(values, list):
+            return NotImplemented
+        arr = self.as_array(values)
+        if arr is None:
+            return NotImplemented
+        return handler(arr, values)
+
+    def map(self, kind, values, arg):
+        """Elementwise 'add'/'subtract'/'multiply'/'divide' by arg, as a NumericVector"""
+        arr = self.as_array(values)
+        if arr is None:
+            return NotImplemented
+        out = self._map_array(kind, arr, arg, isinstance(values, list))
+        return NotImplemented if out is None else NumericVector(out)
+
+    def filter(self, comp, values, threshold):
+        """Elements x with 'x <comp> threshold', via one boolean mask"""
+        arr = self.as_array(values)
+        if arr is None:
+            return NotImplemented
+        mask = self._filter_mask(comp, arr, threshold)
+        if mask is None:
+            return NotImplemented
+        if isinstance(values, list):
+            return list(compress(values, mask.tolist())) # keep the original elements
+        return NumericVector(arr[mask])
+
+    def fused(self, values, stages, sink):
+        """
+        Run a fused map/filter chain and its sink on a packed array. Stages
+        work on arrays, so no Python list is built until the final result.
+        Lists are left to the Interpreter's streaming loop, which keeps
+        their element types.
+        """
+        if isinstance(values, list):
+            return NotImplemented
+        arr = self.as_array(values)
+        if arr is None:
+            return NotImplemented
+        for kind, op, operand in stages:
+            if kind == "map":
+                if op == "divide" and operand == 0:
+                    return NotImplemented # raised by the Python loop, if any element gets there
+                arr = self._map_array(op, arr, operand)
+            else:
+                mask = self._filter_mask(op, arr, operand)
+                arr = None if mask is None else arr[mask]
+            if arr is None:
+                return NotImplemented
+        if sink is None:
+            return NumericVector(arr)
+        kind, op = sink
+        return self.compute(REDUCE_TO_COMPUTE[op] if kind == "reduce" else op, arr)
+
+    def _map_array(self, kind, arr, arg, from_list=False):
+        kernel = self._map_kernel(kind, arr, arg, from_list)
+        return None if kernel is None else kernel(arr, arg)
+
+    def _map_kernel(self, kind, arr, arg, from_list=False):
+        """The ufunc computing 'arr <kind> arg' exactly as Python would, or None"""
+        kernel = self._map_kernels.get(kind)
+        if kernel is None or type(arg) not in (int, float):
+            return None
+        if type(arg) is int:
+            if arr.dtype == np.float64:
+                if from_list:
+                    return None # may hold ints, which int arithmetic keeps as ints
+            else:
+                # int64 results must not overflow, and true division must not round the operands
+                bound = _bound(arr) if len(arr) else 0
+                if kind == "divide":
+                    exact = bound <= FLOAT_EXACT_INT and abs(arg) <= FLOAT_EXACT_INT
+                elif kind == "multiply":
+                    exact = bound * abs(arg) <= INT64_MAX
+                else:
+                    exact = bound + abs(arg) <= INT64_MAX
+                if not exact:
+                    return None
+        return kernel
+
+    def _filter_mask(self, comp, arr, threshold):
+        ufunc = self._comparator(comp, arr, threshold)
+        return None if ufunc is None else ufunc(arr, threshold)
+
+    def _comparator(self, comp, arr, threshold):
+        """The ufunc comparing arr to threshold exactly as Python would, or None"""
+        ufunc = self._comparators.get(comp)
+        if ufunc is None or type(threshold) not in (int, float):
+            return None
+        # Python compares ints and floats exactly; NumPy converts to float64 first
+        if arr.dtype == np.int64:
+            if type(threshold) is int:
+                exact = abs(threshold) <= INT64_MAX
+            else:
+                exact = len(arr) == 0 or _bound(arr) <= FLOAT_EXACT_INT
+        else:
+            exact = type(threshold) is float or abs(threshold) <= FLOAT_EXACT_INT
+        return ufunc if exact else None
+
+    # --- operations: arr is the numeric view, values the original sequence ---
+
+    def _int_sum(self, arr):
+        """Exact int64 sum, or None if it could overflow"""
+        if _bound(arr) * len(arr) > INT64_MAX:
+            return None
+        return int(arr.sum())
+
+    def _sum(self, arr, values):
+        if arr.dtype == np.int64:
+            total = self._int_sum(arr)
+            return NotImplemented if total is None else total
+        return float(arr.sum())
+
+    def _mean(self, arr, values):
+        total = self._sum(arr, values)
+        if total is NotImplemented:
+            return NotImplemented
+        return total / len(arr)
+
+    def _product(self, arr, values):
+        if arr.dtype == np.int64:
+            return NotImplemented # Python ints never overflow
+        return float(arr.prod())
+
+    def _pick(self, arr, values, i):
+        # The original element, so an int in a mixed list stays an int
+        return values[i] if isinstance(values, (list, array)) else arr[i].item()
+
+    def _max(self, arr, values):
+        return self._pick(arr, values, _extreme_index(arr, "max"))
+
+    def _min(self, arr, values):
+        return self._pick(arr, values, _extreme_index(arr, "min"))
+
+    def _sort_kind(self, arr):
+        # Equal int64/float64 values are indistinguishable, so the faster
+        # unstable sort gives the same result; the exception is 0.0 vs -0.0
+        if arr.dtype == np.float64:
+            zeros = arr == 0
+            if zeros.any() and np.signbit(arr[zeros]).any():
+                return "stable"
+        return "quicksort"
+
+    def _sort_asc(self, arr, values):
+        return NumericVector(np.sort(arr, kind=self._sort_kind(arr)))
+
+    def _sort_desc(self, arr, values):
+        kind = self._sort_kind(arr)
+        if kind == "stable":
+            # Stable descending order: sort the reversed array ascending, then reverse
+            return NumericVector(np.sort(arr[::-1], kind=kind)[::-1])
+        return NumericVector(np.sort(arr, kind=kind)[::-1])
+
+
+class ParallelBackend(NumpyBackend):
+    """
+    NumpyBackend that runs sum, mean, product, max, min, map and filter on
+    NumericVectors of at least parallel_min_size elements in chunks, one per
+    worker process.
+
+    A vector is copied once into a multiprocessing.shared_memory block that
+    the workers map by name, so no element data is pickled; vectors are
+    immutable, so the block is reused until the vector is garbage collected.
+    Partial sums, products and extrema are combined in chunk order (max/min
+    keep the first occurrence, as argmax does). Mapped and filtered chunks
+    are written into a shared output block at their own offsets and
+    concatenated in order.
+
+    Results match NumpyBackend, except that float sums and products are
+    combined per chunk, which changes their rounding in the last bits just
+    as NumPy's pairwise summation does. Int sums are always exact: a chunk
+    that could overflow int64 is summed with Python ints. Smaller vectors,
+    lists, sorts and fused loops run serially.
+    """
+    name = "parallel"
+
+    PARALLEL_OPS = {"OP_SUM": "sum", "OP_MEAN": "sum", "OP_PRODUCT": "product",
+                    "OP_MAX": "max", "OP_MIN": "min"}
+
+    def __init__(self, workers=None, min_size: int = NUMPY_MIN_SIZE,
+                 parallel_min_size: int = PARALLEL_MIN_SIZE):
+        super().__init__(min_size)
+        self.workers = workers or os.cpu_count() or 1
+        self.parallel_min_size = parallel_min_size
+        self._pool = None # started on first use
+        # id(vector data) -> (weakref to the data, its SharedMemory block)
+        self._segments = {}
+        self._finalizer = weakref.finalize(self, _release_segments, self._segments)
+
+    def close(self):
+        """Stop the worker processes and free the shared memory blocks"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        _release_segments(self._segments)
+
+    def compute(self, op, values):
+        kind = self.PARALLEL_OPS.get(op)
+        if kind is not None and self._is_large(values):
+            arr = self.as_array(values)
+            if kind != "product" or arr.dtype == np.float64: # int products need Python ints
+                partials = self._run(_reduce_chunk, arr, values, kind)
+                if partials is not None:
+                    result = _combine(kind, partials)
+                    return result / len(arr) if op == "OP_MEAN" else result
+        return super().compute(op, values)
+
+    def map(self, kind, values, arg):
+        if self._is_large(values):
+            arr = self.as_array(values)
+            kernel = self._map_kernel(kind, arr, arg)
+            if kernel is not None:
+                out_dtype = kernel(arr[:1], arg).dtype
+                out = self._run_into(_map_chunk, arr, values, out_dtype, kernel.__name__, arg)
+                if out is not None:
+                    return NumericVector(out)
+        return super().map(kind, values, arg)
+
+    def filter(self, comp, values, threshold):
+        if self._is_large(values):
+            arr = self.as_array(values)
+            ufunc = self._comparator(comp, arr, threshold)
+            if ufunc is not None:
+                out = self._run_into(_filter_chunk, arr, values, arr.dtype, ufunc.__name__, threshold)
+                if out is not None:
+                    return NumericVector(out)
+        return super().filter(comp, values, threshold)
+
+    def _is_large(self, values):
+        return isinstance(values, NumericVector) and len(values) >= max(self.parallel_min_size, 1)
+
+    def _chunks(self, n):
+        k = min(self.workers, n)
+        return [(i * n // k, (i + 1) * n // k) for i in range(k)]
+
+    def _segment(self, arr, values):
+        """Name of the shared block holding the vector's elements"""
+        data = values.data
+        key = id(data)
+        entry = self._segments.get(key)
+        if entry is not None and entry[0]() is data:
+            return entry[1].name
+        shm = shared_memory.SharedMemory(create=True, size=arr.nbytes)
+        _view(shm, arr.dtype, len(arr))[:] = arr
+        segments = self._segments
+        ref = weakref.ref(data, lambda ref: _release_segment(segments, key, ref))
+        segments[key] = (ref, shm)
+        return shm.name
+
+    def _submit(self, fn, tasks):
+        """Results of fn(*task) for each task, in order, or None if the pool failed"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers)
+        try:
+            futures = [self._pool.submit(fn, *task) for task in tasks]
+            return [future.result() for future in futures]
+        except BrokenProcessPool:
+            self._pool = None
+            return None
+
+    def _run(self, fn, arr, values, *args):
+        """Partial results of fn over each chunk of the vector"""
+        try:
+            name = self._segment(arr, values)
+        except OSError: # no shared memory available
+            return None
+        n, dtype = len(arr), arr.dtype.str
+        return self._submit(fn, [(name, dtype, n, start, stop, *args) for start, stop in self._chunks(n)])
+
+    def _run_into(self, fn, arr, values, out_dtype, *args):
+        """
+        Run fn over each chunk, writing into a shared output block; fn returns
+        how many elements it wrote at the start of its chunk's range. The
+        chunks' outputs are concatenated into a new array.
+        """
+        try:
+            out_shm = shared_memory.SharedMemory(create=True, size=max(len(arr), 1) * 8)
+        except OSError:
+            return None
+        out_dtype = np.dtype(out_dtype)
+        try:
+            counts = self._run(fn, arr, values, out_shm.name, out_dtype.str, *args)
+            if counts is None:
+                return None
+            out = _view(out_shm, out_dtype, len(arr))
+            result = np.concatenate([out[start:start + count]
+                                     for (start, _), count in zip(self._chunks(len(arr)), counts)])
+            del out
+            return result
+        finally:
+            out_shm.close()
+            out_shm.unlink()
+
+
+# --- ParallelBackend workers: module level, so worker processes can import them ---
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError: # Python < 3.13 registers every attachment for cleanup
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _view(shm, dtype, n):
+    return np.ndarray((n,), dtype=dtype, buffer=shm.buf)
+
+
+def _reduce_chunk(name, dtype, n, start, stop, kind):
+    """sum, product, max or min of the chunk"""
+    shm = _attach(name)
+    chunk = _view(shm, dtype, n)[start:stop]
+    if kind == "sum":
+        if chunk.dtype == np.int64 and _bound(chunk) * len(chunk) > INT64_MAX:
+            result = sum(chunk.tolist())
+        else:
+            result = chunk.sum().item()
+    elif kind == "product":
+        result = chunk.prod().item()
+    else:
+        # Only the vector's first element is max()'s starting point, so a
+        # later chunk's leading NaN is skipped like any other
+        result = chunk[_extreme_index(chunk, kind, nan_first=start == 0)].item()
+    del chunk
+    shm.close()
+    return result
+
+
+def _map_chunk(name, dtype, n, start, stop, out_name, out_dtype, ufunc, arg):
+    shm, out_shm = _attach(name), _attach(out_name)
+    chunk = _view(shm, dtype, n)[start:stop]
+    out = _view(out_shm, out_dtype, n)[start:stop]
+    getattr(np, ufunc)(chunk, arg, out=out)
+    del chunk, out
+    shm.close()
+    out_shm.close()
+    return stop - start
+
+
+def _filter_chunk(name, dtype, n, start, stop, out_name, out_dtype, ufunc, threshold):
+    shm, out_shm = _attach(name), _attach(out_name)
+    chunk = _view(shm, dtype, n)[start:stop]
+    kept = chunk[getattr(np, ufunc)(chunk, threshold)]
+    count = len(kept)
+    _view(out_shm, out_dtype, n)[start:start + count] = kept
+    del chunk, kept
+    shm.close()
+    out_shm.close()
+    return count
+
+
+def _combine(kind, partials):
+    """Combine per-chunk results in chunk order"""
+    if kind == "sum":
+        return sum(partials)
+    if kind == "product":
+        result = 1.0
+        for p in partials:
+            result *= p
+        return result
+    # Like max()/min() over the whole vector: the first chunk's partial is
+    # NaN only if the first element is, and NaN never replaces the best so far
+    best = partials[0]
+    for value in partials[1:]:
+        if value > best if kind == "max" else value < best:
+            best = value
+    return best
+
+
+def _release_segment(segments, key, ref):
+    entry = segments.get(key)
+    if entry is not None and entry[0] is ref:
+        del segments[key]
+        entry[1].close()
+        entry[1].unlink()
+
+
+def _release_segments(segments):
+    for _, shm in segments.values():
+        shm.close()
+        shm.unlink()
+    segments.clear()
+
+
+def _extreme_index(arr, kind, nan_first=True):
+    """
+    Index of the element max()/min() picks from a non-empty array: the first
+    extreme one. NaN compares false either way, so the builtins skip it
+    except as the first element, which then stays the result (unless
+    nan_first is False). An all-NaN array gives its first element.
+    """
+    i = int(arr.argmax() if kind == "max" else arr.argmin())
+    if arr.dtype == np.float64 and arr[i] != arr[i]: # argmax/argmin stop at the first NaN
+        if (nan_first and i == 0) or np.isnan(arr).all():
+            return i
+        i = int(np.nanargmax(arr) if kind == "max" else np.nanargmin(arr))
+    return i
+
+
+def _bound(arr):
+    """Largest absolute value in a non-empty int64 array"""
+    return max(abs(int(arr.min())), abs(int(arr.max())))
+
+
+def default_backend():
+    """NumpyBackend when numpy is installed, else PythonBackend"""
+    return NumpyBackend() if np is not None else PythonBackend()
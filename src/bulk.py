@@ -0,0 +1,109 @@
+"""
+bulk.py
+
+Parsing of many independent one-line commands (nightly validation jobs)
+sharded across a process pool. Workers lex, parse and resolve phrases
+locally; a phrase that needs the LLM is not sent from the worker but
+deferred to the parent, which resolves each distinct phrase once and
+re-parses only the commands that needed it.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+from .lexer import lex
+from .llm_layer import resolve_phrase_llm
+from .parser import Parser, ParseError
+
+DEFAULT_CHUNKSIZE = 256
+
+
+class PhraseDeferred(Exception):
+    """Raised inside a worker when a phrase needs the LLM"""
+    def __init__(self, phrase):
+        super().__init__(phrase)
+        self.phrase = phrase
+
+
+def _defer(phrase):
+    raise PhraseDeferred(phrase)
+
+
+class PhraseMemo:
+    """
+    LLM resolver that asks about each distinct phrase only once.
+    Phrases are compared case- and whitespace-insensitively.
+    """
+
+    def __init__(self, resolver: Optional[Callable] = None):
+        self.resolver = resolver or resolve_phrase_llm
+        self.cache: Dict[str, object] = {}
+
+    def __call__(self, phrase):
+        key = " ".join(phrase.lower().split())
+        if key not in self.cache:
+            self.cache[key] = self.resolver(phrase)
+        return self.cache[key]
+
+
+def _parse_one(text, track_spans, as_results, resolver):
+    """('ok', AST or ParseResult) | ('err', ParseError) | ('defer', phrase)"""
+    parser = Parser(lex(text), track_spans=track_spans, llm_resolver=resolver)
+    try:
+        if as_results:
+            return ("ok", parser.parse_result())
+        return ("ok", parser.parse())
+    except PhraseDeferred as d:
+        return ("defer", d.phrase)
+    except ParseError as e:
+        return ("err", e)
+
+
+def _parse_chunk(job):
+    texts, track_spans, as_results = job
+    return [_parse_one(text, track_spans, as_results, _defer) for text in texts]
+
+
+def parse_bulk(commands: Iterable[str], workers: Optional[int] = None,
+               chunksize: int = DEFAULT_CHUNKSIZE, as_results: bool = False,
+               track_spans: bool = False, llm_resolver: Optional[Callable] = None) -> List:
+    """
+    Parse independent commands in parallel and return their ASTs in input order.
+
+    With as_results=True each entry is a ParseResult instead and failures do
+    not raise; otherwise the first failing command (in input order) raises
+    its ParseError. Commands are sent to workers in chunks of `chunksize`;
+    input that fits in one chunk, or workers=1, is parsed in-process.
+    llm_resolver replaces the LLM call for unresolved phrases (it is wrapped
+    in a PhraseMemo, so it sees each distinct phrase once).
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+    commands = list(commands)
+    jobs = [(commands[i:i + chunksize], track_spans, as_results)
+            for i in range(0, len(commands), chunksize)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        chunks = [_parse_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            chunks = list(pool.map(_parse_chunk, jobs))
+
+    # Centralized LLM fallback: resolve each deferred phrase once, then
+    # re-parse the commands that needed one (they may defer further phrases,
+    # which the memo resolves on the spot)
+    memo = PhraseMemo(llm_resolver)
+    outcomes = [outcome for chunk in chunks for outcome in chunk]
+    for status, value in outcomes:
+        if status == "defer":
+            memo(value)
+
+    out = []
+    for text, (status, value) in zip(commands, outcomes):
+        if status == "defer":
+            status, value = _parse_one(text, track_spans, as_results, memo)
+        if status == "err":
+            raise value
+        out.append(value)
+    return out
@@ -0,0 +1,411 @@
+"""
+compiler.py
+
+Closure compilation: turns an AST once into a tree of Python closures, with
+node dispatch, operators, comparators and op-name lookups resolved at
+compile time. A compiled program is reusable: it reads variables from the
+Interpreter it is run with, so commands that are re-run with different
+variable values skip the interpretive overhead of Interpreter.eval.
+
+Compiled closures call their children directly, so Python recursion grows
+with tree depth. Subtrees deeper than MAX_COMPILED_DEPTH are left to
+Interpreter.eval, which walks them with an explicit stack.
+"""
+
+import operator
+from array import array
+from time import perf_counter
+from . import ast
+from .interpreter import COMPARATORS, MAP_OPS, REDUCE_OPS, SemanticError, is_piped
+from .optimizer import children
+from .lazy import Stream
+from .vector import NumericVector, to_plain
+
+MAX_COMPILED_DEPTH = 200
+
+BINARY_OPS = {"+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv}
+
+
+class CompiledProgram:
+    """A compiled AST; call it with an Interpreter to run it."""
+
+    def __init__(self, node, fn):
+        self.node = node
+        self._fn = fn
+
+    def __call__(self, interp):
+        return to_plain(self._fn(interp))
+
+    def __repr__(self):
+        return f"CompiledProgram({self.node})"
+
+
+def compile_ast(node) -> CompiledProgram:
+    """Compile node into a reusable CompiledProgram"""
+    return CompiledProgram(node, _compile(node))
+
+
+def _compile(root):
+    """Post-order over the tree with an explicit stack: (closure, depth) per node"""
+    stack = [(root, False)]
+    done = []
+    while stack:
+        node, expanded = stack.pop()
+        kids = children(node)
+        if not expanded:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(kids))
+            continue
+        compiled = done[len(done) - len(kids):] if kids else []
+        if kids:
+            del done[len(done) - len(kids):]
+        depth = 1 + max((d for _, d in compiled), default=0)
+        if depth > MAX_COMPILED_DEPTH:
+            fn, depth = _interpreted(node), 1
+        else:
+            builder = BUILDERS.get(type(node), _build_interpreted)
+            fn = builder(node, *[f for f, _ in compiled])
+        done.append((fn, depth))
+    return done[0][0]
+
+
+def _interpreted(node):
+    def run(interp):
+        return interp.eval_value(node)
+    return run
+
+
+def _build_interpreted(node, *children_fns):
+    # Node types without a builder (and their errors) stay with the Interpreter
+    return _interpreted(node)
+
+
+def _target(node, target_fn):
+    """Packed list literals are handed to compute/map/filter without unpacking"""
+    if type(node.target) is ast.NumericVectorNode:
+        vector = NumericVector(node.target.values)
+        return lambda interp: vector
+    return target_fn
+
+
+# --- Builders: node plus compiled children -> closure --------------------
+
+def _build_number(node):
+    value = node.value
+    return lambda interp: value
+
+
+def _build_variable(node):
+    name = node.name
+    def run(interp):
+        try:
+            return interp.vars[name]
+        except KeyError:
+            raise SemanticError(f"Undefined variable: {name}") from None
+    return run
+
+
+def _build_list(node, *value_fns):
+    return lambda interp: [f(interp) for f in value_fns]
+
+
+def _build_numeric_vector(node):
+    vector = NumericVector(node.values)
+    return lambda interp: vector
+
+
+def _build_binary_op(node, left, right):
+    op = BINARY_OPS.get(node.op)
+    if op is None:
+        message = "Unknown binary op: "+str(node.op)
+        def fail(interp):
+            left(interp); right(interp)
+            raise SemanticError(message)
+        return fail
+    return lambda interp: op(left(interp), right(interp))
+
+
+def _build_assign(node, expr):
+    name = node.varname
+    def run(interp):
+        val = expr(interp)
+        if isinstance(val, Stream):
+            val = val.materialize()
+        if type(val) is list:
+            val = NumericVector.pack(val) or val
+        interp.vars[name] = val
+        if interp.shared:
+            interp.shared.clear()
+        return val
+    return run
+
+
+def _build_print(node, expr):
+    def run(interp):
+        val = expr(interp)
+        print(to_plain(val))
+        return val
+    return run
+
+
+def _build_compute(node, target):
+    op = node.op
+    is_sort = isinstance(op, str) and "SORT" in op
+    target = _target(node, target)
+    def run(interp):
+        interp._log_resolution(node)
+        return interp.compute_values(op, target(interp), is_sort)
+    return run
+
+
+def _build_map(node, target):
+    op = node.op
+    kind = MAP_OPS.get(str(op).lower())
+    arg = node.arg
+    target = _target(node, target)
+    if isinstance(arg, str):
+        def run(interp):
+            interp._log_resolution(node)
+            tval = target(interp)
+            return interp.map_values(kind, interp.vars.get(arg, arg), tval, op)
+    else:
+        def run(interp):
+            interp._log_resolution(node)
+            return interp.map_values(kind, arg, target(interp), op)
+    return run
+
+
+def _build_reduce(node, target):
+    op = node.op
+    kind = REDUCE_OPS.get(str(op).lower())
+    def run(interp):
+        interp._log_resolution(node)
+        return interp.reduce_values(kind, target(interp), op)
+    return run
+
+
+def _build_filter(node, value, target):
+    op = node.op
+    cmp = COMPARATORS.get(op)
+    packed = type(node.target) is ast.NumericVectorNode
+    target = _target(node, target)
+    def run(interp):
+        target_val = target(interp)
+        if not packed and not isinstance(target_val, (list, NumericVector, Stream)):
+            raise SemanticError(f"Filter target must be a list, got {target_val}")
+        return interp.filter_values(op, cmp, target_val, value(interp))
+    return run
+
+
+def _build_if(node, left, right, action):
+    cmp = COMPARATORS.get(node.comp)
+    if cmp is None:
+        comp = node.comp
+        cmp = lambda l, r: _unknown_comparator(comp)
+    def run(interp):
+        if cmp(left(interp), right(interp)):
+            return action(interp)
+        return None
+    return run
+
+
+def _unknown_comparator(comp):
+    raise SemanticError("Unknown comparator: "+str(comp))
+
+
+def _build_sequence(node, first, second):
+    return _build_stages([node.first, node.second], [first, second], streaming=False)
+
+
+def _build_pipeline(node, *stage_fns):
+    return _build_stages(node.stages, stage_fns)
+
+
+def _build_stages(stages, stage_fns, streaming=True):
+    """Commands joined by 'then', run as Interpreter.run_stages runs them"""
+    steps = []
+    for i, (stage, fn) in enumerate(zip(stages, stage_fns)):
+        feeds = streaming and i + 1 < len(stages) and is_piped(stages[i + 1])
+        if i and is_piped(stage):
+            # 'A then B over _': B runs on A's value
+            steps.append((stage, fn, _build_stage(stage), True, feeds))
+        elif feeds and type(stage) in (ast.MapNode, ast.FilterNode):
+            # Streams its result into the next stage
+            target = _target(stage, compile_ast(stage.target)._fn)
+            steps.append((stage, fn, _build_stage(stage, target), False, True))
+        else:
+            steps.append((stage, fn, None, False, False))
+
+    def run(interp):
+        if interp.profile:
+            return profiled(interp)
+        value = None
+        for _, fn, apply, piped, stream in steps:
+            if apply is None:
+                value = fn(interp)
+                continue
+            value = apply(interp, value, stream)
+            if piped and streaming and not stream and not interp.lazy and isinstance(value, Stream):
+                value = value.materialize()
+        return value
+
+    def profiled(interp):
+        records = []
+        value = None
+        for stage, fn, apply, piped, _ in steps:
+            start = perf_counter()
+            value = apply(interp, value, False) if piped else fn(interp)
+            value = interp._profile_stage(records, stage, value, start)
+        interp.profiles.append(records)
+        return value
+    return run
+
+
+def _build_stage(stage, target=None):
+    """
+    (interp, value, stream) -> result, for a stage of a 'then' chain: value
+    is the previous stage's, or, if target is given, target's value is used
+    instead (see Interpreter.feed_stage)
+    """
+    if isinstance(stage, ast.FilterNode):
+        op = stage.op
+        cmp = COMPARATORS.get(op)
+        comp_value = compile_ast(stage.value)._fn
+        def apply(interp, tval, stream):
+            if target is not None:
+                tval = target(interp)
+            if not isinstance(tval, (list, NumericVector, Stream)):
+                raise SemanticError(f"Filter target must be a list, got {tval}")
+            return interp.filter_values(op, cmp, tval, comp_value(interp), stream)
+        return apply
+    op = stage.op
+    if isinstance(stage, ast.ComputeNode):
+        is_sort = isinstance(op, str) and "SORT" in op
+        def apply(interp, tval, stream):
+            interp._log_resolution(stage)
+            return interp.compute_values(op, interp.composition_target(tval), is_sort)
+    elif isinstance(stage, ast.MapNode):
+        kind, arg = MAP_OPS.get(str(op).lower()), stage.arg
+        def apply(interp, tval, stream):
+            interp._log_resolution(stage)
+            tval = interp.composition_target(tval, True) if target is None else target(interp)
+            resolved = interp.vars.get(arg, arg) if isinstance(arg, str) else arg
+            return interp.map_values(kind, resolved, tval, op, stream)
+    else:
+        kind = REDUCE_OPS.get(str(op).lower())
+        def apply(interp, tval, stream):
+            interp._log_resolution(stage)
+            return interp.reduce_values(kind, interp.composition_target(tval, True), op)
+    return apply
+
+
+def _build_program(node, *statements):
+    def run(interp):
+        result = None
+        for stmt in statements:
+            result = stmt(interp)
+        return result
+    return run
+
+
+def _build_fused(node, source):
+    stages = node.stages
+    filter_values = [compile_ast(operand)._fn if kind == "filter" else None
+                     for kind, _, operand in stages]
+    packed = type(node.source) is ast.NumericVectorNode
+    if packed:
+        vector = NumericVector(node.source.values)
+        source = lambda interp: vector
+    first_kind = stages[0][0]
+    after = node.after
+    def run(interp):
+        for op_node in node.logged:
+            interp._log_resolution(op_node)
+        values = source(interp)
+        if not packed and not isinstance(values, (list, NumericVector, Stream)):
+            if first_kind == "map":
+                raise SemanticError("Map target must be a list")
+            raise SemanticError(f"Filter target must be a list, got {values}")
+        resolved = []
+        for (kind, op, operand), value_fn in zip(stages, filter_values):
+            if value_fn is not None:
+                operand = value_fn(interp)
+            elif isinstance(operand, str) and operand in interp.vars:
+                operand = interp.vars[operand]
+            resolved.append((kind, op, operand))
+        result = interp.pipeline_values(values, resolved, node.sink)
+        for op_node in after:
+            interp._log_resolution(op_node)
+        return result
+    return run
+
+
+def _build_folded(node, value):
+    logged = node.logged
+    def run(interp):
+        for op_node in logged:
+            interp._log_resolution(op_node)
+        return value(interp)
+    return run
+
+
+def _build_rewritten(node, operand):
+    logged, steps, fast = node.logged, node.steps, node.fast
+    after = [op_node for op_node, after_then in steps if after_then]
+    def run(interp):
+        for op_node in logged:
+            interp._log_resolution(op_node)
+        value = operand(interp)
+        result = fast(interp, value)
+        if result is NotImplemented:
+            return interp.run_chain(value, steps)
+        for op_node in after:
+            interp._log_resolution(op_node)
+        return result
+    return run
+
+
+def _build_shared(node, expr):
+    slot, logged = node.slot, node.logged
+    def run(interp):
+        shared = interp.shared
+        if slot in shared:
+            for op_node in logged:
+                interp._log_resolution(op_node)
+            return shared[slot]
+        value = shared[slot] = expr(interp)
+        return value
+    return run
+
+
+def _build_shared_scope(node, body):
+    def run(interp):
+        interp.shared = {}
+        result = body(interp)
+        interp.shared = {}
+        return result
+    return run
+
+
+BUILDERS = {
+    ast.NumberNode: _build_number,
+    ast.VariableNode: _build_variable,
+    ast.ListNode: _build_list,
+    ast.NumericVectorNode: _build_numeric_vector,
+    ast.BinaryOpNode: _build_binary_op,
+    ast.AssignNode: _build_assign,
+    ast.PrintNode: _build_print,
+    ast.ComputeNode: _build_compute,
+    ast.MapNode: _build_map,
+    ast.ReduceNode: _build_reduce,
+    ast.FilterNode: _build_filter,
+    ast.IfNode: _build_if,
+    ast.SequenceNode: _build_sequence,
+    ast.PipelineNode: _build_pipeline,
+    ast.ProgramNode: _build_program,
+    ast.FusedLoopNode: _build_fused,
+    ast.FoldedNode: _build_folded,
+    ast.RewrittenNode: _build_rewritten,
+    ast.SharedNode: _build_shared,
+    ast.SharedScopeNode: _build_shared_scope,
+}
@@ -0,0 +1,344 @@
+"""
+grammar.py
+
+Token-level grammar of SpeakMath and a small LL(1) table generator for it.
+
+GRAMMAR mirrors the "Parser dispatch grammar" block in
+docs/syntax_definition.md (tests/test_grammar.py keeps the two in sync).
+From it we compute FIRST/FOLLOW sets and, for every rule, a table from the
+next token type to the alternative that handles it. The parser dispatches
+commands, targets and factors through these tables instead of chains of
+token checks. Tables are cached as JSON next to the bytecode cache and
+rebuilt whenever the grammar or the lexer's token set changes.
+
+Notation: <Rule> nonterminals, "literal" terminals (mapped to token types
+by the lexer), UPPERCASE token types, [ optional ], { repetition },
+( grouping ), | alternatives. WORD is any token that may appear in a
+natural-language phrase (everything except PHRASE_STOPS).
+
+The grammar is not strictly LL(1): a phrase can start with almost any
+keyword, and a target starting with a number is a list shorthand only if a
+comma follows. Such conflicts are resolved in favour of the alternative
+listed first and are reported in GrammarTables.conflicts.
+"""
+
+import hashlib
+import json
+import os
+import re
+from typing import Dict, FrozenSet, List, NamedTuple, Tuple
+from .lexer import TOKEN_SPEC, lex
+
+GRAMMAR = """
+<Program>            ::= { <Separator> } [ <Sequence> { <Separator> { <Separator> } <Sequence> } ] { <Separator> }
+<Separator>          ::= NEWLINE | ";"
+<Sequence>           ::= <Command> { "then" <Command> }
+<Command>            ::= <AssignCommand> | <ConditionalCommand> | <PrintCommand>
+                       | <MapCommand> | <ReduceCommand> | <FilterCommand>
+                       | <SortCommand> | <ComputeCommand>
+<AssignCommand>      ::= "set" IDENTIFIER "to" <Expression>
+<ConditionalCommand> ::= "if" <Expression> OPERATOR <Expression> "then" <Sequence>
+<PrintCommand>       ::= "print" <Target>
+<MapCommand>         ::= <MapHead> <Target>
+<ReduceCommand>      ::= <ReduceHead> <Target>
+<FilterCommand>      ::= <FilterHead> <Target>
+<SortCommand>        ::= "sort" <Target> [ IDENTIFIER ]
+<ComputeCommand>     ::= <Phrase> <Target>
+<Phrase>             ::= WORD { WORD }
+<MapHead>            ::= "map" <MapVerb> [ NUMBER | IDENTIFIER ] [ "over" ]
+<MapVerb>            ::= IDENTIFIER | "sum" | "product"
+<ReduceHead>         ::= "reduce" <ReduceVerb> [ "over" ]
+<ReduceVerb>         ::= IDENTIFIER | "sum" | "product" | "max" | "min"
+<FilterHead>         ::= "filter" OPERATOR NUMBER [ "over" | IDENTIFIER ]
+<AggregateHead>      ::= ( "sum" | "mean" | "product" | "max" | "min" ) [ "of" ]
+<Target>             ::= <List> | <ListShorthand> | <Variable> | <Expression>
+<ListShorthand>      ::= NUMBER "," <Expression> { "," <Expression> }
+<List>               ::= "[" [ <Expression> { "," <Expression> } ] "]"
+<Variable>           ::= IDENTIFIER
+<Expression>         ::= <Factor> { <BinaryOp> <Factor> }
+<BinaryOp>           ::= "+" | "-" | "*" | "/"
+<Factor>             ::= <Number> | <Variable> | <List> | <Group> | <Negation>
+                       | <Aggregate> | <FilterExpr> | <MapExpr> | <ReduceExpr>
+<Number>             ::= NUMBER
+<Group>              ::= "(" <Expression> ")"
+<Negation>           ::= "-" <Factor>
+<Aggregate>          ::= <AggregateHead> <Target>
+<FilterExpr>         ::= <FilterHead> <Target>
+<MapExpr>            ::= <MapHead> <Target>
+<ReduceExpr>         ::= <ReduceHead> <Target>
+"""
+
+START_RULE = "Program"
+
+# Tokens that end a natural-language phrase (and so never belong to WORD)
+PHRASE_STOPS = frozenset({"NUMBER", "LBRACK", "LPAREN", "EOF", "SET", "IF", "NEWLINE", "SEMI"})
+
+TOKEN_TYPES = frozenset([name for name, _ in TOKEN_SPEC if name not in ("SKIP", "UNKNOWN")] + ["EOF"])
+TOKEN_CLASSES = {"WORD": TOKEN_TYPES - PHRASE_STOPS}
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "__pycache__")
+
+
+class GrammarError(Exception):
+    pass
+
+
+class GrammarTables(NamedTuple):
+    first: Dict[str, FrozenSet[str]]
+    follow: Dict[str, FrozenSet[str]]
+    table: Dict[str, Dict[str, str]]        # rule -> token type -> alternative label
+    conflicts: List[Tuple[str, str, str, str]]  # (rule, token type, chosen, shadowed)
+
+
+# --- Grammar reader -------------------------------------------------------
+
+_SYMBOL_RE = re.compile(r'<\w+>|"[^"]*"|::=|[|\[\]{}()]|[A-Z_]+')
+
+
+def _terminal(symbol: str) -> FrozenSet[str]:
+    if symbol.startswith('"'):
+        literal = symbol[1:-1]
+        toks = lex(literal)
+        if len(toks) != 2:
+            raise GrammarError(f"Literal {symbol} does not lex to a single token")
+        return frozenset([toks[0].type])
+    if symbol in TOKEN_CLASSES:
+        return TOKEN_CLASSES[symbol]
+    if symbol not in TOKEN_TYPES:
+        raise GrammarError(f"Unknown token type {symbol}")
+    return frozenset([symbol])
+
+
+def read_grammar(text: str = GRAMMAR) -> Dict[str, tuple]:
+    """
+    Read rules into expression tuples:
+        ("alt", [seq...]), ("seq", [item...]), ("opt", e), ("rep", e),
+        ("nt", name), ("t", frozenset of token types, label)
+    """
+    rules = {}
+    for chunk in re.split(r"\n(?=\s*<\w+>\s*::=)", text.strip()):
+        symbols = _SYMBOL_RE.findall(chunk)
+        if len(symbols) < 3 or symbols[1] != "::=":
+            raise GrammarError(f"Malformed rule: {chunk.strip()}")
+        name = symbols[0][1:-1]
+        body, pos = _read_alt(symbols, 2)
+        if pos != len(symbols):
+            raise GrammarError(f"Unexpected '{symbols[pos]}' in rule <{name}>")
+        rules[name] = body
+    for name, body in rules.items():
+        for ref in _references(body):
+            if ref not in rules:
+                raise GrammarError(f"<{name}> refers to undefined <{ref}>")
+    return rules
+
+
+def _read_alt(symbols, pos):
+    alts = []
+    seq, pos = _read_seq(symbols, pos)
+    alts.append(seq)
+    while pos < len(symbols) and symbols[pos] == "|":
+        seq, pos = _read_seq(symbols, pos + 1)
+        alts.append(seq)
+    return ("alt", alts), pos
+
+
+def _read_seq(symbols, pos):
+    items = []
+    closers = {"[": "]", "{": "}", "(": ")"}
+    while pos < len(symbols) and symbols[pos] not in ("|", "]", "}", ")"):
+        sym = symbols[pos]
+        if sym in closers:
+            inner, pos = _read_alt(symbols, pos + 1)
+            if pos >= len(symbols) or symbols[pos] != closers[sym]:
+                raise GrammarError(f"Unclosed '{sym}'")
+            items.append({"[": ("opt", inner), "{": ("rep", inner), "(": inner}[sym])
+        elif sym.startswith("<"):
+            items.append(("nt", sym[1:-1]))
+        else:
+            types = _terminal(sym)
+            # Literals are labelled by their token type ("then" -> THEN)
+            label = next(iter(types)) if sym.startswith('"') else sym
+            items.append(("t", types, label))
+        pos += 1
+    return ("seq", items), pos
+
+
+def _references(expr):
+    kind = expr[0]
+    if kind == "nt":
+        yield expr[1]
+    elif kind in ("alt", "seq"):
+        for e in expr[1]:
+            yield from _references(e)
+    elif kind in ("opt", "rep"):
+        yield from _references(expr[1])
+
+
+# --- FIRST / FOLLOW ---------------------------------------------------------
+
+def _first(expr, first, nullable):
+    """(FIRST set, nullable) of an expression given the current rule sets"""
+    kind = expr[0]
+    if kind == "t":
+        return set(expr[1]), False
+    if kind == "nt":
+        return set(first[expr[1]]), nullable[expr[1]]
+    if kind in ("opt", "rep"):
+        return _first(expr[1], first, nullable)[0], True
+    if kind == "alt":
+        out, any_null = set(), False
+        for e in expr[1]:
+            f, n = _first(e, first, nullable)
+            out |= f
+            any_null = any_null or n
+        return out, any_null
+    out = set()
+    for e in expr[1]:
+        f, n = _first(e, first, nullable)
+        out |= f
+        if not n:
+            return out, False
+    return out, True
+
+
+def _walk_follow(expr, after, first, nullable, follow):
+    """Add to FOLLOW of every nonterminal in expr, given what may follow expr"""
+    kind = expr[0]
+    changed = False
+    if kind == "nt":
+        before = len(follow[expr[1]])
+        follow[expr[1]] |= after
+        changed = len(follow[expr[1]]) != before
+    elif kind == "opt":
+        changed = _walk_follow(expr[1], after, first, nullable, follow)
+    elif kind == "rep":
+        f, _ = _first(expr[1], first, nullable)
+        changed = _walk_follow(expr[1], after | f, first, nullable, follow)
+    elif kind == "alt":
+        for e in expr[1]:
+            changed |= _walk_follow(e, after, first, nullable, follow)
+    elif kind == "seq":
+        trailer = set(after)
+        for e in reversed(expr[1]):
+            changed |= _walk_follow(e, trailer, first, nullable, follow)
+            f, n = _first(e, first, nullable)
+            trailer = (trailer | f) if n else f
+    return changed
+
+
+def _label(seq):
+    """Name of an alternative: its leading nonterminal or token type"""
+    head = seq[1][0] if seq[0] == "seq" and seq[1] else seq
+    if head[0] == "nt":
+        return head[1]
+    if head[0] == "t":
+        return head[2]
+    raise GrammarError(f"Alternative must start with a symbol: {seq}")
+
+
+def build_tables(rules: Dict[str, tuple], start: str = START_RULE) -> GrammarTables:
+    first = {name: set() for name in rules}
+    nullable = {name: False for name in rules}
+    changed = True
+    while changed:
+        changed = False
+        for name, body in rules.items():
+            f, n = _first(body, first, nullable)
+            if f - first[name] or n != nullable[name]:
+                first[name] |= f
+                nullable[name] = nullable[name] or n
+                changed = True
+
+    follow = {name: set() for name in rules}
+    follow[start].add("EOF")
+    changed = True
+    while changed:
+        changed = False
+        for name, body in rules.items():
+            changed |= _walk_follow(body, set(follow[name]), first, nullable, follow)
+
+    table, conflicts = {}, []
+    for name, body in rules.items():
+        alts = body[1] if body[0] == "alt" else [body]
+        if len(alts) < 2:
+            continue
+        row = {}
+        for alt in alts:
+            label = _label(alt)
+            predict, alt_nullable = _first(alt, first, nullable)
+            if alt_nullable:
+                predict |= follow[name]
+            for tok in sorted(predict):
+                if tok in row:
+                    if row[tok] != label:
+                        conflicts.append((name, tok, row[tok], label))
+                else:
+                    row[tok] = label
+        table[name] = row
+
+    return GrammarTables(
+        {k: frozenset(v) for k, v in first.items()},
+        {k: frozenset(v) for k, v in follow.items()},
+        table,
+        conflicts,
+    )
+
+
+# --- Disk cache -------------------------------------------------------------
+
+def grammar_key(text: str = GRAMMAR) -> str:
+    """Hash of everything the tables depend on: grammar text and lexer token spec"""
+    spec = json.dumps([list(t) for t in TOKEN_SPEC] + sorted(PHRASE_STOPS))
+    return hashlib.sha256((text + spec).encode("utf-8")).hexdigest()
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, f"grammar_tables.{key[:16]}.json")
+
+
+def _to_json(tables: GrammarTables, key: str) -> dict:
+    return {
+        "key": key,
+        "first": {k: sorted(v) for k, v in tables.first.items()},
+        "follow": {k: sorted(v) for k, v in tables.follow.items()},
+        "table": tables.table,
+        "conflicts": [list(c) for c in tables.conflicts],
+    }
+
+
+def _from_json(data: dict) -> GrammarTables:
+    return GrammarTables(
+        {k: frozenset(v) for k, v in data["first"].items()},
+        {k: frozenset(v) for k, v in data["follow"].items()},
+        data["table"],
+        [tuple(c) for c in data["conflicts"]],
+    )
+
+
+def load_tables(text: str = GRAMMAR, use_cache: bool = True) -> GrammarTables:
+    """Return dispatch tables for text, from the disk cache when it is current"""
+    key = grammar_key(text)
+    path = _cache_path(key)
+    if use_cache:
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("key") == key:
+                return _from_json(data)
+        except (OSError, ValueError, KeyError):
+            pass
+
+    tables = build_tables(read_grammar(text))
+    if use_cache:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(_to_json(tables, key), f)
+            os.replace(tmp, path)
+        except OSError:
+            pass # read-only install: tables are simply rebuilt next time
+    return tables
+
+
+TABLES = load_tables()
@@ -0,0 +1,300 @@
+"""
+incremental.py
+
+Incremental re-lexing and re-parsing for editor integrations (live preview,
+syntax highlighting). Instead of re-lexing the whole command on every
+keystroke, only the tokens around an edit are re-scanned; the unchanged
+token prefix and suffix are reused, and so are the list-literal subtrees
+built from them.
+
+Tokens live in a TokenBuffer, a list of blocks whose position shifts are
+applied lazily, so an edit costs about the same however long the buffer
+is: the edit point is found by bisection, only the edited block's tokens
+are rewritten, and the suffix keeps its Token objects (and list subtrees
+keyed by them) without being copied.
+"""
+
+from bisect import bisect_right
+from typing import List, NamedTuple, Optional, Tuple
+from .lexer import LineIndex, Token, iter_tokens, lex
+from .parser import Parser, ParseError
+from . import ast
+
+# The longest token ("find the mean") spans three words, so an edit can merge
+# with at most this many preceding tokens.
+RELEX_BACKTRACK = 3
+
+# Tokens per TokenBuffer block: the most an edit rewrites outside the
+# re-scanned region
+TOKEN_BLOCK_SIZE = 256
+
+
+class TextEdit(NamedTuple):
+    """A single replacement: `deleted` characters at `offset` become `inserted`."""
+    offset: int
+    deleted: int
+    inserted: str
+
+    def apply(self, text: str) -> str:
+        return text[:self.offset] + self.inserted + text[self.offset + self.deleted:]
+
+
+class TokenBuffer:
+    """
+    Token sequence stored in blocks. Each block has a pending position shift
+    that is added to its tokens only when they are next read, so splice()
+    rewrites at most one block's worth of untouched tokens and leaves later
+    blocks (and their Token objects) in place. Like TokenList it remembers
+    its source text.
+    """
+
+    def __init__(self, tokens, source: str):
+        tokens = list(tokens)
+        self._blocks = [tokens[i:i + TOKEN_BLOCK_SIZE] for i in range(0, len(tokens), TOKEN_BLOCK_SIZE)]
+        self._starts = list(range(0, len(tokens), TOKEN_BLOCK_SIZE))  # token index of each block's first token
+        self._shifts = [0] * len(self._blocks)                         # pending position shift per block
+        self._len = len(tokens)
+        self.source = source
+        self._line_index = None
+
+    @property
+    def line_index(self) -> LineIndex:
+        if self._line_index is None:
+            self._line_index = LineIndex(self.source)
+        return self._line_index
+
+    def __len__(self):
+        return self._len
+
+    def _settle(self, k):
+        """Apply block k's pending shift and return the block"""
+        block = self._blocks[k]
+        shift = self._shifts[k]
+        if shift:
+            for tok in block:
+                tok.pos += shift
+            self._shifts[k] = 0
+        return block
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("token index out of range")
+        k = bisect_right(self._starts, i) - 1
+        return self._settle(k)[i - self._starts[k]]
+
+    def __iter__(self):
+        for k in range(len(self._blocks)):
+            yield from self._settle(k)
+
+    def find(self, offset: int) -> int:
+        """Index of the first token ending at or after offset (the last token if none does)"""
+        lo, hi = 0, len(self._blocks) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._blocks[mid][-1].end + self._shifts[mid] < offset:
+                lo = mid + 1
+            else:
+                hi = mid
+        block = self._settle(lo)
+        i, hi = 0, len(block) - 1
+        while i < hi:
+            mid = (i + hi) // 2
+            if block[mid].end < offset:
+                i = mid + 1
+            else:
+                hi = mid
+        return self._starts[lo] + i
+
+    def splice(self, start: int, stop: int, tokens: List[Token], delta: int, source: str) -> List[Token]:
+        """
+        Replace self[start:stop] by tokens, shift every later token by delta
+        and return the replaced tokens. Only the blocks holding start and
+        stop are rebuilt; later blocks just have delta added to their shift.
+        """
+        first = bisect_right(self._starts, start) - 1
+        last = bisect_right(self._starts, stop - 1) - 1 if stop > start else first
+        removed = []
+        for k in range(first, last + 1):
+            block = self._settle(k)
+            lo = max(start - self._starts[k], 0)
+            hi = min(stop - self._starts[k], len(block))
+            removed.extend(block[lo:hi])
+        head = self._blocks[first][:start - self._starts[first]]
+        tail = self._blocks[last][stop - self._starts[last]:]
+        for tok in tail:
+            tok.pos += delta
+        merged = head + tokens + tail
+        size = TOKEN_BLOCK_SIZE if len(merged) > 2 * TOKEN_BLOCK_SIZE else max(len(merged), 1)
+        pieces = [merged[i:i + size] for i in range(0, len(merged), size)]
+
+        base = self._starts[first]
+        self._blocks[first:last + 1] = pieces
+        self._shifts[first:last + 1] = [0] * len(pieces)
+        self._starts[first:last + 1] = [base + i * size for i in range(len(pieces))]
+        grown = len(tokens) - (stop - start)
+        for k in range(first + len(pieces), len(self._blocks)):
+            self._starts[k] += grown
+            self._shifts[k] += delta
+        self._len += grown
+        self.source = source
+        self._line_index = None
+        return removed
+
+
+class RelexResult(NamedTuple):
+    """
+    Token stream after an edit plus how it lines up with the one before:
+    tokens[:prefix] are the old tokens unchanged, the old tokens from
+    old_resume onwards reappear (shifted) from new_resume onwards, and
+    removed holds the old tokens in between that were replaced.
+    """
+    tokens: TokenBuffer
+    prefix: int
+    old_resume: int
+    new_resume: int
+    removed: List[Token]
+
+
+def relex(old_text: str, old_tokens, edit: TextEdit) -> RelexResult:
+    """
+    Re-lex only the region of old_text affected by edit. A TokenBuffer is
+    updated in place and returned; any other token sequence is first
+    copied into a new one.
+    """
+    if not isinstance(old_tokens, TokenBuffer):
+        old_tokens = TokenBuffer((Token(t.type, t.value, t.pos) for t in old_tokens), old_text)
+    new_text = edit.apply(old_text)
+    delta = len(edit.inserted) - edit.deleted
+    old_edit_end = edit.offset + edit.deleted
+    new_edit_end = edit.offset + len(edit.inserted)
+
+    # First token that touches the edit, then back up over tokens it could merge with
+    first = old_tokens.find(edit.offset)
+    prefix = max(0, first - RELEX_BACKTRACK)
+    start = min(old_tokens[prefix].pos, edit.offset)
+
+    # Old tokens that start after the edited region are candidates for resync
+    old_idx = prefix
+    while old_idx < len(old_tokens) - 1 and old_tokens[old_idx].pos < old_edit_end:
+        old_idx += 1
+
+    fresh = []
+    for tok in iter_tokens(new_text, start):
+        if tok.pos >= new_edit_end:
+            old_pos = tok.pos - delta
+            while old_idx < len(old_tokens) - 1 and old_tokens[old_idx].pos < old_pos:
+                old_idx += 1
+            old = old_tokens[old_idx]
+            if old.pos == old_pos and old.type == tok.type and old.value == tok.value:
+                # Both scans start a token here over identical text: the rest is unchanged
+                removed = old_tokens.splice(prefix, old_idx, fresh, delta, new_text)
+                return RelexResult(old_tokens, prefix, old_idx, prefix + len(fresh), removed)
+        fresh.append(tok)
+
+    fresh.append(Token("EOF", "", len(new_text)))
+    old_len = len(old_tokens)
+    removed = old_tokens.splice(prefix, old_len, fresh, delta, new_text)
+    return RelexResult(old_tokens, prefix, old_len, prefix + len(fresh), removed)
+
+
+class SubtreeTable:
+    """
+    List-literal subtrees keyed by their '[' token. Keys are Token objects,
+    which an edit leaves in place unless it replaces them, so nothing has
+    to be re-keyed; discard() drops the lists that held a replaced token.
+    """
+
+    def __init__(self):
+        self._trees = {}   # '[' token -> (token count, node)
+        self._owner = {}   # token -> '[' token of the innermost list holding it
+
+    def get(self, tok: Token) -> Optional[Tuple[int, ast.ASTNode]]:
+        return self._trees.get(tok)
+
+    def record(self, tokens, start: int, end: int, node: ast.ASTNode):
+        """Store the list parsed from tokens[start:end] and claim its tokens (nested lists keep theirs)"""
+        opening = tokens[start]
+        self._trees[opening] = (end - start, node)
+        i = start + 1
+        while i < end:
+            tok = tokens[i]
+            self._owner[tok] = opening
+            nested = self._trees.get(tok)
+            i += nested[0] if nested is not None else 1
+
+    def discard(self, removed: List[Token]):
+        """Forget replaced tokens and every list that contained one"""
+        for tok in removed:
+            self._trees.pop(tok, None)
+            opening = self._owner.pop(tok, None)
+            while opening is not None and self._trees.pop(opening, None) is not None:
+                opening = self._owner.get(opening)
+
+
+class IncrementalParser(Parser):
+    """Parser that reuses list-literal subtrees whose tokens did not change."""
+
+    def __init__(self, tokens, subtrees: Optional[SubtreeTable] = None):
+        super().__init__(tokens)
+        self.subtrees = subtrees if subtrees is not None else SubtreeTable()
+
+    def parse_list_bracket(self):
+        start = self.pos
+        hit = self.subtrees.get(self.tokens[start])
+        if hit is not None:
+            count, node = hit
+            self.pos = start + count
+            return node
+        node = super().parse_list_bracket()
+        if self.error is None: # a list the statement failed in is not reused
+            self.subtrees.record(self.tokens, start, self.pos, node)
+        return node
+
+
+class IncrementalDocument:
+    """
+    Text buffer that keeps its token stream (and, on demand, its AST) in sync
+    across small edits. Parsing is lazy so highlighting-only callers never pay for it.
+    """
+
+    def __init__(self, text: str = ""):
+        self.text = text
+        self.tokens = TokenBuffer(lex(text), text)
+        self._subtrees = SubtreeTable()
+        self._ast = None
+        self._error = None
+        self._parsed = False
+
+    def edit(self, offset: int, deleted: int, inserted: str) -> TokenBuffer:
+        """Apply an edit and return the updated token stream."""
+        result = relex(self.text, self.tokens, TextEdit(offset, deleted, inserted))
+        self.text = result.tokens.source
+        # List subtrees lying entirely in the untouched prefix or suffix stay valid
+        self._subtrees.discard(result.removed)
+        self._parsed = False
+        return self.tokens
+
+    def _parse(self):
+        parser = IncrementalParser(self.tokens, self._subtrees)
+        parser.set_source(self.text)
+        try:
+            self._ast, self._error = parser.parse(), None
+        except ParseError as e:
+            self._ast, self._error = None, e
+        self._parsed = True
+
+    @property
+    def ast(self) -> Optional[ast.ASTNode]:
+        """AST of the current text, or None if it does not parse"""
+        if not self._parsed:
+            self._parse()
+        return self._ast
+
+    @property
+    def error(self) -> Optional[ParseError]:
+        """Parse error of the current text, if any"""
+        if not self._parsed:
+            self._parse()
+        return self._error
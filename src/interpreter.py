@@ -1,19 +1,79 @@
 
 # interpreter.py
+import math
+import operator
+from array import array
+from itertools import chain, islice
+from time import perf_counter
+from types import GeneratorType
 from . import ast
-from typing import Any
+from .backends import REDUCE_TO_COMPUTE, default_backend
+from .lazy import Stream
+from .summation import SUMMATION_ALGORITHMS
+from .vector import NumericVector, pack_result, to_plain
+from typing import Any, NamedTuple
 
 class SemanticError(Exception):
     pass
 
+class StageProfile(NamedTuple):
+    """One stage of a 'then' chain run with Interpreter(profile=True)"""
+    stage: ast.ASTNode
+    seconds: float
+    rows: int  # length of the stage's list result; 1 for a number, 0 for None
+
+# Map op spellings (lowercased) -> elementwise operation
+MAP_OPS = {
+    **dict.fromkeys(("op_map", "map", "op_map_add", "op_sum", "add", "sum"), "add"),
+    **dict.fromkeys(("multiply", "product", "op_product", "op_map_multiply"), "multiply"),
+    **dict.fromkeys(("subtract", "minus", "op_subtract"), "subtract"),
+    **dict.fromkeys(("divide", "op_divide"), "divide"),
+}
+
+# Reduce op spellings (lowercased) -> reduction
+REDUCE_OPS = {
+    **dict.fromkeys(("op_reduce", "reduce", "add", "sum", "op_sum"), "sum"),
+    **dict.fromkeys(("multiply", "product", "op_product"), "product"),
+    **dict.fromkeys(("max", "op_max", "maximum"), "max"),
+    **dict.fromkeys(("min", "op_min", "minimum"), "min"),
+}
+
+# Filter comparators
+COMPARATORS = {
+    ">": operator.gt, "<": operator.lt, "==": operator.eq,
+    "!=": operator.ne, ">=": operator.ge, "<=": operator.le,
+}
+
 class Interpreter:
-    def __init__(self):
+    def __init__(self, backend=None, lazy=False, summation="pairwise", profile=False):
         self.vars = {}
+        # Lazy mode: map and filter return Streams (see lazy.py), which
+        # reductions consume in one pass; Streams in variables are lazy in
+        # either mode
+        self.lazy = lazy
+        # Profiling: every run of a 'then' chain appends a list of
+        # StageProfile records, one per stage, to profiles
+        self.profile = profile
+        self.profiles = []
+        # Values of shared subexpressions (ast.SharedNode) by slot, for the
+        # current evaluation; any assignment invalidates them
+        self.shared = {}
+        # Vectorized execution of compute ops (see backends.py); anything the
+        # backend declines runs through compute_dispatch below
+        self.backend = backend or default_backend()
+        # How float sums are rounded: "plain", "pairwise" or "exact" (see
+        # summation.py; pairwise leaves the blocking of float vectors to the
+        # backend)
+        if summation not in SUMMATION_ALGORITHMS:
+            raise ValueError(f"Unknown summation algorithm: {summation}")
+        self.summation = summation
+        self.sum_values = SUMMATION_ALGORITHMS[summation]
         # Dispatch table for eval
         self.eval_dispatch = {
             ast.NumberNode: lambda n: n.value,
             ast.VariableNode: self.eval_variable,
-            ast.ListNode: lambda n: [self.eval(v) for v in n.values],
+            ast.ListNode: self.eval_list,
+            ast.NumericVectorNode: lambda n: NumericVector(n.values),
             ast.BinaryOpNode: self.eval_binary_op,
             ast.AssignNode: self.eval_assign,
             ast.PrintNode: self.eval_print,
@@ -23,12 +83,19 @@ class Interpreter:
             ast.IfNode: self.eval_if,
             ast.FilterNode: self.visit_FilterNode,
             ast.SequenceNode: self.eval_sequence,
+            ast.PipelineNode: self.eval_pipeline,
+            ast.ProgramNode: self.eval_program,
+            ast.FusedLoopNode: self.eval_fused,
+            ast.FoldedNode: self.eval_folded,
+            ast.RewrittenNode: self.eval_rewritten,
+            ast.SharedNode: self.eval_shared,
+            ast.SharedScopeNode: self.eval_shared_scope,
         }
         
         # Dispatch table for compute operations
         self.compute_dispatch = {
-            "OP_SUM": lambda v: sum(v),
-            "OP_MEAN": lambda v: sum(v)/len(v),
+            "OP_SUM": lambda v: self.sum_values(v)[0],
+            "OP_MEAN": self._compute_mean,
             "OP_PRODUCT": self._compute_product,
             "OP_MAX": lambda v: max(v),
             "OP_MIN": lambda v: min(v),
@@ -37,10 +104,50 @@ class Interpreter:
         }
 
     def eval(self, node: ast.ASTNode) -> Any:
-        handler = self.eval_dispatch.get(type(node))
-        if handler:
-            return handler(node)
-        raise SemanticError("Unhandled AST node: "+str(node))
+        """Evaluate node; packed numeric vectors in the result are returned as plain lists"""
+        return to_plain(self.eval_value(node))
+
+    def eval_value(self, node: ast.ASTNode) -> Any:
+        """
+        Evaluate node without recursing on the Python stack. Lists of
+        numbers may come back as NumericVectors.
+
+        Handlers for leaves return their value directly. Handlers for composite
+        nodes are generators: they yield each child node they need and receive
+        its value back, so arbitrarily deep trees are walked with an explicit
+        stack of suspended handlers instead of nested calls.
+        """
+        dispatch = self.eval_dispatch
+        handler = dispatch.get(type(node))
+        if handler is None:
+            raise SemanticError("Unhandled AST node: "+str(node))
+        result = handler(node)
+        if type(result) is not GeneratorType:
+            return result
+
+        stack = [result]
+        value = None
+        while stack:
+            try:
+                child = stack[-1].send(value)
+            except StopIteration as done:
+                stack.pop()
+                value = done.value
+                continue
+            handler = dispatch.get(type(child))
+            if handler is None:
+                raise SemanticError("Unhandled AST node: "+str(child))
+            value = handler(child)
+            if type(value) is GeneratorType:
+                stack.append(value)
+                value = None
+        return value
+
+    def eval_list(self, node: ast.ListNode):
+        out = []
+        for v in node.values:
+            out.append((yield v))
+        return out
 
     def eval_variable(self, node: ast.VariableNode):
         if node.name not in self.vars:
@@ -48,7 +155,7 @@ class Interpreter:
         return self.vars[node.name]
 
     def eval_binary_op(self, node: ast.BinaryOpNode):
-        l = self.eval(node.left); r = self.eval(node.right)
+        l = yield node.left; r = yield node.right
         if node.op == "+": return l + r
         if node.op == "-": return l - r
         if node.op == "*": return l * r
@@ -56,61 +163,130 @@ class Interpreter:
         raise SemanticError("Unknown binary op: "+str(node.op))
 
     def eval_assign(self, node: ast.AssignNode):
-        val = self.eval(node.expr)
+        val = yield node.expr
+        if isinstance(val, Stream):
+            val = val.materialize()
+        if type(val) is list:
+            # Stored datasets are packed (and validated) once
+            val = NumericVector.pack(val) or val
         self.vars[node.varname] = val
+        if self.shared:
+            self.shared.clear()
         return val
 
     def eval_print(self, node: ast.PrintNode):
-        val = self.eval(node.expr)
-        print(val)
+        val = yield node.expr
+        print(to_plain(val))
         return val
 
     def eval_compute(self, node: ast.ComputeNode):
         self._log_resolution(node)
-        return self.execute_compute(node.op, node.target)
+        if type(node.target) is ast.NumericVectorNode:
+            # Hand the packed array to the backend without unpacking it
+            return self.apply_compute(node.op, NumericVector(node.target.values))
+        tval = yield node.target
+        return self.apply_compute(node.op, tval)
 
     def eval_if(self, node: ast.IfNode):
-        l = self.eval(node.left); r = self.eval(node.right)
+        l = yield node.left; r = yield node.right
         if self.compare(l, r, node.comp):
-            return self.eval(node.action)
+            return (yield node.action)
         return None
 
     def eval_sequence(self, node: ast.SequenceNode):
-        first_out = self.eval(node.first)
-        
-        # Enhanced composition handling
-        if isinstance(node.second, (ast.ComputeNode, ast.MapNode, ast.ReduceNode)):
-            # If target is explicit placeholder "_"
-            if hasattr(node.second, 'target') and isinstance(node.second.target, ast.VariableNode) and node.second.target.name == "_":
-                converted_target = self._convert_to_node(first_out, isinstance(node.second, (ast.MapNode, ast.ReduceNode)))
-                node.second.target = converted_target
-                return self.eval(node.second)
-
-            # Implicit composition for list results into functional ops
-            if isinstance(first_out, list):
-                # Use temp variable strategy
-                temp_var = "_temp_composition"
-                self.vars[temp_var] = first_out
-                if isinstance(node.second.target, ast.VariableNode) and node.second.target.name == "_":
-                    node.second.target = ast.VariableNode(temp_var)
-                
-                result = self.eval(node.second)
-                if temp_var in self.vars: del self.vars[temp_var]
-                return result
+        # Not streamed: the optimizer fuses or rewrites the pair instead
+        return (yield from self.run_stages([node.first, node.second], streaming=False))
 
-        # Standard sequence evaluation
-        return self.eval(node.second)
+    def eval_pipeline(self, node: ast.PipelineNode):
+        return (yield from self.run_stages(node.stages))
 
-    def _convert_to_node(self, value, prefer_list=False):
-        if isinstance(value, list):
-            return ast.ListNode([ast.NumberNode(x) if isinstance(x, (int, float)) else ast.NumberNode(0) for x in value])
-        
-        if prefer_list:
-             if isinstance(value, (int, float)):
-                 return ast.ListNode([ast.NumberNode(value)])
-             return ast.ListNode([])
-             
-        return ast.NumberNode(value) if isinstance(value, (int, float)) else ast.NumberNode(0)
+    def run_stages(self, stages, streaming=True):
+        """
+        Run commands joined by 'then', in order. A stage over '_' ('A then
+        B over _') is applied to the previous stage's value directly, as if
+        it had been B's target; neither the AST nor the variables are
+        touched. Any other stage runs on its own.
+
+        With streaming, a map or filter feeding a stage over '_' returns a
+        Stream (see lazy.py), so chains of elementwise stages run as one
+        pass, ended by the first stage that needs the whole list. As in a
+        fused loop, an error in a streamed stage is raised when its elements
+        are consumed. With profiling on, stages run one at a time and their
+        StageProfiles are recorded.
+        """
+        records = [] if self.profile else None
+        streaming = streaming and records is None
+        value = None
+        last = len(stages) - 1
+        for i, stage in enumerate(stages):
+            stream = streaming and i < last and is_piped(stages[i + 1])
+            start = perf_counter()
+            if i and is_piped(stage):
+                value = yield from self.feed_stage(stage, value, stream)
+                if streaming and not stream and not self.lazy and isinstance(value, Stream):
+                    value = value.materialize() # the streamed run ends here, with its errors
+            elif stream and type(stage) in (ast.MapNode, ast.FilterNode):
+                value = yield from self.feed_stage(stage, _MISSING, stream)
+            else:
+                value = yield stage
+            if records is not None:
+                value = self._profile_stage(records, stage, value, start)
+        if records is not None:
+            self.profiles.append(records)
+        return value
+
+    def feed_stage(self, stage, value, stream=False):
+        """
+        Apply a compute, map, reduce or filter stage to the previous stage's
+        value, or to its own target if value is _MISSING. With stream, map
+        and filter return a Stream over lists and vectors.
+        """
+        cls = type(stage)
+        if cls is ast.FilterNode:
+            if value is _MISSING:
+                value = yield stage.target
+            if not isinstance(value, (list, NumericVector, Stream)):
+                raise SemanticError(f"Filter target must be a list, got {value}")
+            comp_val = yield stage.value
+            return self.filter_values(stage.op, COMPARATORS.get(stage.op), value, comp_val, stream)
+        self._log_resolution(stage)
+        if value is _MISSING:
+            value = yield stage.target
+        else:
+            value = self.composition_target(value, cls is not ast.ComputeNode)
+        if cls is ast.MapNode:
+            return self.apply_map(stage, value, stream)
+        return self.apply_op(stage, value)
+
+    def _profile_stage(self, records, stage, value, start):
+        """Record stage's StageProfile; a Stream result is materialized first, so its time counts"""
+        if isinstance(value, Stream):
+            value = value.materialize()
+        if value is None:
+            rows = 0
+        elif isinstance(value, (list, array, NumericVector)):
+            rows = len(value)
+        else:
+            rows = 1
+        records.append(StageProfile(stage, perf_counter() - start, rows))
+        return value
+
+    def eval_program(self, node: ast.ProgramNode):
+        """Run statements in order; the program's value is that of its last statement"""
+        result = None
+        for stmt in node.statements:
+            result = yield stmt
+        return result
+
+    def composition_target(self, value, prefer_list=False):
+        """
+        The target a 'then ... over _' stage gets for the first half's value:
+        the value itself, except that map and reduce (prefer_list) see a
+        number as a one-element list
+        """
+        if prefer_list and isinstance(value, (int, float)):
+            return [value]
+        return value
 
     def compare(self, l, r, comp):
         if comp == ">": return l > r
@@ -122,6 +298,11 @@ class Interpreter:
         raise SemanticError("Unknown comparator: "+str(comp))
 
     def ensure_numeric_list(self, lst, allow_empty=False):
+        if isinstance(lst, NumericVector):
+            # Elements are ints or floats by construction
+            if len(lst) == 0 and not allow_empty:
+                raise SemanticError("List must be non-empty")
+            return True
         if not isinstance(lst, list):
             raise SemanticError("Expected list for operation")
         if len(lst) == 0 and not allow_empty:
@@ -131,10 +312,38 @@ class Interpreter:
                 raise SemanticError("List must be numeric")
         return True
 
+    def _compute_mean(self, tval):
+        total, n = self.sum_values(tval)
+        return total / n
+
+    def _uses_backend(self, op, values):
+        """Backends sum floats pairwise, so other summations only let them sum packed ints"""
+        return (self.summation == "pairwise" or op not in ("OP_SUM", "OP_MEAN")
+                or (isinstance(values, NumericVector) and values.typecode == "q"))
+
     def _compute_product(self, tval):
-        prod=1
-        for x in tval: prod*=x
-        return prod
+        """
+        Product of tval (a list or an iterator), equal to multiplying left to
+        right. Ints are multiplied as a product tree, chunk by chunk, so the
+        big intermediates are few and of similar size instead of growing by
+        one factor per step (quadratic in the digit count). From the first
+        non-int on, rounding depends on the order, so the rest is multiplied
+        left to right by math.prod.
+        """
+        it = iter(tval)
+        partials = [] # (product of ints, chunks in it), merged like a binary counter
+        while True:
+            chunk = list(islice(it, PRODUCT_CHUNK))
+            if not chunk:
+                return _product_tree([p for p, _ in partials])
+            i = next((k for k, x in enumerate(chunk) if type(x) is not int), None)
+            if i is not None:
+                prod = _product_tree([p for p, _ in partials] + [_product_tree(chunk[:i])])
+                return math.prod(chain(chunk[i:], it), start=prod)
+            partials.append((_product_tree(chunk), 1))
+            while len(partials) > 1 and partials[-2][1] == partials[-1][1]:
+                (a, n), (b, _) = partials.pop(-2), partials.pop()
+                partials.append((a * b, 2 * n))
     
     def _log_resolution(self, node):
         """Helper to log resolution info if present"""
@@ -155,16 +364,38 @@ class Interpreter:
             pass
 
     def execute_compute(self, op, target):
-        tval = self.eval(target) if hasattr(target, '__class__') else target
+        return self.apply_compute(op, self.eval_value(target))
+
+    def apply_compute(self, op, tval):
+        return self.compute_values(op, tval, isinstance(op, str) and "SORT" in op)
+
+    def compute_values(self, op, tval, is_sort):
+        """apply_compute with the sort/non-sort distinction already resolved"""
         if isinstance(tval, (int,float)):
             return tval
             
         handler = self.compute_dispatch.get(op)
         if handler:
-            if "SORT" in op:
+            if isinstance(tval, Stream):
+                if not is_sort:
+                    return self.fused_values(tval, [], ("compute", op))
+                tval = tval.materialize() # sorting needs every element
+            if self._uses_backend(op, tval):
+                result = self.backend.compute(op, tval)
+                if result is not NotImplemented:
+                    return result
+            if is_sort:
+                 # Sorted results stay lists here: repacking them costs about
+                 # as much as the sort (the elements end up scattered in memory)
+                 if isinstance(tval, (array, NumericVector)):
+                     tval = tval.tolist()
                  if not isinstance(tval, list): raise SemanticError("Sort target must be list")
             else:
+                 if isinstance(tval, array):
+                     tval = tval.tolist()
                  self.ensure_numeric_list(tval)
+                 if isinstance(tval, NumericVector):
+                     tval = tval.tolist()
                  
             return handler(tval)
             
@@ -172,71 +403,326 @@ class Interpreter:
 
     def execute_map(self, node: ast.MapNode):
         self._log_resolution(node)
-        tval = self.eval(node.target)
-        if not isinstance(tval, list):
-            raise SemanticError("Map target must be a list")
-        if len(tval) == 0:
-            return []
-        
-        self.ensure_numeric_list(tval, allow_empty=True)
-        op = node.op
+        if type(node.target) is ast.NumericVectorNode:
+            return self.apply_map(node, NumericVector(node.target.values))
+        tval = yield node.target
+        return self.apply_map(node, tval)
+
+    def apply_map(self, node: ast.MapNode, tval, stream=False):
+        # Resolve the operation and argument once for the whole list
+        kind = MAP_OPS.get(str(node.op).lower())
         arg = node.arg
-        
         # Resolve variable argument if it's a variable name
         if isinstance(arg, str) and arg in self.vars:
             arg = self.vars[arg]
-            
-        out = []
-        
-        op_lower = str(op).lower()
-        
-        # Dispatch map logic? For now keep simple ifs as they handle group synonyms
-        if op_lower in ("op_map", "map", "op_map_add", "op_sum", "add", "sum"):
-            if arg is None: raise SemanticError("Map add requires numeric argument")
-            return [x + arg for x in tval]
-        
-        if op_lower in ("multiply", "product", "op_product", "op_map_multiply"):
-            if arg is None: raise SemanticError("Map multiply requires numeric argument")
-            return [x * arg for x in tval]
-            
-        if op_lower in ("subtract", "minus", "op_subtract"):
-            if arg is None: raise SemanticError("Map subtract requires numeric argument")
-            return [x - arg for x in tval]
-            
-        if op_lower in ("divide", "op_divide"):
-            if arg is None: raise SemanticError("Map divide requires numeric argument")
-            if arg == 0: raise SemanticError("Division by zero")
-            return [x / arg for x in tval]
-        
-        raise SemanticError(f"Unknown map operation: {op}")
+        return self.map_values(kind, arg, tval, node.op, stream)
+
+    def map_values(self, kind, arg, tval, op=None, stream=False):
+        """
+        Map with the operation already resolved to a MAP_OPS kind (None if
+        unknown). With stream (or in lazy mode) a list or vector is mapped
+        lazily, as a Stream.
+        """
+        if isinstance(tval, Stream) or ((stream or self.lazy) and isinstance(tval, (list, NumericVector))):
+            if kind is not None and arg is not None:
+                return self._stream(tval, [("map", kind, arg)])
+            if isinstance(tval, Stream):
+                tval = tval.materialize() # raises the eager error, if any
+        if not isinstance(tval, (list, array, NumericVector)):
+            raise SemanticError("Map target must be a list")
+        if len(tval) == 0:
+            return []
+
+        if kind is not None and arg is not None and not (kind == "divide" and arg == 0):
+            result = self.backend.map(kind, tval, arg)
+            if result is not NotImplemented:
+                return result
+        if isinstance(tval, array):
+            tval = tval.tolist()
+
+        self.ensure_numeric_list(tval, allow_empty=True)
+        source = tval
+        if isinstance(tval, NumericVector):
+            tval = tval.tolist()
+        if kind is None:
+            raise SemanticError(f"Unknown map operation: {op}")
+        if arg is None:
+            raise SemanticError(f"Map {kind} requires numeric argument")
+
+        if kind == "add":
+            result = [x + arg for x in tval]
+        elif kind == "multiply":
+            result = [x * arg for x in tval]
+        elif kind == "subtract":
+            result = [x - arg for x in tval]
+        elif arg == 0:
+            raise SemanticError("Division by zero")
+        else:
+            result = [x / arg for x in tval]
+        return pack_result(result, source)
 
     def execute_reduce(self, node: ast.ReduceNode):
         self._log_resolution(node)
-        tval = self.eval(node.target)
-        if not isinstance(tval, list): raise SemanticError("Reduce target must be a list")
+        tval = yield node.target
+        return self.apply_reduce(node, tval)
+
+    def apply_reduce(self, node: ast.ReduceNode, tval):
+        return self.reduce_values(REDUCE_OPS.get(str(node.op).lower()), tval, node.op)
+
+    def reduce_values(self, kind, tval, op=None):
+        """Reduce with the operation already resolved to a REDUCE_OPS kind (None if unknown)"""
+        if isinstance(tval, Stream):
+            if kind is not None:
+                return self.fused_values(tval, [], ("reduce", kind))
+            tval = tval.materialize()
+        if not isinstance(tval, (list, NumericVector)): raise SemanticError("Reduce target must be a list")
         if len(tval) == 0: raise SemanticError("Cannot reduce empty list")
         
         self.ensure_numeric_list(tval)
-        op = str(node.op).lower()
+        if isinstance(tval, NumericVector):
+            # max/min pick an element and int sums are exact, whatever the backend
+            if kind in ("max", "min") or (kind == "sum" and tval.typecode == "q"):
+                result = self.backend.compute(REDUCE_TO_COMPUTE[kind], tval)
+                if result is not NotImplemented:
+                    return result
+            tval = tval.tolist()
         
-        if op in ("op_reduce", "reduce", "add", "sum", "op_sum"):
-            return sum(tval)
-        if op in ("multiply", "product", "op_product"):
+        if kind == "sum":
+            return self.sum_values(tval)[0]
+        if kind == "product":
             return self._compute_product(tval)
-        if op in ("max", "op_max", "maximum"):
+        if kind == "max":
             return max(tval)
-        if op in ("min", "op_min", "minimum"):
+        if kind == "min":
             return min(tval)
         
-        raise SemanticError(f"Unknown reduce operation: {node.op}")
+        raise SemanticError(f"Unknown reduce operation: {op}")
 
     def visit_FilterNode(self, node):
-        target_val = self.eval(node.target)
-        if not isinstance(target_val, list):
-             raise SemanticError(f"Filter target must be a list, got {target_val}")
+        if type(node.target) is ast.NumericVectorNode:
+            target_val = NumericVector(node.target.values)
+        else:
+            target_val = yield node.target
+            if not isinstance(target_val, (list, NumericVector, Stream)):
+                 raise SemanticError(f"Filter target must be a list, got {target_val}")
         
-        comp_val = self.eval(node.value)
-        op = node.op
-        
-        # Use existing compare logic
-        return [x for x in target_val if isinstance(x, (int, float)) and self.compare(x, comp_val, op)]
+        comp_val = yield node.value
+        return self.apply_filter(node, target_val, comp_val)
+
+    def apply_filter(self, node: ast.FilterNode, target_val, comp_val):
+        return self.filter_values(node.op, COMPARATORS.get(node.op), target_val, comp_val)
+
+    def filter_values(self, op, cmp, target_val, comp_val, stream=False):
+        """Filter with the comparator already resolved (None if unknown: compare() raises); stream as for map_values"""
+        if isinstance(target_val, Stream) or ((stream or self.lazy) and isinstance(target_val, (list, NumericVector))):
+            if cmp is not None:
+                return self._stream(target_val, [("filter", op, comp_val)])
+            if isinstance(target_val, Stream):
+                target_val = target_val.materialize()
+        if cmp is not None:
+            result = self.backend.filter(op, target_val, comp_val)
+            if result is not NotImplemented:
+                return result
+        else:
+            cmp = lambda x, y: self.compare(x, y, op)
+        if isinstance(target_val, NumericVector):
+            return pack_result([x for x in target_val.tolist() if cmp(x, comp_val)], target_val, same_type=True)
+        return [x for x in target_val if isinstance(x, (int, float)) and cmp(x, comp_val)]
+
+    def eval_fused(self, node: ast.FusedLoopNode):
+        for op_node in node.logged:
+            self._log_resolution(op_node)
+        if type(node.source) is ast.NumericVectorNode:
+            values = NumericVector(node.source.values)
+        else:
+            values = yield node.source
+            if not isinstance(values, (list, NumericVector, Stream)):
+                if node.stages[0][0] == "map":
+                    raise SemanticError("Map target must be a list")
+                raise SemanticError(f"Filter target must be a list, got {values}")
+
+        # Resolve every stage's operand once, before the loop
+        stages = []
+        for kind, op, operand in node.stages:
+            if kind == "filter":
+                operand = yield operand
+            elif isinstance(operand, str) and operand in self.vars:
+                operand = self.vars[operand]
+            stages.append((kind, op, operand))
+
+        result = self.pipeline_values(values, stages, node.sink)
+        for op_node in node.after:
+            self._log_resolution(op_node)
+        return result
+
+    def eval_folded(self, node: ast.FoldedNode):
+        for op_node in node.logged:
+            self._log_resolution(op_node)
+        return (yield node.value)
+
+    def eval_shared(self, node: ast.SharedNode):
+        value = self.shared.get(node.slot, _MISSING)
+        if value is _MISSING:
+            value = yield node.expr
+            self.shared[node.slot] = value
+        else:
+            for op_node in node.logged:
+                self._log_resolution(op_node)
+        return value
+
+    def eval_shared_scope(self, node: ast.SharedScopeNode):
+        self.shared = {}
+        result = yield node.body
+        self.shared = {}
+        return result
+
+    def eval_rewritten(self, node: ast.RewrittenNode):
+        for op_node in node.logged:
+            self._log_resolution(op_node)
+        value = yield node.operand
+        result = node.fast(self, value)
+        if result is NotImplemented:
+            return self.run_chain(value, node.steps)
+        for op_node, after_then in node.steps:
+            if after_then:
+                self._log_resolution(op_node)
+        return result
+
+    def run_chain(self, value, steps):
+        """
+        Apply compute/map/reduce nodes to value, innermost first, exactly as
+        their original nesting or 'then ... over _' chain would
+        """
+        for op_node, after_then in steps:
+            if after_then:
+                # See eval_sequence
+                self._log_resolution(op_node)
+                value = self.composition_target(value, not isinstance(op_node, ast.ComputeNode))
+            value = self.apply_op(op_node, value)
+        return value
+
+    def apply_op(self, op_node, tval):
+        """Apply a compute, map or reduce node to an already evaluated target"""
+        if isinstance(op_node, ast.ComputeNode):
+            return self.apply_compute(op_node.op, tval)
+        if isinstance(op_node, ast.MapNode):
+            return self.apply_map(op_node, tval)
+        return self.apply_reduce(op_node, tval)
+
+    def _stream(self, values, stages):
+        """values (a list, vector or Stream) followed by stages, as a Stream"""
+        if isinstance(values, Stream):
+            return Stream(values.source, values.stages + stages, self.fused_values)
+        return Stream(values, stages, self.fused_values)
+
+    def pipeline_values(self, values, stages, sink):
+        """fused_values, except that a loop without a sink stays lazy in lazy mode (or over a Stream)"""
+        if sink is None and (self.lazy or isinstance(values, Stream)):
+            return self._stream(values, stages)
+        return self.fused_values(values, stages, sink)
+
+    def fused_values(self, values, stages, sink):
+        """Run a fused loop whose stage operands are resolved: backend first, else run_fused"""
+        if isinstance(values, Stream):
+            values, stages = values.source, values.stages + stages
+        if sink is None or self._uses_backend(REDUCE_TO_COMPUTE.get(sink[1], sink[1]), None):
+            result = self.backend.fused(values, stages, sink)
+            if result is not NotImplemented:
+                return result
+        return self.run_fused(values, stages, sink)
+
+    def run_fused(self, values, stages, sink):
+        """
+        Stream values through the stages with chained generators, so no
+        intermediate list is built; only the sink (or the final list) sees
+        the whole result. Errors match the unfused operations, but are raised
+        when the first element reaches the stage.
+        """
+        packed = isinstance(values, NumericVector)
+        it = iter(values)
+        if not stages and not packed:
+            it = _numeric(it) # a bare Stream source, reduced
+        for i, (kind, op, operand) in enumerate(stages):
+            if kind == "filter":
+                it = _filter_stage(it, COMPARATORS[op], operand)
+                continue
+            if i == 0 and not packed:
+                it = _numeric(it)
+            if op == "divide" and operand == 0:
+                it = _fail_on_first(it, "Division by zero")
+            else:
+                it = _map_stage(it, op, operand)
+
+        if sink is None:
+            return pack_result(list(it), values)
+        kind, op = sink
+        if op in ("OP_SORT_ASC", "OP_SORT_DESC"):
+            return sorted(it, reverse=op == "OP_SORT_DESC")
+        first = next(it, _EMPTY)
+        if first is _EMPTY:
+            raise SemanticError("Cannot reduce empty list" if kind == "reduce" else "List must be non-empty")
+        it = chain((first,), it)
+        if op in ("sum", "OP_SUM"):
+            return self.sum_values(it)[0]
+        if op in ("product", "OP_PRODUCT"):
+            return self._compute_product(it)
+        if op in ("max", "OP_MAX"):
+            return max(it)
+        if op in ("min", "OP_MIN"):
+            return min(it)
+        return self._compute_mean(it) # OP_MEAN
+
+
+_EMPTY = object()
+_MISSING = object()
+
+
+def is_piped(stage):
+    """True for a 'then ... over _' stage: a compute, map, reduce or filter whose target is '_'"""
+    target = getattr(stage, "target", None)
+    return (isinstance(stage, (ast.ComputeNode, ast.MapNode, ast.ReduceNode, ast.FilterNode))
+            and isinstance(target, ast.VariableNode) and target.name == "_")
+
+
+# Ints multiplied per product tree in Interpreter._compute_product
+PRODUCT_CHUNK = 4096
+
+
+def _product_tree(values):
+    """Product of a list of ints, multiplied in balanced pairs"""
+    if len(values) < 64:
+        return math.prod(values) # short: the intermediates stay small
+    while len(values) > 1:
+        paired = [a * b for a, b in zip(values[::2], values[1::2])]
+        if len(values) % 2:
+            paired.append(values[-1])
+        values = paired
+    return values[0]
+
+
+def _numeric(it):
+    for x in it:
+        if not isinstance(x, (int, float)):
+            raise SemanticError("List must be numeric")
+        yield x
+
+
+# Stages are built by functions so each generator binds its own operand
+def _map_stage(it, kind, arg):
+    if kind == "add":
+        return (x + arg for x in it)
+    if kind == "multiply":
+        return (x * arg for x in it)
+    if kind == "subtract":
+        return (x - arg for x in it)
+    return (x / arg for x in it)
+
+
+def _filter_stage(it, cmp, threshold):
+    return (x for x in it if isinstance(x, (int, float)) and cmp(x, threshold))
+
+
+def _fail_on_first(it, message):
+    for _ in it:
+        raise SemanticError(message)
+    yield from ()
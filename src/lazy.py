@@ -0,0 +1,71 @@
+"""
+lazy.py
+
+Stream: a lazily evaluated list, used by the Interpreter's lazy mode
+(Interpreter(lazy=True)).
+
+A Stream is a source (a list, a NumericVector or any iterable) plus the
+map/filter stages still to be applied to it, in the form of a fused loop's
+stages (see ast.FusedLoopNode). map and filter over a Stream only add a
+stage; sum, mean, max, min, product and reduce consume it in one pass
+through Interpreter.run_fused, so no intermediate list is built. A Stream is
+turned into a list only when it is printed, assigned, sorted, or returned
+from Interpreter.eval.
+
+Streams over lists and vectors can be consumed any number of times. Wrap a
+one-shot iterator, like a generator reading a file that does not fit in
+memory, to run pipelines over it in constant memory; such a stream can be
+consumed only once.
+"""
+
+import operator
+
+
+class Stream:
+    """
+    source: the values to stream
+    stages: ("map", kind, arg) / ("filter", comparator, value), in order,
+            with their operands already evaluated
+    runner: runner(source, stages, sink) evaluates the stream (normally
+            Interpreter.fused_values); None for a stream without stages
+    """
+    __slots__ = ("source", "stages", "runner")
+
+    def __init__(self, source, stages=(), runner=None):
+        self.source = source
+        self.stages = list(stages)
+        self.runner = runner
+
+    def materialize(self):
+        """The stream's elements as a list (or NumericVector)"""
+        if self.runner is None:
+            return list(self.source)
+        return self.runner(self.source, self.stages, None)
+
+    # List semantics for the Interpreter's generic operators; these
+    # materialize the stream
+
+    def _apply(op, reflected=False):
+        def method(self, other):
+            if isinstance(other, Stream):
+                other = other.materialize()
+            if reflected:
+                return op(other, self.materialize())
+            return op(self.materialize(), other)
+        return method
+
+    __eq__ = _apply(operator.eq)
+    __ne__ = _apply(operator.ne)
+    __lt__ = _apply(operator.lt)
+    __le__ = _apply(operator.le)
+    __gt__ = _apply(operator.gt)
+    __ge__ = _apply(operator.ge)
+    __add__ = _apply(operator.add)
+    __radd__ = _apply(operator.add, reflected=True)
+    __mul__ = _apply(operator.mul)
+    __rmul__ = _apply(operator.mul, reflected=True)
+    __hash__ = None
+    del _apply
+
+    def __repr__(self):
+        return f"Stream({type(self.source).__name__}, {self.stages})"
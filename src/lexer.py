@@ -1,5 +1,6 @@
 # lexer.py
 import re
+from bisect import bisect_right
 
 TOKEN_SPEC = [
     ("NUMBER",       r"\d+(\.\d+)?"),
@@ -27,7 +28,9 @@ TOKEN_SPEC = [
     ("PRINT",        r"\bprint\b"),
     ("OVER_ON",      r"\b(over|on)\b"),
     ("IDENTIFIER",   r"[A-Za-z_][A-Za-z0-9_]*"),
-    ("SKIP",         r"[ \t\r\n]+"),
+    ("NEWLINE",      r"\n"),
+    ("SEMI",         r";"),
+    ("SKIP",         r"[ \t\r]+"),
     ("UNKNOWN",      r"."),
 ]
 
@@ -41,17 +44,60 @@ class Token:
     def __repr__(self):
         return f"Token({self.type}, {self.value})"
 
-def lex(text: str):
-    tokens = []
-    for mo in MASTER_RE.finditer(text):
+    @property
+    def end(self):
+        """Character offset just past the token (token values are never padded)"""
+        return self.pos + len(self.value)
+
+class LineIndex:
+    """Table of line start offsets for O(log n) offset -> (line, column) lookup."""
+    def __init__(self, text: str):
+        self.text = text
+        self.starts = [0]
+        find = text.find
+        i = find("\n")
+        while i != -1:
+            self.starts.append(i + 1)
+            i = find("\n", i + 1)
+
+    def line_col(self, offset: int):
+        """1-based (line, column) of a character offset"""
+        line = bisect_right(self.starts, offset)
+        return line, offset - self.starts[line - 1] + 1
+
+    def line_bounds(self, offset: int):
+        """(start, end) offsets of the line containing offset, without the newline"""
+        line = bisect_right(self.starts, offset)
+        start = self.starts[line - 1]
+        end = self.starts[line] - 1 if line < len(self.starts) else len(self.text)
+        return start, end
+
+class TokenList(list):
+    """Token list returned by lex(); remembers its source for position lookups."""
+    def __init__(self, tokens, source: str):
+        super().__init__(tokens)
+        self.source = source
+        self._line_index = None
+
+    @property
+    def line_index(self) -> LineIndex:
+        if self._line_index is None:
+            self._line_index = LineIndex(self.source)
+        return self._line_index
+
+def iter_tokens(text: str, start: int = 0):
+    """Yield the significant tokens of text from offset start onwards (no EOF)."""
+    for mo in MASTER_RE.finditer(text, start):
         kind = mo.lastgroup
-        val = mo.group().strip()
-        pos = mo.start()
         if kind == "SKIP":
             continue
         if kind == "UNKNOWN":
             # ignore stray punctuation usually, but include comma/brackets handled above
             continue
-        tokens.append(Token(kind, val, pos))
+        val = mo.group() if kind == "NEWLINE" else mo.group().strip()
+        yield Token(kind, val, mo.start())
+
+def lex(text: str):
+    tokens = TokenList(iter_tokens(text), text)
     tokens.append(Token("EOF","",len(text)))
     return tokens
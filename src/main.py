@@ -1,16 +1,15 @@
 
 # main.py - demo CLI for speakmath package
-from .lexer import lex
-from .parser import Parser
 from .interpreter import Interpreter
+from .parse_cache import parse_cached
 
-def run_command(text, interp=None):
+def run_command(text, interp=None, optimize=True):
     if interp is None:
         interp = Interpreter()
-    toks = lex(text)
-    parser = Parser(toks)
-    ast = parser.parse()
-    return interp.eval(ast), interp
+    # Constant folding bakes in pairwise summation, so interpreters set to
+    # another algorithm run the tree as parsed
+    optimize = optimize and interp.summation == "pairwise"
+    return interp.eval(parse_cached(text, optimized=optimize)), interp
 
 def demo():
     interp = Interpreter()
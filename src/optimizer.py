@@ -0,0 +1,655 @@
+"""
+optimizer.py
+
+AST-to-AST optimization passes, run between parsing and evaluation.
+
+Passes never modify the tree they are given (parsed trees are shared
+through the parse cache); they return a new tree that reuses every subtree
+they did not change. Trees are walked with an explicit stack, so passes
+handle the same nesting depth as the parser and the Interpreter.
+"""
+
+import copy
+from typing import Callable, List
+from . import ast
+from .backends import FLOAT_EXACT_INT, REDUCE_TO_COMPUTE
+from .interpreter import COMPARATORS, MAP_OPS, REDUCE_OPS, Interpreter, SemanticError, is_piped
+from .vector import NumericVector
+
+# Compute ops that can finish a fused loop
+FUSABLE_COMPUTE_OPS = frozenset({
+    "OP_SUM", "OP_MEAN", "OP_PRODUCT", "OP_MAX", "OP_MIN", "OP_SORT_ASC", "OP_SORT_DESC",
+})
+
+
+# --- Generic traversal ------------------------------------------------------
+
+# Child fields per node type; ListNode, ProgramNode and PipelineNode hold lists of children
+CHILD_FIELDS = {
+    ast.BinaryOpNode: ("left", "right"),
+    ast.AssignNode: ("expr",),
+    ast.PrintNode: ("expr",),
+    ast.ComputeNode: ("target",),
+    ast.MapNode: ("target",),
+    ast.ReduceNode: ("target",),
+    ast.FilterNode: ("value", "target"),
+    ast.IfNode: ("left", "right", "action"),
+    ast.SequenceNode: ("first", "second"),
+    ast.FusedLoopNode: ("source",),
+    ast.FoldedNode: ("value",),
+    ast.RewrittenNode: ("operand",),
+    ast.SharedNode: ("expr",),
+    ast.SharedScopeNode: ("body",),
+}
+LIST_FIELDS = {ast.ListNode: "values", ast.ProgramNode: "statements", ast.PipelineNode: "stages"}
+
+
+def children(node) -> List[ast.ASTNode]:
+    cls = type(node)
+    if cls in LIST_FIELDS:
+        return list(getattr(node, LIST_FIELDS[cls]))
+    return [getattr(node, f) for f in CHILD_FIELDS.get(cls, ())]
+
+
+def with_children(node, new_children):
+    """node itself if its children are unchanged, else a shallow copy holding new_children"""
+    old = children(node)
+    if all(a is b for a, b in zip(old, new_children)):
+        return node
+    clone = copy.copy(node)
+    cls = type(node)
+    if cls in LIST_FIELDS:
+        setattr(clone, LIST_FIELDS[cls], list(new_children))
+    else:
+        for field, child in zip(CHILD_FIELDS[cls], new_children):
+            setattr(clone, field, child)
+    return clone
+
+
+def transform(root, rewrite: Callable):
+    """
+    Bottom-up rewrite: rewrite(node) is called on each node after its
+    children have been rewritten, and returns the node or its replacement.
+    """
+    stack = [(root, False)]
+    done = []
+    while stack:
+        node, expanded = stack.pop()
+        kids = children(node)
+        if not expanded:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(kids))
+            continue
+        new_kids = done[len(done) - len(kids):] if kids else []
+        if kids:
+            del done[len(done) - len(kids):]
+        done.append(rewrite(with_children(node, new_kids)))
+    return done[0]
+
+
+# --- Loop fusion ------------------------------------------------------------
+
+def _stage(node):
+    """The fused-loop stage for a map/filter node, or None if it cannot be fused"""
+    if type(node) is ast.MapNode:
+        kind = MAP_OPS.get(str(node.op).lower())
+        if kind is None or node.arg is None:
+            return None # left to the Interpreter, which reports the error
+        if kind == "divide" and not isinstance(node.arg, str) and node.arg == 0:
+            return None
+        return ("map", kind, node.arg)
+    if type(node) is ast.FilterNode and node.op in COMPARATORS:
+        return ("filter", node.op, node.value)
+    return None
+
+
+def _sink(node):
+    """The fused-loop sink for a reduce/compute node, or None"""
+    if type(node) is ast.ReduceNode:
+        kind = REDUCE_OPS.get(str(node.op).lower())
+        return None if kind is None else ("reduce", kind)
+    if type(node) is ast.ComputeNode and node.op in FUSABLE_COMPUTE_OPS:
+        return ("compute", node.op)
+    return None
+
+
+def _open_loop(node):
+    """node as a fused loop without a sink (a lone map/filter becomes a one-stage loop), or None"""
+    if type(node) is ast.FusedLoopNode:
+        return node if node.sink is None else None
+    stage = _stage(node)
+    if stage is None:
+        return None
+    logged = [node] if type(node) is ast.MapNode else []
+    return ast.FusedLoopNode(node.target, [stage], None, logged)
+
+
+def _append(loop, node, stage, sink, outer_first):
+    """Extend loop with node's stage or sink; outer_first orders the resolution log"""
+    own = [node] if type(node) is not ast.FilterNode else []
+    if outer_first:
+        logged, after = own + loop.logged, loop.after
+    else: # after a 'then': reported once the loop has run
+        logged, after = loop.logged, loop.after + own
+    stages = loop.stages + [stage] if stage else loop.stages
+    fused = ast.FusedLoopNode(loop.source, stages, sink, logged, after)
+    if node._span is not None:
+        fused._span = node._span
+    return fused
+
+
+def _fuse(node):
+    cls = type(node)
+    if cls is ast.SequenceNode:
+        # 'A then B over _' passes A's list to B: fuse across the 'then'
+        second = node.second
+        target = getattr(second, "target", None)
+        if type(target) is ast.VariableNode and target.name == "_":
+            loop = _open_loop(node.first)
+            stage, sink = _stage(second), _sink(second)
+            if loop is not None and (stage or sink):
+                return _append(loop, second, stage, sink, outer_first=False)
+        return node
+    if cls in (ast.MapNode, ast.FilterNode, ast.ReduceNode, ast.ComputeNode):
+        # 'op over <map/filter chain>'
+        inner = node.target
+        if type(inner) is ast.FusedLoopNode or _stage(inner) is not None:
+            loop = _open_loop(inner)
+            stage, sink = _stage(node), _sink(node)
+            if loop is not None and (stage or sink):
+                return _append(loop, node, stage, sink, outer_first=True)
+    return node
+
+
+def fuse_loops(node):
+    """
+    Loop fusion: chains of map/filter ending in an optional reduce or
+    compute, written nested ('map add 2 over map multiply 3 over data') or
+    with 'then ... over _', become one FusedLoopNode that runs in a single
+    pass. Single operations are left alone.
+    """
+    return transform(node, _fuse)
+
+
+# --- Constant folding -------------------------------------------------------
+
+# Errors that leave a constant subtree unfolded, so it raises at run time
+FOLD_ERRORS = (SemanticError, ArithmeticError, TypeError, ValueError)
+
+_FAILED = object()
+
+
+def _is_literal(node):
+    """A constant node that reports nothing when evaluated"""
+    cls = type(node)
+    if cls is ast.NumberNode or cls is ast.NumericVectorNode:
+        return True
+    return cls is ast.ListNode and all(type(v) is ast.NumberNode for v in node.values)
+
+
+def _is_constant(node):
+    return _is_literal(node) or type(node) is ast.FoldedNode
+
+
+def _literal(value, like):
+    """A literal node evaluating to value (in place of like), or None if value has no literal form"""
+    if value is None or type(value) in (int, float):
+        node = ast.NumberNode(value) # NumberNode(None) stands for a pruned 'if'
+    elif type(value) is list and all(type(v) in (int, float) for v in value):
+        node = ast.list_literal([ast.NumberNode(v) for v in value])
+    else:
+        return None
+    node._span = like._span
+    return node
+
+
+class ConstantFolder:
+    """
+    Folds constant subtrees by evaluating them once with a scratch
+    Interpreter, so the results (and the backend used) are those of a
+    normal run. A subtree whose evaluation fails is kept as it is and
+    raises when, and only if, the program reaches it. Resolution info that
+    the folded operations would have reported is kept on a FoldedNode.
+    """
+
+    def __init__(self):
+        self.interp = Interpreter()
+        self.logged = []
+        self.interp._log_resolution = self.logged.append
+
+    def evaluate(self, node):
+        try:
+            return self.interp.eval(node)
+        except FOLD_ERRORS:
+            return _FAILED
+
+    def fold(self, node):
+        self.logged.clear()
+        value = self.evaluate(node)
+        literal = None if value is _FAILED else _literal(value, node)
+        if literal is None:
+            return node
+        if not self.logged:
+            return literal
+        folded = ast.FoldedNode(literal, self.logged)
+        folded._span = node._span
+        return folded
+
+    def __call__(self, node):
+        cls = type(node)
+        if cls is ast.ListNode:
+            if _is_literal(node):
+                return _literal([v.value for v in node.values], node) or node
+            if all(_is_constant(v) for v in node.values):
+                return self.fold(node)
+        elif cls is ast.BinaryOpNode:
+            if _is_constant(node.left) and _is_constant(node.right):
+                return self.fold(node)
+        elif cls in (ast.ComputeNode, ast.ReduceNode):
+            if _is_constant(node.target):
+                return self.fold(node)
+        elif cls is ast.MapNode:
+            if _is_constant(node.target) and not isinstance(node.arg, str):
+                return self.fold(node)
+        elif cls is ast.FilterNode:
+            if _is_constant(node.target) and _is_constant(node.value):
+                return self.fold(node)
+        elif cls is ast.IfNode:
+            if _is_literal(node.left) and _is_literal(node.right):
+                try:
+                    taken = self.interp.compare(self.evaluate(node.left), self.evaluate(node.right), node.comp)
+                except FOLD_ERRORS:
+                    return node
+                return node.action if taken else _literal(None, node)
+        elif cls is ast.SequenceNode:
+            return self._fold_sequence(node)
+        elif cls is ast.ProgramNode:
+            # Literal statements other than the last have no effect
+            kept = [s for s in node.statements[:-1] if not _is_literal(s)] + node.statements[-1:]
+            if len(kept) != len(node.statements):
+                return with_children(node, kept)
+        return node
+
+    def _fold_sequence(self, node):
+        if not _is_constant(node.first):
+            return node
+        second = node.second
+        if is_piped(second):
+            # 'then ... over _' with a constant first half
+            if isinstance(getattr(second, "arg", None), str):
+                return node
+            if type(second) is ast.FilterNode and not _is_constant(second.value):
+                return node
+            return self.fold(node)
+        return second if _is_literal(node.first) else node
+
+
+def fold_constants(node):
+    """
+    Constant folding and partial evaluation: arithmetic on numbers,
+    compute/map/reduce/filter over literal lists and 'then' stages fed by
+    constants are replaced by their values, and 'if' commands comparing
+    literals are replaced by their action (or dropped). Parts of a tree
+    that depend on variables are kept, with their constant pieces folded.
+    """
+    return transform(node, ConstantFolder())
+
+
+# --- Algebraic rewrites -----------------------------------------------------
+
+# Rule name -> rule(inner, outer). A rule returns None if it does not apply to
+# the chain 'outer over inner over x', else fast(interp, value): the chain's
+# result for x's value, or NotImplemented when its precondition fails at run
+# time (the original operations then run instead)
+REWRITE_RULES = {}
+
+CHAIN_OPS = (ast.ComputeNode, ast.MapNode, ast.ReduceNode)
+SORT_OPS = frozenset({"OP_SORT_ASC", "OP_SORT_DESC"})
+
+
+def rewrite_rule(name):
+    def register(rule):
+        REWRITE_RULES[name] = rule
+        return rule
+    return register
+
+
+def _compute_op(node):
+    """The compute op a compute/reduce node amounts to on a non-empty numeric list"""
+    if type(node) is ast.ComputeNode:
+        return node.op
+    if type(node) is ast.ReduceNode:
+        return REDUCE_TO_COMPUTE.get(REDUCE_OPS.get(str(node.op).lower()))
+    return None
+
+
+def _map_kind(node):
+    return MAP_OPS.get(str(node.op).lower()) if type(node) is ast.MapNode else None
+
+
+def _map_arg(interp, node):
+    # Resolved as Interpreter.apply_map does
+    arg = node.arg
+    return interp.vars[arg] if isinstance(arg, str) and arg in interp.vars else arg
+
+
+def _uniform(value):
+    """int or float if value is a non-empty list (or vector) of only that type and no NaN, else None"""
+    if isinstance(value, NumericVector):
+        if not len(value):
+            return None
+        if value.typecode == "q":
+            return int
+        total = sum(value)
+        return float if total == total else None
+    if type(value) is not list or not value:
+        return None
+    types = set(map(type, value))
+    if types == {int}:
+        return int
+    if types == {float}:
+        total = sum(value)
+        return float if total == total else None
+    return None
+
+
+def _map_one(kind, x, arg):
+    if kind == "add":
+        return x + arg
+    if kind == "subtract":
+        return x - arg
+    if kind == "multiply":
+        return x * arg
+    return x / arg
+
+
+@rewrite_rule("extremum_of_sort")
+def _extremum_of_sort(inner, outer):
+    """max/min over a sorted list is max/min of the list itself"""
+    op = _compute_op(outer)
+    if op not in ("OP_MAX", "OP_MIN") or _compute_op(inner) not in SORT_OPS:
+        return None
+    def fast(interp, value):
+        # Equal elements keep their order when sorted, so the same one is picked
+        if _uniform(value) is None:
+            return NotImplemented
+        return interp.compute_values(op, value, False)
+    return fast
+
+
+@rewrite_rule("sort_of_sort")
+def _sort_of_sort(inner, outer):
+    """Sorting is stable, so the first sort is irrelevant to the second"""
+    if type(outer) is not ast.ComputeNode or outer.op not in SORT_OPS or _compute_op(inner) not in SORT_OPS:
+        return None
+    op = outer.op
+    def fast(interp, value):
+        if _uniform(value) is None:
+            return NotImplemented
+        return interp.compute_values(op, value, True)
+    return fast
+
+
+@rewrite_rule("aggregate_of_sort")
+def _aggregate_of_sort(inner, outer):
+    """Sums and products do not depend on order (exactly so for ints)"""
+    op = _compute_op(outer)
+    if op not in ("OP_SUM", "OP_MEAN", "OP_PRODUCT") or _compute_op(inner) not in SORT_OPS:
+        return None
+    def fast(interp, value):
+        if _uniform(value) is not int:
+            return NotImplemented
+        return interp.compute_values(op, value, False)
+    return fast
+
+
+@rewrite_rule("extremum_of_monotone_map")
+def _extremum_of_monotone_map(inner, outer):
+    """max(x + k) == max(x) + k, and likewise for -, and * or / by k > 0"""
+    op, kind = _compute_op(outer), _map_kind(inner)
+    if op not in ("OP_MAX", "OP_MIN") or kind is None or inner.arg is None:
+        return None
+    def fast(interp, value):
+        arg = _map_arg(interp, inner)
+        if type(arg) not in (int, float) or arg != arg or _uniform(value) is None:
+            return NotImplemented
+        if kind in ("multiply", "divide") and not arg > 0:
+            return NotImplemented
+        result = _map_one(kind, interp.compute_values(op, value, False), arg)
+        # Distinct elements can round to equal results; they only differ
+        # observably as 0.0 and -0.0
+        return result if result else NotImplemented
+    return fast
+
+
+@rewrite_rule("sum_of_affine_map")
+def _sum_of_affine_map(inner, outer):
+    """sum(x + k) == sum(x) + k*len(x), sum(x * k) == sum(x) * k; exact for int lists"""
+    op, kind = _compute_op(outer), _map_kind(inner)
+    if op not in ("OP_SUM", "OP_MEAN") or kind not in ("add", "subtract", "multiply") or inner.arg is None:
+        return None
+    def fast(interp, value):
+        arg = _map_arg(interp, inner)
+        if _uniform(value) is not int:
+            return NotImplemented
+        n = len(value)
+        if type(arg) is float and arg.is_integer():
+            # Every intermediate float must be an exactly representable integer
+            bound = max(max(value), -min(value))
+            growth = bound * abs(arg) if kind == "multiply" else bound + abs(arg)
+            if n * growth > FLOAT_EXACT_INT:
+                return NotImplemented
+        elif type(arg) is not int:
+            return NotImplemented
+        total = interp.compute_values("OP_SUM", value, False)
+        if kind == "add":
+            total = total + arg * n
+        elif kind == "subtract":
+            total = total - arg * n
+        else:
+            total = total * arg
+        if not total:
+            return NotImplemented # the elementwise sum gives 0.0 where this may give -0.0
+        return total / n if op == "OP_MEAN" else total
+    return fast
+
+
+def _chain(node):
+    """(inner, outer, operand, steps, logged) if node is a two-operation chain, else None"""
+    cls = type(node)
+    if cls is ast.SequenceNode:
+        first, second = node.first, node.second
+        target = getattr(second, "target", None)
+        if (isinstance(first, CHAIN_OPS) and isinstance(second, CHAIN_OPS)
+                and type(target) is ast.VariableNode and target.name == "_"):
+            return first, second, first.target, [(first, False), (second, True)], [first]
+    elif cls in CHAIN_OPS and type(node.target) in CHAIN_OPS:
+        inner = node.target
+        return inner, node, inner.target, [(inner, False), (node, False)], [node, inner]
+    return None
+
+
+def rewrite_algebra(node, rules=None, log=None):
+    """
+    Algebraic rewrites: chains of two operations that have a cheaper
+    equivalent ('sort x then max _' is 'max x', 'reduce sum over map add k
+    over x' is 'sum x + k*len(x)', ...) become RewrittenNodes. rules maps
+    rule names to rules (default REWRITE_RULES, tried in order); log, if
+    given, is called as log(rule_name, node) for every rewrite made.
+    """
+    rules = REWRITE_RULES if rules is None else rules
+
+    def rewrite(node):
+        chain = _chain(node)
+        if chain is None:
+            return node
+        inner, outer, operand, steps, logged = chain
+        for name, rule in rules.items():
+            fast = rule(inner, outer)
+            if fast is not None:
+                if log is not None:
+                    log(name, node)
+                rewritten = ast.RewrittenNode(name, operand, steps, logged, fast)
+                rewritten._span = node._span
+                return rewritten
+        return node
+
+    return transform(node, rewrite)
+
+
+# --- Common subexpression elimination ---------------------------------------
+
+# Side effects: trees containing these are never shared. 'if' counts too, as
+# its action (and the resolution info it reports) is conditional.
+IMPURE_NODES = (ast.AssignNode, ast.PrintNode, ast.IfNode, ast.ProgramNode, ast.SharedScopeNode)
+LEAF_NODES = (ast.NumberNode, ast.VariableNode, ast.NumericVectorNode)
+# Fields besides the children that identify a node's computation
+KEY_FIELDS = {
+    ast.BinaryOpNode: ("op",),
+    ast.ComputeNode: ("op",),
+    ast.MapNode: ("op", "arg"),
+    ast.ReduceNode: ("op",),
+    ast.FilterNode: ("op",),
+}
+# Optimizer-built nodes that carry more than their children; each is its own key
+OPAQUE_NODES = (ast.FusedLoopNode, ast.FoldedNode, ast.RewrittenNode)
+
+
+def _logged_in_order(root):
+    """Operation nodes reporting resolution info while root is evaluated, in order"""
+    out = []
+    stack = [root]
+    while stack:
+        item = stack.pop()
+        if type(item) is tuple: # reported after the children
+            out.append(item[0])
+            continue
+        cls, after = type(item), []
+        if cls in (ast.ComputeNode, ast.MapNode, ast.ReduceNode):
+            out.append(item)
+            kids = [item.target]
+        elif cls is ast.FilterNode:
+            kids = [item.target, item.value]
+        elif cls is ast.FusedLoopNode:
+            out.extend(item.logged)
+            kids = [item.source] + [operand for kind, _, operand in item.stages if kind == "filter"]
+            after = [(op_node,) for op_node in item.after]
+        elif cls is ast.FoldedNode:
+            out.extend(item.logged)
+            kids = []
+        elif cls is ast.RewrittenNode:
+            out.extend(item.logged)
+            kids = [item.operand]
+            after = [(op_node,) for op_node, after_then in item.steps if after_then]
+        else:
+            kids = children(item)
+        stack.extend(reversed(kids + after))
+    return out
+
+
+class _StructuralKeys:
+    """
+    Hash-consing of subtrees: structurally equal pure subtrees (same node
+    types, operators, arguments, literals and variable names) get the same
+    small int key, impure ones None.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.by_node = {}
+        self.pinned = [] # keeps keyed nodes alive, so their id()s stay unique
+
+    def __call__(self, node):
+        cls = type(node)
+        if cls is ast.SharedNode:
+            key = self.by_node[id(node.expr)]
+        elif isinstance(node, IMPURE_NODES):
+            key = None
+        else:
+            kid_keys = tuple(self.by_node[id(c)] for c in children(node))
+            if None in kid_keys:
+                key = None
+            else:
+                if cls is ast.NumberNode:
+                    fields = (type(node.value), node.value)
+                elif cls is ast.NumericVectorNode:
+                    fields = (node.values.typecode, node.values.tobytes())
+                elif cls is ast.VariableNode:
+                    fields = (node.name,)
+                elif cls in OPAQUE_NODES:
+                    fields = (id(node),)
+                else:
+                    fields = tuple(getattr(node, f) for f in KEY_FIELDS.get(cls, ()))
+                key = self.ids.setdefault((cls, fields, kid_keys), len(self.ids))
+        self.by_node[id(node)] = key
+        self.pinned.append(node)
+        return key
+
+
+def _stage_nodes(root):
+    """ids of 'then ... over _' stages, which the Interpreter matches by type and must stay as they are"""
+    stages = set()
+    def visit(node):
+        if type(node) is ast.SequenceNode:
+            target = getattr(node.second, "target", None)
+            if type(target) is ast.VariableNode and target.name == "_":
+                stages.add(id(node.second))
+        elif type(node) is ast.PipelineNode:
+            for stage in node.stages[1:]:
+                target = getattr(stage, "target", None)
+                if type(target) is ast.VariableNode and target.name == "_":
+                    stages.add(id(stage))
+        return node
+    transform(root, visit)
+    return stages
+
+
+def eliminate_common_subexpressions(node):
+    """
+    Common subexpression elimination: pure subexpressions (anything without
+    'set', 'print' or 'if') that occur more than once, like the two
+    'max data' in 'if max data > 10 then print max data', become
+    SharedNodes and are evaluated once per run of the tree. Assignments
+    invalidate shared values, so a repeat after 'set' is evaluated again.
+    """
+    keys = _StructuralKeys()
+    counts = {}
+    def count(n):
+        key = keys(n)
+        if key is not None and not isinstance(n, LEAF_NODES):
+            counts[key] = counts.get(key, 0) + 1
+        return n
+    transform(node, count)
+    if not any(c > 1 for c in counts.values()):
+        return node
+
+    stages = _stage_nodes(node)
+    slots = {}
+    def share(n):
+        key = keys(n)
+        if key is None or counts.get(key, 0) < 2 or id(n) in stages:
+            return n
+        shared = ast.SharedNode(n, slots.setdefault(key, len(slots)), _logged_in_order(n))
+        shared._span = n._span
+        keys(shared)
+        return shared
+    body = transform(node, share)
+    scope = ast.SharedScopeNode(body, len(slots))
+    scope._span = node._span
+    return scope
+
+
+DEFAULT_PASSES = [fold_constants, rewrite_algebra, fuse_loops, eliminate_common_subexpressions]
+
+
+def optimize(node, passes=None, log=None):
+    """
+    Run the optimization passes over a parsed tree and return the optimized
+    tree. log, if given, is passed on to rewrite_algebra.
+    """
+    for optimization in (DEFAULT_PASSES if passes is None else passes):
+        if log is not None and optimization is rewrite_algebra:
+            node = optimization(node, log=log)
+        else:
+            node = optimization(node)
+    return node
@@ -0,0 +1,130 @@
+"""
+parse_cache.py
+
+LRU cache of parsed ASTs keyed by the normalized token stream, so repeated
+commands ("mean sales", "sum [1,2,3]") skip lexing and parsing. Cached trees
+are shared between callers; this is safe because the Interpreter never
+mutates an AST while evaluating it. A cache may be shared between threads
+(Streamlit runs each session's script in its own thread): its tables are
+only touched under a lock, which is not held while a miss is parsed.
+An entry also keeps its optimized tree once one has been asked for, so the
+optimizer runs once per cached command rather than once per run.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+from .lexer import lex
+from .optimizer import optimize
+from .parser import Parser
+from . import ast
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+def token_key(tokens) -> Tuple:
+    """
+    Normalized token sequence. Keywords match case-insensitively so their
+    values are lowercased; identifiers stay as-is since variable names are
+    case-sensitive.
+    """
+    return tuple(
+        (t.type, t.value if t.type == "IDENTIFIER" else t.value.lower())
+        for t in tokens
+    )
+
+
+class ParseCache:
+    """
+    LRU cache from command text to AST. Exact text repeats skip lexing too;
+    differently spaced/cased spellings of a command share one entry through
+    the token key. With track_source=True (debugger/visualizer use) entries
+    carry source text, so only exact text repeats are shared.
+    """
+
+    def __init__(self, maxsize: int = 512, track_source: bool = False):
+        self.maxsize = maxsize
+        self.track_source = track_source
+        # Both tables map to shared entries: [AST, optimized AST or None]
+        self._by_text = OrderedDict()    # text -> entry
+        self._by_tokens = OrderedDict()  # token key -> entry
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def parse(self, text: str, tokens=None) -> ast.ASTNode:
+        """Return the (shared) AST for text, parsing it on a miss"""
+        return self._entry(text, tokens)[0]
+
+    def optimized(self, text: str, tokens=None) -> ast.ASTNode:
+        """Return the (shared) optimized AST for text, optimizing it on first use"""
+        entry = self._entry(text, tokens)
+        if entry[1] is None:
+            node = optimize(entry[0])
+            with self._lock:
+                if entry[1] is None:
+                    entry[1] = node
+        return entry[1]
+
+    def _entry(self, text: str, tokens=None) -> list:
+        with self._lock:
+            entry = self._by_text.get(text)
+            if entry is not None:
+                self._by_text.move_to_end(text)
+                self.hits += 1
+                return entry
+
+        if tokens is None:
+            tokens = lex(text)
+        key = (text,) if self.track_source else token_key(tokens)
+        with self._lock:
+            entry = self._by_tokens.get(key)
+            if entry is not None:
+                self._by_tokens.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if entry is None:
+            parser = Parser(tokens, track_spans=self.track_source)
+            if self.track_source:
+                parser.set_source(text)
+            entry = [parser.parse(), None]
+            with self._lock:
+                self._store(self._by_tokens, key, entry)
+        with self._lock:
+            self._store(self._by_text, text, entry)
+        return entry
+
+    def _store(self, table: OrderedDict, key, entry):
+        table[key] = entry
+        table.move_to_end(key)
+        if len(table) > self.maxsize:
+            table.popitem(last=False)
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._by_tokens))
+
+    def clear(self):
+        with self._lock:
+            self._by_text.clear()
+            self._by_tokens.clear()
+            self.hits = self.misses = 0
+
+
+# Process-wide cache used by run_command
+DEFAULT_PARSE_CACHE = ParseCache()
+
+
+def parse_cached(text: str, cache: Optional[ParseCache] = None, optimized: bool = False) -> ast.ASTNode:
+    """
+    Parse text through a ParseCache (the shared default one unless given);
+    with optimized=True the cached optimized tree is returned instead.
+    """
+    cache = cache or DEFAULT_PARSE_CACHE
+    return cache.optimized(text) if optimized else cache.parse(text)
@@ -4,8 +4,9 @@ Structured result objects for parser operations.
 Provides detailed error information and success/failure tracking.
 """
 
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from . import ast
+from .lexer import LineIndex
 
 class FailureObject:
     """
@@ -23,7 +24,9 @@ class FailureObject:
         position: int,          # Character position in the input where error occurred
         message: str,           # Human-readable error message
         suggestion: Optional[str] = None,  # Optional helpful suggestion for fixing the error
-        context: Optional[str] = None      # Optional surrounding text for context
+        context: Optional[str] = None,     # Optional surrounding text for context
+        line: Optional[int] = None,        # Optional 1-based line of position
+        column: Optional[int] = None       # Optional 1-based column of position
     ):
         # Store all error details for later retrieval and formatting
         self.error_type = error_type
@@ -32,6 +35,14 @@ class FailureObject:
         self.message = message
         self.suggestion = suggestion
         self.context = context
+        self.line = line
+        self.column = column
+
+    def locate(self, line_index: Optional[LineIndex]) -> "FailureObject":
+        """Fill in line/column from a lexer LineIndex (O(log n) per error)"""
+        if line_index is not None and self.position is not None:
+            self.line, self.column = line_index.line_col(self.position)
+        return self
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization"""
@@ -43,7 +54,9 @@ class FailureObject:
             "position": self.position,
             "message": self.message,
             "suggestion": self.suggestion,
-            "context": self.context
+            "context": self.context,
+            "line": self.line,
+            "column": self.column
         }
     
     def __repr__(self):
@@ -59,8 +72,11 @@ class FailureObject:
         # Add error type header (e.g., "❌ Semantic Failure")
         lines.append(f"❌ {self.error_type.replace('_', ' ').title()}")
         
-        # Add token and position information
-        lines.append(f"   Token: '{self.token}' at position {self.position}")
+        # Add token and position information (line/column when known)
+        if self.line is not None:
+            lines.append(f"   Token: '{self.token}' at line {self.line}, column {self.column}")
+        else:
+            lines.append(f"   Token: '{self.token}' at position {self.position}")
         
         # Add the error message
         lines.append(f"   {self.message}")
@@ -87,13 +103,16 @@ class ParseResult:
         self,
         success: bool,                        # True if parsing succeeded, False if failed
         ast_node: Optional[ast.ASTNode] = None,  # AST node if success=True, None otherwise
-        error: Optional[FailureObject] = None    # Error object if success=False, None otherwise
+        error: Optional[FailureObject] = None,   # Error object if success=False, None otherwise
+        errors: Optional[List[FailureObject]] = None  # Every error found (recovery mode)
     ):
         # Store parse result - either success with AST or failure with error
         # This follows the Result pattern: exactly one of (ast_node, error) should be set
         self.success = success
         self.ast_node = ast_node
         self.error = error
+        # error is always the first entry of errors
+        self.errors = errors if errors is not None else ([error] if error else [])
     
     def __repr__(self):
         """String representation for debugging"""
@@ -111,14 +130,15 @@ class ParseResult:
         return ParseResult(success=True, ast_node=ast_node, error=None)
     
     @staticmethod
-    def failure_result(error: FailureObject):
+    def failure_result(error: FailureObject, errors: Optional[List[FailureObject]] = None):
         """Create a failed parse result"""
         # Factory method for creating a failed parse result
         # Used by parser when an error occurs during parsing
-        return ParseResult(success=False, ast_node=None, error=error)
+        return ParseResult(success=False, ast_node=None, error=error, errors=errors)
 
 
-def create_lexical_failure(token: str, position: int, context: str, suggestion: str = None) -> FailureObject:
+def create_lexical_failure(token: str, position: int, context: str, suggestion: str = None,
+                           line_index: Optional[LineIndex] = None) -> FailureObject:
     """Helper to create lexical failure objects"""
     # Convenience function for creating lexical errors
     # Lexical failures occur when a token/keyword is not recognized by the lexer
@@ -130,10 +150,11 @@ def create_lexical_failure(token: str, position: int, context: str, suggestion:
         message=f"Unknown keyword '{token}'",
         suggestion=suggestion,
         context=context
-    )
+    ).locate(line_index)
 
 
-def create_semantic_failure(token: str, position: int, context: str, suggestion: str = None) -> FailureObject:
+def create_semantic_failure(token: str, position: int, context: str, suggestion: str = None,
+                            line_index: Optional[LineIndex] = None) -> FailureObject:
     """Helper to create semantic failure objects"""
     # Convenience function for creating semantic errors
     # Semantic failures occur when syntax is valid but operation meaning is unknown
@@ -145,10 +166,11 @@ def create_semantic_failure(token: str, position: int, context: str, suggestion:
         message=f"Unknown operation '{token}'",
         suggestion=suggestion or "This operation is not currently supported",
         context=context
-    )
+    ).locate(line_index)
 
 
-def create_syntax_failure(expected: str, got: str, position: int, context: str) -> FailureObject:
+def create_syntax_failure(expected: str, got: str, position: int, context: str,
+                          line_index: Optional[LineIndex] = None) -> FailureObject:
     """Helper to create syntax error objects"""
     # Convenience function for creating syntax errors
     # Syntax failures occur when token sequence doesn't match grammar rules
@@ -160,4 +182,4 @@ def create_syntax_failure(expected: str, got: str, position: int, context: str)
         message=f"Expected {expected}, got {got}",
         suggestion=None,  # Syntax errors typically don't have suggestions
         context=context
-    )
+    ).locate(line_index)
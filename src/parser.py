@@ -1,14 +1,27 @@
 
 # parser.py
 from typing import List
-from .lexer import Token, lex
+from .lexer import Token, LineIndex, lex
 from . import ast
-from .llm_layer import resolve_phrase
+from .llm_layer import resolve_phrase_local, resolve_phrase_llm
 from .semantic_map import SEMANTIC_MAP
+from .parse_result import (FailureObject, ParseResult, create_semantic_failure,
+                           create_syntax_failure)
+from .grammar import TABLES, PHRASE_STOPS
 
 class ParseError(Exception):
     """Legacy exception for backwards compatibility"""
-    pass
+    def __init__(self, message, token=None, expected=None, phrase=None,
+                 error_type=FailureObject.ERROR_SYNTAX):
+        super().__init__(message)
+        self.token = token          # offending Token, if known
+        self.expected = expected    # what the grammar wanted there
+        self.phrase = phrase        # unresolved phrase for semantic failures
+        self.error_type = error_type
+
+    def __reduce__(self):
+        # Keep the structured fields when errors cross process boundaries
+        return (self.__class__, (str(self), self.token, self.expected, self.phrase, self.error_type))
 
 # Stop-words/Prepositions allowed to extend a valid verb
 SAFE_PHRASE_IDS = {
@@ -19,34 +32,101 @@ SAFE_PHRASE_IDS = {
     "addition", "subtraction", "multiplication", "division", "total", "average", "product", "sum", "mean"
 }
 
+# Binary operator token types and their binding strength
+BINARY_PRECEDENCE = {"ADDOP": 1, "MULOP": 2}
+
+# Token types that start a prefix construct inside an expression -> head parser
+PREFIX_HEADS = {
+    tok: head
+    for rule, head in (("AggregateHead", "_aggregate_head"), ("FilterHead", "_filter_head"),
+                       ("MapHead", "_map_head"), ("ReduceHead", "_reduce_head"))
+    for tok in TABLES.first[rule]
+}
+
+# Token types accepted as the operation word after 'map' / 'reduce'
+MAP_VERBS = TABLES.first["MapVerb"]
+REDUCE_VERBS = TABLES.first["ReduceVerb"]
+
+# Grammar alternatives (docs/syntax_definition.md) -> parser methods. Which
+# alternative handles the next token comes from the generated LL(1) tables.
+COMMAND_ACTIONS = {
+    "AssignCommand": "parse_assign", "ConditionalCommand": "parse_if",
+    "PrintCommand": "parse_print", "MapCommand": "parse_map",
+    "ReduceCommand": "parse_reduce", "FilterCommand": "parse_filter",
+    "SortCommand": "parse_sort", "ComputeCommand": "parse_compute_command",
+}
+TARGET_ACTIONS = {
+    "List": "_target_list", "ListShorthand": "_target_shorthand",
+    "Variable": "_target_variable", "Expression": "_target_expression",
+}
+FACTOR_ACTIONS = {
+    "Number": "_factor_number", "Variable": "_factor_variable", "List": "_factor_list",
+    "Group": "_factor_group", "Negation": "_factor_negation",
+    "Aggregate": "_factor_prefix", "FilterExpr": "_factor_prefix",
+    "MapExpr": "_factor_prefix", "ReduceExpr": "_factor_prefix",
+}
+COMMAND_DISPATCH = {tok: COMMAND_ACTIONS[label] for tok, label in TABLES.table["Command"].items()}
+
+# Tokens that end a statement in a multi-statement program
+STATEMENT_SEPARATORS = ("NEWLINE", "SEMI")
+
+# Returned in place of a node by parse methods that fail; the failure itself
+# is recorded in Parser.error
+FAILED = object()
+
 class Parser:
-    def __init__(self, tokens: List[Token]):
+    def __init__(self, tokens: List[Token], track_spans: bool = True, llm_resolver=None):
         self.tokens = tokens
         self.pos = 0
-        self.pos = 0
-        # Capture input text if tokens have position info usually passed from lexer? 
-        # Lexer just returns tokens. We need to reconstruct or store input.
-        # Let's assume input_text is set manually or via tokens if they had source refs.
-        # For now, we will relying on main passed it or we reconstruct from tokens.
-        self.input_text = "" 
+        self.depth = 0 # bracket/paren nesting; newlines inside brackets are insignificant
+        # Source text comes from the lexer's TokenList, or set_source() for plain token lists.
+        # Nodes only record integer spans into it; debug_info['source'] is sliced on demand.
+        # Batch callers can switch span tracking off entirely.
+        self.input_text = getattr(tokens, 'source', "")
+        self.track_spans = track_spans
+        self._line_index = None
+        # Phrases the local maps cannot resolve go here (bulk parsing swaps in a
+        # resolver that defers them so duplicates reach the LLM only once)
+        self.llm_resolver = llm_resolver or resolve_phrase_llm
+        # Statement parsers do not raise: the first failure of a statement is
+        # recorded here (a ParseError, not raised) with the position it was
+        # found at, and the rest of the statement is skipped through
+        self.error = None
+        self.error_pos = 0
         
     def set_source(self, text):
         self.input_text = text
+        self._line_index = None
+
+    @property
+    def line_index(self):
+        """Line-offset table for input_text, shared with the lexer's when possible"""
+        if self._line_index is None:
+            if getattr(self.tokens, 'source', None) == self.input_text:
+                self._line_index = self.tokens.line_index
+            else:
+                self._line_index = LineIndex(self.input_text)
+        return self._line_index
+
+    def line_col(self, pos):
+        """1-based (line, column) of a character offset in input_text"""
+        return self.line_index.line_col(pos)
 
     def _track(self, node, start_pos):
-        """Helper to attach source text to a node"""
-        if not hasattr(node, 'debug_info'):
-            node.debug_info = {}
-            
-        if self.input_text:
+        """Helper to record a node's source span (text is materialized lazily)"""
+        if self.track_spans and self.input_text and node is not FAILED:
             # End pos is current token start (or length if EOF)
-            end_pos = self.cur().pos
-            node.debug_info['source'] = self.input_text[start_pos:end_pos].strip()
+            node.set_span(start_pos, self.cur().pos, self.input_text)
         return node
 
 
     def cur(self):
-        return self.tokens[self.pos]
+        tok = self.tokens[self.pos]
+        if self.depth and tok.type == "NEWLINE":
+            while self.tokens[self.pos].type == "NEWLINE":
+                self.pos += 1
+            tok = self.tokens[self.pos]
+        return tok
 
     def peek(self, offset=1):
         idx = self.pos + offset
@@ -58,8 +138,23 @@ class Parser:
         c = self.cur()
         if c.type == ttype:
             self.pos += 1
+            if ttype in ("LBRACK", "LPAREN"):
+                self.depth += 1
+            elif ttype in ("RBRACK", "RPAREN"):
+                self.depth -= 1
             return c
-        raise ParseError(f"Expected {ttype} got {c.type} ({c.value}) at {c.pos}")
+        return self._fail(f"Expected {ttype} got {c.type} ({c.value}) at {c.pos}", token=c, expected=ttype)
+
+    def _fail(self, message, token, expected=None, phrase=None, error_type=FailureObject.ERROR_SYNTAX):
+        """Record a failure (only the statement's first one is kept) and return FAILED"""
+        if self.error is None:
+            self.error = ParseError(message, token=token, expected=expected, phrase=phrase, error_type=error_type)
+            self.error_pos = self.pos
+        return FAILED
+
+    def _take_error(self):
+        error, self.error = self.error, None
+        return error
 
     def look(self, offset=0):
         i = self.pos + offset
@@ -68,19 +163,94 @@ class Parser:
         return Token("EOF","",len(self.tokens))
     
     def get_context(self, pos, window=20):
-        """Get surrounding text for error context"""
+        """Get surrounding text for error context (clipped to the line containing pos)"""
         if not self.input_text:
             return ""
-        start = max(0, pos - window)
-        end = min(len(self.input_text), pos + window)
+        line_start, line_end = self.line_index.line_bounds(pos)
+        start = max(line_start, pos - window)
+        end = min(line_end, pos + window)
         return self.input_text[start:end]
 
     def parse(self):
-        node = self.parse_command()
-        if self.cur().type != "EOF":
-            raise ParseError("Trailing tokens after command: "+str(self.cur()))
+        """Parse the input; a single statement is returned as-is, several as a ProgramNode."""
+        node = self._unwrap(self.parse_program())
+        if node is FAILED:
+            raise self._take_error()
         return node
 
+    def _unwrap(self, program):
+        if len(program.statements) == 1:
+            return program.statements[0]
+        if not program.statements:
+            return self._fail("Empty command", token=self.cur(), expected="a command")
+        return program
+
+    def parse_result(self) -> ParseResult:
+        """
+        Parse without raising. Errors are recovered from at statement boundaries
+        (panic mode) so every bad statement is reported in one pass.
+        """
+        errors = []
+        program = self.parse_program(errors)
+        if not errors:
+            node = self._unwrap(program)
+            if node is not FAILED:
+                return ParseResult.success_result(node)
+            errors.append(self.to_failure(self._take_error()))
+        return ParseResult.failure_result(errors[0], errors)
+
+    def to_failure(self, err: ParseError) -> FailureObject:
+        """Convert a ParseError into a structured FailureObject"""
+        tok = err.token or self.cur()
+        context = self.get_context(tok.pos)
+        line_index = self.line_index if self.input_text else None
+        got = tok.value.strip() or tok.type
+        if err.error_type == FailureObject.ERROR_SEMANTIC:
+            return create_semantic_failure(err.phrase or got, tok.pos, context, line_index=line_index)
+        if err.expected:
+            return create_syntax_failure(err.expected, got, tok.pos, context, line_index=line_index)
+        return FailureObject(FailureObject.ERROR_SYNTAX, got, tok.pos, str(err), context=context).locate(line_index)
+
+    def synchronize(self):
+        """Panic-mode recovery: skip to the next statement separator"""
+        self.depth = 0
+        while self.tokens[self.pos].type not in STATEMENT_SEPARATORS and self.tokens[self.pos].type != "EOF":
+            self.pos += 1
+
+    def skip_newlines(self):
+        """A statement may continue on the next line after 'then'"""
+        while self.cur().type == "NEWLINE":
+            self.pos += 1
+
+    def skip_separators(self):
+        while self.cur().type in STATEMENT_SEPARATORS:
+            self.pos += 1
+
+    def parse_program(self, errors=None):
+        """
+        Parse newline- or ';'-separated statements from the whole token stream.
+        If an errors list is given, failures are collected there and parsing
+        resumes at the next statement; nothing is raised, so a bad statement
+        costs no exception unwind. Without a list the first failure is raised.
+        """
+        statements = []
+        self.skip_separators()
+        while self.cur().type != "EOF":
+            stmt = self.parse_command()
+            if self.error is None and self.cur().type not in STATEMENT_SEPARATORS and self.cur().type != "EOF":
+                self._fail("Trailing tokens after command: "+str(self.cur()),
+                           token=self.cur(), expected="end of statement")
+            if self.error is None:
+                statements.append(stmt)
+            else:
+                if errors is None:
+                    raise self._take_error()
+                errors.append(self.to_failure(self._take_error()))
+                self.pos = self.error_pos # resume where the failure was found
+                self.synchronize()
+            self.skip_separators()
+        return ast.ProgramNode(statements)
+
     # compute keywords
     def parse_command(self):
         # First, try to parse a single command
@@ -88,42 +258,34 @@ class Parser:
         first_cmd = self.parse_single_command()
         
         # Attach debug info
-        end_pos = self.cur().pos if self.cur().type != "EOF" else len(self.input_text)
-        if not hasattr(first_cmd, 'debug_info'):
-             first_cmd.debug_info = {}
-        first_cmd.debug_info['source'] = self.input_text[start_pos:end_pos]
+        self._track(first_cmd, start_pos)
         
-        # Check if there's a "then" keyword for composition
-        if self.cur().type == "THEN":
+        # 'then' composes commands: two make a SequenceNode, more a PipelineNode
+        commands = [first_cmd]
+        while self.cur().type == "THEN" and self.error is None:
             self.eat("THEN")
-            second_cmd = self.parse_single_command()
-            seq_node = ast.SequenceNode(first_cmd, second_cmd)
-            # Sequence covers full range? Or just combined? 
-            # Ideally each sub-node has its own source.
-            return seq_node
-        
-        return first_cmd
+            self.skip_newlines()
+            start_pos = self.cur().pos
+            commands.append(self._track(self.parse_single_command(), start_pos))
+        if self.error is not None:
+            return FAILED
+        if len(commands) == 1:
+            return first_cmd
+        if len(commands) == 2:
+            return ast.SequenceNode(*commands)
+        return ast.PipelineNode(commands)
     
     def parse_single_command(self):
         """Parse a single command (without composition)"""
-        c = self.cur()
-        if c.type == "SET":
-            return self.parse_assign()
-        if c.type == "IF":
-            return self.parse_if()
-        if c.type == "PRINT":
-            self.eat("PRINT")
-            expr = self.parse_expression_or_target()
-            return ast.PrintNode(expr)
-        if c.type == "MAP":
-            return self.parse_map()
-        if c.type == "REDUCE":
-            return self.parse_reduce()
-        if c.type == "FILTER":
-            return self.parse_filter()
-        if c.type == "SORT":
-            return self.parse_sort()
-        
+        return getattr(self, COMMAND_DISPATCH.get(self.cur().type, "parse_compute_command"))()
+
+    def parse_print(self):
+        self.eat("PRINT")
+        expr = self.parse_expression_or_target()
+        return ast.PrintNode(expr)
+
+    def parse_compute_command(self):
+        """Parse '<phrase> <target>', resolving the phrase to an operation"""
         # 1. Local Resolution Loop (Cheap)
         # Try to find the longest phrase that resolves LOCALLY (semantic map, synonyms, etc.)
         curr_phrase = ""
@@ -136,7 +298,7 @@ class Parser:
         for i in range(10):
             tok = self.look(i)
             # HARD STOPS
-            if tok.type in ("NUMBER", "LBRACK", "LPAREN", "EOF", "SET", "IF"):
+            if tok.type in PHRASE_STOPS:
                 break
             
             # Check if this looks like a target variable (unsafe identifier)
@@ -151,7 +313,7 @@ class Parser:
                 has_more_safe = False
                 for j in range(i + 1, min(i + 5, 10)):
                     next_tok = self.look(j)
-                    if next_tok.type in ("NUMBER", "LBRACK", "LPAREN", "EOF", "SET", "IF"):
+                    if next_tok.type in PHRASE_STOPS:
                         break
                     if next_tok.type == "IDENTIFIER" and next_tok.value.lower() in SAFE_PHRASE_IDS:
                         has_more_safe = True
@@ -173,7 +335,6 @@ class Parser:
             curr_phrase_for_resolution += " " + part if curr_phrase_for_resolution else part
             
             # Use LOCAL resolver only
-            from .llm_layer import resolve_phrase_local
             local_op = resolve_phrase_local(curr_phrase_for_resolution)
             
             if local_op:
@@ -189,7 +350,7 @@ class Parser:
             for i in range(10):
                 tok = self.look(i)
                 # Hard Stops
-                if tok.type in ("NUMBER", "LBRACK", "LPAREN", "EOF", "SET", "IF"):
+                if tok.type in PHRASE_STOPS:
                     break
                 
                 # Soft Stop: If we hit a variable (unsafe identifier) after the first word, 
@@ -202,8 +363,7 @@ class Parser:
                 llm_len = i + 1
             
             if llm_phrase:
-                from .llm_layer import resolve_phrase_llm
-                llm_res = resolve_phrase_llm(llm_phrase)
+                llm_res = self.llm_resolver(llm_phrase)
                 
                 if llm_res and isinstance(llm_res, dict) and llm_res.get("operator"):
                     valid_op = llm_res["operator"]
@@ -243,14 +403,17 @@ class Parser:
             
             return ast.ComputeNode(valid_op, target, is_llm_resolved=(source=="AI"), llm_metadata=metadata)
             
-        raise ParseError(f"Unknown command: '{curr_phrase}' (I don't know that operation)")
+        return self._fail(f"Unknown command: '{curr_phrase}' (I don't know that operation)",
+                          token=self.cur(), phrase=curr_phrase, error_type=FailureObject.ERROR_SEMANTIC)
 
     def _resolve_op_phrase(self, phrase, default_op=None):
         """
         Helper to resolve a phrase to an operator using semantic map or LLM.
         Returns: (operator, reasoning, is_llm_resolved)
         """
-        op_res = resolve_phrase(phrase) or SEMANTIC_MAP.get(phrase.lower(), default_op)
+        if self.error is not None:
+            return None, None, False # the statement failed: no LLM call for its leftovers
+        op_res = resolve_phrase_local(phrase) or self.llm_resolver(phrase) or SEMANTIC_MAP.get(phrase.lower(), default_op)
         
         if op_res is None:
             return None, None, False
@@ -273,27 +436,36 @@ class Parser:
 
     def parse_assign(self):
         self.eat("SET")
-        var = self.eat("IDENTIFIER").value
+        var = self.eat("IDENTIFIER")
+        if var is FAILED:
+            return FAILED
         self.eat("TO")
         expr = self.parse_expression()
-        return ast.AssignNode(var, expr)
+        return ast.AssignNode(var.value, expr)
 
     def parse_if(self):
         self.eat("IF")
         left = self.parse_expression()
-        comp = self.eat("OPERATOR").value
+        comp = self.eat("OPERATOR")
         right = self.parse_expression()
         self.eat("THEN")
+        if self.error is not None:
+            return FAILED
+        self.skip_newlines()
         action = self.parse_command()
-        return ast.IfNode(left, comp, right, action)
+        return ast.IfNode(left, comp.value, right, action)
 
     def parse_map(self):
+        return self._map_head()(self.parse_expression_or_target())
+
+    def _map_head(self):
+        """Parse 'map <op> [arg] [over]'; returns a builder taking the target node"""
         self.eat("MAP")
         op_tok = self.cur()
-        if op_tok.type in ("IDENTIFIER","SUM","PRODUCT"):
+        if op_tok.type in MAP_VERBS:
             op_phrase = self.eat(op_tok.type).value.lower()
         else:
-            raise ParseError("Expected operation after map")
+            return self._fail_head("Expected operation after map", op_tok, "operation after map")
         
         arg = None
         if self.cur().type == "NUMBER":
@@ -303,61 +475,67 @@ class Parser:
             
         if self.cur().type == "OVER_ON":
             self.eat("OVER_ON")
-        target = self.parse_expression_or_target()
-        
-        # For map operations, use the operation phrase directly for known operations
-        # This ensures subtract, divide, add, multiply are passed correctly to interpreter
-        map_ops = {"add": "add", "subtract": "subtract", "minus": "subtract", 
-                   "multiply": "multiply", "product": "multiply",
-                   "divide": "divide", "division": "divide",
-                   "sum": "add"}
-        
-        if op_phrase in map_ops:
-            op = map_ops[op_phrase]
-            is_llm = False
-            reasoning = None
-        else:
-            op, reasoning, is_llm = self._resolve_op_phrase(op_phrase, default_op="OP_MAP")
-        
-        source = "AI" if is_llm else "Local"
-        metadata = {
-            "original_phrase": op_phrase,
-            "reasoning": reasoning,
-            "source": source
-        }
-        return ast.MapNode(op, arg, target, is_llm_resolved=is_llm, llm_metadata=metadata)
+
+        def build(target):
+            # For map operations, use the operation phrase directly for known operations
+            # This ensures subtract, divide, add, multiply are passed correctly to interpreter
+            map_ops = {"add": "add", "subtract": "subtract", "minus": "subtract", 
+                       "multiply": "multiply", "product": "multiply",
+                       "divide": "divide", "division": "divide",
+                       "sum": "add"}
+            
+            if op_phrase in map_ops:
+                op = map_ops[op_phrase]
+                is_llm = False
+                reasoning = None
+            else:
+                op, reasoning, is_llm = self._resolve_op_phrase(op_phrase, default_op="OP_MAP")
+            
+            source = "AI" if is_llm else "Local"
+            metadata = {
+                "original_phrase": op_phrase,
+                "reasoning": reasoning,
+                "source": source
+            }
+            return ast.MapNode(op, arg, target, is_llm_resolved=is_llm, llm_metadata=metadata)
+        return build
 
     def parse_reduce(self):
+        return self._reduce_head()(self.parse_expression_or_target())
+
+    def _reduce_head(self):
+        """Parse 'reduce <op> [over]'; returns a builder taking the target node"""
         self.eat("REDUCE")
         op_tok = self.cur()
         # Allow SUM, PRODUCT, MAX, MIN, and IDENTIFIER tokens for reduce operations
-        if op_tok.type in ("IDENTIFIER", "SUM", "PRODUCT", "MAX", "MIN"):
+        if op_tok.type in REDUCE_VERBS:
             op_phrase = self.eat(op_tok.type).value.lower()
         else:
-            raise ParseError("Expected operation after reduce")
+            return self._fail_head("Expected operation after reduce", op_tok, "operation after reduce")
         if self.cur().type == "OVER_ON":
             self.eat("OVER_ON")
-        target = self.parse_expression_or_target()
-        
-        # For reduce operations, use operation phrase directly for known operations
-        reduce_ops = {"sum": "sum", "add": "sum", "product": "product", 
-                      "multiply": "product", "max": "max", "min": "min",
-                      "maximum": "max", "minimum": "min"}
-        
-        if op_phrase in reduce_ops:
-            op = reduce_ops[op_phrase]
-            is_llm = False
-            reasoning = None
-        else:
-            op, reasoning, is_llm = self._resolve_op_phrase(op_phrase, default_op="OP_REDUCE")
-        
-        source = "AI" if is_llm else "Local"
-        metadata = {
-            "original_phrase": op_phrase,
-            "reasoning": reasoning,
-            "source": source
-        }
-        return ast.ReduceNode(op, target, is_llm_resolved=is_llm, llm_metadata=metadata)
+
+        def build(target):
+            # For reduce operations, use operation phrase directly for known operations
+            reduce_ops = {"sum": "sum", "add": "sum", "product": "product", 
+                          "multiply": "product", "max": "max", "min": "min",
+                          "maximum": "max", "minimum": "min"}
+            
+            if op_phrase in reduce_ops:
+                op = reduce_ops[op_phrase]
+                is_llm = False
+                reasoning = None
+            else:
+                op, reasoning, is_llm = self._resolve_op_phrase(op_phrase, default_op="OP_REDUCE")
+            
+            source = "AI" if is_llm else "Local"
+            metadata = {
+                "original_phrase": op_phrase,
+                "reasoning": reasoning,
+                "source": source
+            }
+            return ast.ReduceNode(op, target, is_llm_resolved=is_llm, llm_metadata=metadata)
+        return build
 
     def parse_filter(self):
         """
@@ -365,6 +543,10 @@ class Parser:
         Syntax: filter <op> <val> over|in <target>
         Example: filter < 5 over [1, 2, 3]
         """
+        return self._filter_head()(self.parse_expression_or_target())
+
+    def _filter_head(self):
+        """Parse 'filter <op> <val> [over|in]'; returns a builder taking the target node"""
         self.eat("FILTER")
         
         op = ""
@@ -375,8 +557,8 @@ class Parser:
             op = self.eat("OPERATOR").value
             comp_val = self.parse_number_literal()
         else:
-             raise ParseError("Expected operator (<, >, ==) after filter")
-             
+            return self._fail_head("Expected operator (<, >, ==) after filter", c, "comparison operator")
+
         if self.cur().type in ("OVER_ON", "IDENTIFIER"):
             # Allow 'over', 'on', 'in'
             tok = self.cur()
@@ -385,8 +567,7 @@ class Parser:
             elif tok.value.lower() == "in":
                  self.eat("IDENTIFIER") # consume 'in'
                  
-        target = self.parse_expression_or_target()
-        return ast.FilterNode(op, comp_val, target)
+        return lambda target: ast.FilterNode(op, comp_val, target)
     
     def parse_sort(self):
         """
@@ -420,23 +601,7 @@ class Parser:
         return ast.ComputeNode(op, target, is_llm_resolved=False, llm_metadata=metadata)
 
     def parse_expression_or_target(self):
-        start = self.cur().pos
-        c = self.cur()
-        node = None
-        if c.type == "LBRACK":
-            node = self.parse_list_bracket()
-        elif c.type == "NUMBER":
-            if self.look(1).type == "COMMA":
-                node = self.parse_list_shorthand()
-            else:
-                node = self.parse_expression()
-        elif c.type == "IDENTIFIER":
-            node = ast.VariableNode(self.eat("IDENTIFIER").value)
-        elif c.type == "LPAREN":
-            node = self.parse_expression()
-        else:
-            node = self.parse_expression()
-        return self._track(node, start)
+        return self._parse_operand(target=True)
 
     def parse_list_bracket(self):
         start = self.cur().pos
@@ -447,30 +612,28 @@ class Parser:
             while self.cur().type == "COMMA":
                 self.eat("COMMA"); vals.append(self.parse_expression())
         self.eat("RBRACK")
-        return self._track(ast.ListNode(vals), start)
+        return self._track(ast.list_literal(vals), start)
 
     def parse_list_shorthand(self):
         vals = [self.parse_number_literal()]
         while self.cur().type == "COMMA":
             self.eat("COMMA"); vals.append(self.parse_expression())
-        return ast.ListNode(vals)
+        return ast.list_literal(vals)
 
     def parse_number_literal(self):
         start = self.cur().pos
         tok = self.eat("NUMBER")
+        if tok is FAILED:
+            return FAILED
         if "." in tok.value:
             return self._track(ast.NumberNode(float(tok.value)), start)
         return self._track(ast.NumberNode(int(tok.value)), start)
 
     def parse_expression(self):
-        node = self.parse_term()
-        while self.cur().type == "ADDOP":
-            op = self.eat("ADDOP").value
-            right = self.parse_term()
-            node = ast.BinaryOpNode(node, op, right)
-        return node
+        return self._parse_operand(target=False)
 
     def parse_term(self):
+        """Term-level parse (factors joined by * and /); kept for API compatibility"""
         node = self.parse_factor()
         while self.cur().type == "MULOP":
             op = self.eat("MULOP").value
@@ -479,36 +642,151 @@ class Parser:
         return node
 
     def parse_factor(self):
+        """Parse a single factor (no trailing binary operators)"""
+        return self._parse_operand(target=False, factor=True)
+
+    def _parse_operand(self, target, factor=False):
+        """
+        Iterative precedence-climbing parser for expressions and command targets.
+
+        Grammar (see docs/syntax_definition.md):
+            target     := list | list-shorthand | identifier | expression
+            expression := factor { ("+"|"-"|"*"|"/") factor }   (* binds tighter)
+            factor     := number | identifier | "(" expression ")" | list
+                        | "-" factor | aggregate target | map/filter/reduce head target
+
+        Nested parentheses, unary minus and prefix chains such as
+        'map add 1 over map add 1 over ...' push frames on an explicit stack
+        instead of recursing, so input depth is not bounded by the Python
+        recursion limit. Frames are:
+            ("expr", operands, operators)  shunting-yard state of one expression
+            ("paren",)                     expects ")" once its expression is done
+            ("neg",)                       unary minus over the next factor
+            ("prefix", build)              builds map/filter/reduce/aggregate from its target
+            ("target", start)              records the source span of a target
+
+        Which target/factor alternative applies is looked up in the LL(1)
+        tables generated from the grammar (TARGET_DISPATCH / FACTOR_DISPATCH).
+        """
+        stack = []
+        want = "target" if target else ("factor" if factor else "expr")
+        while True:
+            # Descend: open constructs until a complete primary value is produced.
+            # Actions return the finished value, or what to parse next after
+            # pushing their frames.
+            if want == "expr":
+                stack.append(("expr", [], []))
+                want = "factor"
+                continue
+            ttype = self.cur().type
+            if want == "target":
+                value = TARGET_DISPATCH.get(ttype, Parser._target_expression)(self, stack)
+            else:
+                value = FACTOR_DISPATCH.get(ttype, Parser._factor_error)(self, stack)
+            if isinstance(value, str):
+                want = value
+                continue
+
+            # Ascend: hand the finished value to the enclosing frames
+            while stack:
+                frame = stack[-1]
+                kind = frame[0]
+                if kind == "expr":
+                    operands, operators = frame[1], frame[2]
+                    operands.append(value)
+                    tok = self.cur()
+                    prec = BINARY_PRECEDENCE.get(tok.type)
+                    if prec is not None:
+                        while operators and BINARY_PRECEDENCE[operators[-1][0]] >= prec:
+                            self._reduce_binary(operands, operators)
+                        operators.append((tok.type, self.eat(tok.type).value))
+                        want = "factor"
+                        break
+                    while operators:
+                        self._reduce_binary(operands, operators)
+                    value = operands[0]
+                elif kind == "paren":
+                    self.eat("RPAREN")
+                elif kind == "neg":
+                    value = ast.BinaryOpNode(ast.NumberNode(0), "-", value)
+                elif kind == "prefix":
+                    value = frame[1](value)
+                else:
+                    value = self._track(value, frame[1])
+                stack.pop()
+            else:
+                return value
+
+    # Target alternatives
+    def _target_list(self, stack):
+        start = self.cur().pos
+        return self._track(self.parse_list_bracket(), start)
+
+    def _target_shorthand(self, stack):
+        # NUMBER starts a list shorthand only when a comma follows (needs 2 tokens)
+        if self.look(1).type != "COMMA":
+            return self._target_expression(stack)
+        start = self.cur().pos
+        return self._track(self.parse_list_shorthand(), start)
+
+    def _target_variable(self, stack):
+        start = self.cur().pos
+        return self._track(ast.VariableNode(self.eat("IDENTIFIER").value), start)
+
+    def _target_expression(self, stack):
+        stack.append(("target", self.cur().pos))
+        return "expr"
+
+    # Factor alternatives
+    def _factor_number(self, stack):
+        return self.parse_number_literal()
+
+    def _factor_variable(self, stack):
+        return ast.VariableNode(self.eat("IDENTIFIER").value)
+
+    def _factor_list(self, stack):
+        return self.parse_list_bracket()
+
+    def _factor_group(self, stack):
+        self.eat("LPAREN")
+        stack.append(("paren",))
+        return "expr"
+
+    def _factor_negation(self, stack):
+        # Unary minus for negative numbers ('+' shares the ADDOP token but is not a prefix)
+        if self.cur().value != "-":
+            return self._factor_error(stack)
+        self.eat("ADDOP")
+        stack.append(("neg",))
+        return "factor"
+
+    def _factor_prefix(self, stack):
+        # Aggregates, filter, map and reduce as expressions
+        stack.append(("prefix", getattr(self, PREFIX_HEADS[self.cur().type])()))
+        return "target"
+
+    def _factor_error(self, stack):
         c = self.cur()
-        if c.type == "NUMBER":
-            return self.parse_number_literal()
-        if c.type == "IDENTIFIER":
-            return ast.VariableNode(self.eat("IDENTIFIER").value)
-        if c.type == "LPAREN":
-            self.eat("LPAREN"); node = self.parse_expression(); self.eat("RPAREN"); return node
-        if c.type == "LBRACK":
-            return self.parse_list_bracket()
-        # Handle unary minus for negative numbers
-        if c.type == "ADDOP" and c.value == "-":
-            self.eat("ADDOP")
-            operand = self.parse_factor()
-            return ast.BinaryOpNode(ast.NumberNode(0), "-", operand)
-        # Handle aggregate operations as expressions (mean, sum, product, max, min)
-        if c.type in ("SUM", "MEAN", "PRODUCT", "MAX", "MIN"):
-            return self.parse_aggregate_expression()
-        # Handle filter as expression
-        if c.type == "FILTER":
-            return self.parse_filter()
-        # Handle map as expression
-        if c.type == "MAP":
-            return self.parse_map()
-        # Handle reduce as expression
-        if c.type == "REDUCE":
-            return self.parse_reduce()
-        raise ParseError("Unexpected token in factor: "+str(c))
-    
+        return self._fail("Unexpected token in factor: "+str(c), token=c,
+                          expected="number, variable, list or '('")
+
+    def _fail_head(self, message, token, expected):
+        """_fail for a map/filter/reduce head: a builder that gives FAILED for any target"""
+        self._fail(message, token=token, expected=expected)
+        return lambda target: FAILED
+
+    @staticmethod
+    def _reduce_binary(operands, operators):
+        right = operands.pop()
+        left = operands.pop()
+        operands.append(ast.BinaryOpNode(left, operators.pop()[1], right))
+
     def parse_aggregate_expression(self):
         """Parse aggregate operations (sum, mean, product, max, min) as expressions."""
+        return self._aggregate_head()(self.parse_expression_or_target())
+
+    def _aggregate_head(self):
+        """Parse '<aggregate> [of]'; returns a builder taking the target node"""
         c = self.cur()
         op_map = {
             "SUM": "OP_SUM",
@@ -524,12 +802,13 @@ class Parser:
         if self.cur().type == "IDENTIFIER" and self.cur().value.lower() == "of":
             self.eat("IDENTIFIER")
         
-        # Parse the target (list or variable)
-        target = self.parse_expression_or_target()
-        
         metadata = {
             "original_phrase": c.value.lower(),
             "reasoning": None,
             "source": "Local"
         }
-        return ast.ComputeNode(op, target, is_llm_resolved=False, llm_metadata=metadata)
+        return lambda target: ast.ComputeNode(op, target, is_llm_resolved=False, llm_metadata=metadata)
+
+
+TARGET_DISPATCH = {tok: getattr(Parser, TARGET_ACTIONS[label]) for tok, label in TABLES.table["Target"].items()}
+FACTOR_DISPATCH = {tok: getattr(Parser, FACTOR_ACTIONS[label]) for tok, label in TABLES.table["Factor"].items()}
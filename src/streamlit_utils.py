@@ -3,8 +3,13 @@ import io
 import contextlib
 import streamlit as st
 from .lexer import lex
-from .parser import Parser
 from .interpreter import Interpreter
+from . import ast
+from .parse_cache import ParseCache
+from .vector import to_plain
+
+# Source-tracking AST cache for the visualizer (exact text repeats only)
+PIPELINE_PARSE_CACHE = ParseCache(track_source=True)
 
 @contextlib.contextmanager
 def capture_output():
@@ -35,16 +40,18 @@ def execute_with_pipeline(text: str, interp: Interpreter):
         # Store simple token repr for display
         pipeline['tokens'] = [{'type': t.type, 'value': t.value} for t in tokens]
         
-        # Stage 2: Parser
-        parser = Parser(tokens)
-        parser.set_source(text) # Provide source text for debug capture
-        ast_node = parser.parse()
+        # Stage 2: Parser (cached; source text kept for debug capture)
+        ast_node = PIPELINE_PARSE_CACHE.parse(text, tokens)
         pipeline['ast'] = repr(ast_node)
         pipeline['ast_node'] = ast_node # Store actual object for visualization
         
         # Stage 3: Interpreter
         # Retrieve source from AST metadata if available (for logic display)
         # We can inspect the node before execution if needed, but logging happens during execution
+        # The parsed tree is what gets shown; the cached optimized one is run
+        # (folding assumes pairwise summation, see run_command)
+        if interp.summation == "pairwise":
+            ast_node = PIPELINE_PARSE_CACHE.optimized(text, tokens)
         
         with capture_output() as output:
             res = interp.eval(ast_node)
@@ -61,7 +68,7 @@ def execute_with_pipeline(text: str, interp: Interpreter):
 def get_variable_state(interp: Interpreter) -> dict:
     """Extracts current variable state from interpreter."""
     if hasattr(interp, 'vars'):
-        return interp.vars.copy()
+        return {name: to_plain(value) for name, value in interp.vars.items()}
     return {}
 
 def format_ast_to_dot(node) -> str:
@@ -99,6 +106,12 @@ def format_ast_to_dot(node) -> str:
         if hasattr(n, 'name'): # VariableNode
             label += f"\\nVar: {n.name}"
             color = "#dcedc8"
+
+        if isinstance(n, ast.NumericVectorNode):
+            # Packed literal: one summary node rather than one node per element
+            dtype = "int64" if n.typecode == "q" else "float64"
+            label += f"\\n{len(n.values)} x {dtype}"
+            color = "#c8e6c9"
             
         if hasattr(n, 'llm_metadata') and n.llm_metadata:
             source = n.llm_metadata.get('source', '')
@@ -130,7 +143,15 @@ def format_ast_to_dot(node) -> str:
             dot_lines.append(f"  {child_id} [label=\"Arg: {n.arg}\" shape=ellipse fillcolor=\"#f5f5f5\"];")
             dot_lines.append(f"  {node_id} -> {child_id} [label=\"arg\"];")
 
-        if hasattr(n, 'values'): # ListNode
+        if hasattr(n, 'statements'): # ProgramNode
+            for i, stmt in enumerate(n.statements):
+                children.append((f"stmt {i + 1}", stmt))
+
+        if isinstance(n, ast.PipelineNode): # 'then' chains of three or more stages
+            for i, stage in enumerate(n.stages):
+                children.append((f"stage {i + 1}", stage))
+
+        if hasattr(n, 'values') and not isinstance(n, ast.NumericVectorNode): # ListNode
             for i, val in enumerate(n.values):
                 children.append((f"[{i}]", val))
                 
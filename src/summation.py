@@ -0,0 +1,127 @@
+"""
+summation.py
+
+Summation algorithms for sum, mean and 'reduce sum', selected with
+Interpreter(summation=...):
+
+    plain     builtin sum, left to right. Python 3.12+ compensates its
+              rounding error, which makes it more accurate than pairwise
+              on heavily cancelling input; older versions do not
+    pairwise  the default: chunks of PAIRWISE_CHUNK elements are summed by
+              builtin sum and the chunk totals are added as a balanced
+              tree, so the rounding error grows with the log of the chunk
+              count instead of the element count
+    exact     math.fsum: the correctly rounded sum (like math.fsum, it
+              raises OverflowError when a partial sum overflows)
+
+Ints are always added exactly, and a sum of only ints is an int; the
+algorithms differ only in how floats are rounded. With pairwise, a backend
+may sum a float vector itself with its own blocking (NumPy's pairwise
+summation, ParallelBackend's per-worker totals), so the last bits of a
+float total depend on the backend, and on whether numpy is installed.
+plain and exact never hand float sums to a backend and give the same bits
+everywhere; exact is the one to use for reproducible results. Each algorithm reads its
+input (a list or an iterator) once and returns (total, count), so mean
+needs a single pass.
+"""
+
+import math
+from itertools import islice
+
+# Elements summed by one builtin sum call in pairwise_sum
+PAIRWISE_CHUNK = 1024
+
+# exact_sum adds ints this large outside math.fsum, which could overflow on them
+HUGE_INT = 2**960
+
+
+def plain_sum(values):
+    if isinstance(values, list):
+        return sum(values), len(values)
+    counted = Counted(values)
+    return sum(counted), counted.n
+
+
+def pairwise_sum(values):
+    if isinstance(values, list):
+        if len(values) <= PAIRWISE_CHUNK:
+            return sum(values), len(values)
+        chunks = (values[i:i + PAIRWISE_CHUNK] for i in range(0, len(values), PAIRWISE_CHUNK))
+    else:
+        it = iter(values)
+        chunks = iter(lambda: list(islice(it, PAIRWISE_CHUNK)), [])
+    n = 0
+    partials = [] # (total, chunks in it), merged like a binary counter
+    for chunk in chunks:
+        n += len(chunk)
+        partials.append((sum(chunk), 1))
+        while len(partials) > 1 and partials[-2][1] == partials[-1][1]:
+            (a, size), (b, _) = partials.pop(-2), partials.pop()
+            partials.append((a + b, 2 * size))
+    total = 0
+    for partial, _ in reversed(partials): # smallest first
+        total = partial + total
+    return total, n
+
+
+def exact_sum(values):
+    terms = _ExactTerms(values)
+    try:
+        total = math.fsum(terms)
+    except ValueError: # inf + -inf, raised once every term is read
+        total = math.nan
+    if terms.only_ints:
+        return terms.int_total, terms.n
+    if terms.huge_total:
+        total += float(terms.huge_total) # rounded separately: fsum could overflow on it
+    return total, terms.n
+
+
+SUMMATION_ALGORITHMS = {"plain": plain_sum, "pairwise": pairwise_sum, "exact": exact_sum}
+
+
+class Counted:
+    """Iterator wrapper that counts the items drawn through it"""
+    def __init__(self, it):
+        self.it = iter(it)
+        self.n = 0
+    def __iter__(self):
+        return self
+    def __next__(self):
+        x = next(self.it)
+        self.n += 1
+        return x
+
+
+class _ExactTerms(Counted):
+    """
+    The terms for math.fsum. Ints are also added up exactly on the side, and
+    are passed on as float pieces that add up to them exactly, so a mixed sum
+    is rounded only once.
+    """
+    def __init__(self, it):
+        super().__init__(it)
+        self.int_total = 0
+        self.huge_total = 0
+        self.only_ints = True
+        self.pending = []
+
+    def __next__(self):
+        if self.pending:
+            return self.pending.pop()
+        x = next(self.it)
+        self.n += 1
+        if type(x) is not int:
+            self.only_ints = False
+            return x
+        self.int_total += x
+        if abs(x) >= HUGE_INT:
+            self.huge_total += x
+            return 0.0
+        head = float(x)
+        rest = x - int(head)
+        while rest:
+            piece = float(rest)
+            self.pending.append(piece)
+            rest -= int(piece)
+        return head
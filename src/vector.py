@@ -0,0 +1,153 @@
+"""
+vector.py
+
+NumericVector: the Interpreter's runtime value for a list whose elements
+are all ints (int64) or all floats (float64).
+
+The elements live in one contiguous buffer (an array('q'/'d') or an
+int64/float64 NumPy array produced by the NumPy backend) instead of a list
+of boxed Python numbers, so a stored dataset takes 8 bytes per element and
+its element type is known without scanning it. Operations on a vector skip
+the per-element isinstance validation that plain lists need.
+
+Vectors behave like read-only lists (len, iteration, indexing, comparison,
+'+' and '*'), and are turned into plain lists (by to_plain, which also
+materializes lazy Streams) only where values leave the Interpreter:
+Interpreter.eval, print, and compiled programs.
+"""
+
+from array import array
+from .ast import pack_numeric
+from .lazy import Stream
+
+
+class NumericVector:
+    """
+    Immutable packed numeric list. data is never modified; it may be shared
+    with the AST (packed list literals) or with other vectors.
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def pack(cls, values):
+        """A vector holding values, or None unless they are all ints or all floats that fit"""
+        packed = pack_numeric(values)
+        return None if packed is None else cls(packed)
+
+    @property
+    def typecode(self):
+        """'q' for int64 elements, 'd' for float64"""
+        data = self.data
+        if isinstance(data, array):
+            return data.typecode
+        return "q" if data.dtype.kind == "i" else "d"
+
+    @property
+    def element_type(self):
+        return int if self.typecode == "q" else float
+
+    @property
+    def nbytes(self):
+        return len(self.data) * 8
+
+    def as_array(self):
+        """The elements as an array('q'/'d'), copied only if they are held in a NumPy array"""
+        data = self.data
+        if isinstance(data, array):
+            return data
+        packed = array(self.typecode)
+        packed.frombytes(data.tobytes())
+        return packed
+
+    def tolist(self):
+        return self.data.tolist()
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        data = self.data
+        # NumPy arrays iterate as NumPy scalars; elements must be Python numbers
+        return iter(data) if isinstance(data, array) else iter(data.tolist())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return NumericVector(self.data[index])
+        item = self.data[index]
+        return item if isinstance(self.data, array) else item.item()
+
+    # List semantics for the Interpreter's generic operators
+
+    def _other(self, other):
+        if isinstance(other, NumericVector):
+            return other.tolist()
+        return other if isinstance(other, list) else None
+
+    def __eq__(self, other):
+        other = self._other(other)
+        return NotImplemented if other is None else self.tolist() == other
+
+    def __ne__(self, other):
+        other = self._other(other)
+        return NotImplemented if other is None else self.tolist() != other
+
+    def __lt__(self, other):
+        other = self._other(other)
+        return NotImplemented if other is None else self.tolist() < other
+
+    def __le__(self, other):
+        other = self._other(other)
+        return NotImplemented if other is None else self.tolist() <= other
+
+    def __gt__(self, other):
+        other = self._other(other)
+        return NotImplemented if other is None else self.tolist() > other
+
+    def __ge__(self, other):
+        other = self._other(other)
+        return NotImplemented if other is None else self.tolist() >= other
+
+    __hash__ = None
+
+    def __add__(self, other):
+        other = self._other(other)
+        return NotImplemented if other is None else self.tolist() + other
+
+    def __radd__(self, other):
+        other = self._other(other)
+        return NotImplemented if other is None else other + self.tolist()
+
+    def __mul__(self, count):
+        return self.tolist() * count
+
+    __rmul__ = __mul__
+
+    def __repr__(self):
+        return f"NumericVector({self.typecode!r}, {self.tolist()})"
+
+
+def to_plain(value):
+    """value with NumericVectors and Streams (also inside lists) replaced by plain lists"""
+    if isinstance(value, Stream):
+        value = value.materialize()
+    if isinstance(value, NumericVector):
+        return value.tolist()
+    if isinstance(value, list) and any(isinstance(v, (NumericVector, Stream, list)) for v in value):
+        return [to_plain(v) for v in value]
+    return value
+
+
+def pack_result(values, source, same_type=False):
+    """
+    values (a list result) as a vector if source was one and they pack, else
+    unchanged. same_type: values are source elements (sorted or filtered),
+    so they need no type check.
+    """
+    if isinstance(source, NumericVector):
+        if same_type:
+            return NumericVector(array(source.typecode, values))
+        return NumericVector.pack(values) or values
+    return values
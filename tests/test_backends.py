@@ -0,0 +1,167 @@
+import random
+import pytest
+from array import array
+from src.backends import NumpyBackend, ParallelBackend, PythonBackend, np
+from src import ast
+from src.interpreter import Interpreter, SemanticError
+from src.main import run_command
+from src.vector import NumericVector
+
+pytestmark = pytest.mark.skipif(np is None, reason="numpy not installed")
+
+OPS = ["OP_SUM", "OP_MEAN", "OP_PRODUCT", "OP_MAX", "OP_MIN", "OP_SORT_ASC", "OP_SORT_DESC"]
+
+def both(values, op):
+    fast = Interpreter(NumpyBackend(min_size=1)).apply_compute(op, values)
+    slow = Interpreter(PythonBackend()).apply_compute(op, values)
+    return fast, slow
+
+def test_numpy_backend_matches_python_on_ints():
+    rng = random.Random(0)
+    values = [rng.randint(-1000, 1000) for _ in range(5000)]
+    for op in OPS:
+        fast, slow = both(values, op)
+        assert fast == slow and type(fast) is type(slow), op
+
+def test_numpy_backend_matches_python_on_floats_and_mixed():
+    rng = random.Random(1)
+    values = [rng.random() for _ in range(3000)] + [2, 1, 2]
+    for op in ("OP_SORT_ASC", "OP_SORT_DESC"):
+        fast, slow = both(values, op)
+        assert fast == slow and list(map(type, fast)) == list(map(type, slow)), op
+    assert both(values + [5], "OP_MAX") == (5, 5)
+    assert type(both(values + [5], "OP_MAX")[0]) is int
+    for op in ("OP_SUM", "OP_MEAN", "OP_PRODUCT"):
+        fast, slow = both(values, op)
+        assert fast == pytest.approx(slow, rel=1e-12), op
+    # max()/min() skip a NaN unless it comes first
+    nan = float("nan")
+    for op in ("OP_MAX", "OP_MIN"):
+        assert both(values[:100] + [nan] + values[100:], op) == both(values, op)
+        fast, slow = both([nan] + values, op)
+        assert fast != fast and slow != slow
+    interp = Interpreter(NumpyBackend(min_size=1))
+    interp.vars["x"] = NumericVector.pack([rng.random() for _ in range(2048)] + [nan, 1.0])
+    assert run_command("max x", interp)[0] == run_command("sort x then max _", interp)[0] == \
+        run_command("reduce max over x", interp)[0] == 1.0
+
+def test_float_sum_bits_by_summation_and_backend():
+    rng = random.Random(7)
+    values = [rng.uniform(-1, 1) * 10**rng.randint(-8, 8) for _ in range(3000)]
+    for summation in ("plain", "pairwise", "exact"):
+        for op in ("OP_SUM", "OP_MEAN"):
+            fast = Interpreter(NumpyBackend(min_size=1), summation=summation).apply_compute(op, values)
+            slow = Interpreter(PythonBackend(), summation=summation).apply_compute(op, values)
+            if summation == "pairwise":
+                # NumPy blocks the pairwise sum its own way: only the last bits may differ
+                assert fast == pytest.approx(slow, rel=1e-12), op
+            else:
+                assert fast.hex() == slow.hex(), (summation, op)
+
+def test_numpy_backend_falls_back_for_big_ints_and_errors():
+    fast, slow = both([2**62, 2**62, 3], "OP_SUM")
+    assert fast == slow == 2**63 + 3
+    fast, slow = both([10**6] * 10, "OP_PRODUCT")
+    assert fast == slow == 10**60
+    with pytest.raises(SemanticError):
+        both([1, "a"], "OP_SUM")
+
+def test_numpy_backend_falls_back_for_big_ints_in_mixed_lists():
+    rng = random.Random(4)
+    values = [2**60 + rng.randint(0, 9) for _ in range(3000)] + [1.5]
+    assert NumpyBackend(min_size=1).as_array(values) is None # float64 would round the ints
+    for op in ("OP_MAX", "OP_MIN", "OP_SUM"):
+        fast, slow = both(values, op)
+        assert fast == slow and type(fast) is type(slow), op
+    interp = Interpreter(NumpyBackend())
+    interp.vars["x"] = values
+    assert run_command("max x", interp)[0] == run_command("sort x then max _", interp)[0] == max(values)
+
+def test_packed_literal_reaches_backend_without_unpacking():
+    interp = Interpreter()
+    assert interp.apply_compute("OP_SORT_DESC", array("q", [1, 3, 2])) == [3, 2, 1]
+    assert run_command("sort [3, 1, 2]", interp)[0] == [1, 2, 3]
+    assert run_command("max [1, 2.5]", interp)[0] == 2.5
+
+def map_both(values, op, arg):
+    node = ast.MapNode(op, arg, ast.ListNode([]))
+    fast = Interpreter(NumpyBackend(min_size=1)).apply_map(node, values)
+    slow = Interpreter(PythonBackend()).apply_map(node, values)
+    return fast, slow
+
+def filter_both(values, comp, threshold):
+    node = ast.FilterNode(comp, ast.NumberNode(threshold), ast.ListNode([]))
+    fast = Interpreter(NumpyBackend(min_size=1)).apply_filter(node, values, threshold)
+    slow = Interpreter(PythonBackend()).apply_filter(node, values, threshold)
+    return fast, slow
+
+def test_vectorized_map_matches_python():
+    rng = random.Random(2)
+    ints = [rng.randint(-1000, 1000) for _ in range(3000)]
+    floats = [rng.random() for _ in range(3000)]
+    for values in (ints, floats, array("q", ints), array("d", floats)):
+        for op in ("add", "minus", "product", "divide"):
+            for arg in (3, 2.5):
+                fast, slow = map_both(values, op, arg)
+                assert fast == slow and list(map(type, fast)) == list(map(type, slow)), (op, arg)
+    assert map_both([2**62, 1], "multiply", 4) == ([2**64, 4], [2**64, 4])
+    assert map_both(floats[:5] + [1], "add", 1)[0][-1] == 2 # int element stays int
+
+def test_vectorized_filter_matches_python():
+    rng = random.Random(3)
+    values = [rng.randint(0, 100) for _ in range(3000)] + [50.5, 7]
+    for comp in (">", "<", "==", "!=", ">=", "<="):
+        for threshold in (50, 50.5):
+            fast, slow = filter_both(values, comp, threshold)
+            assert fast == slow and list(map(type, fast)) == list(map(type, slow)), (comp, threshold)
+    assert filter_both([2**60 + 1, 1], ">", float(2**60)) == ([2**60 + 1], [2**60 + 1])
+    # float64 would round 2**53 + 1 down to the threshold
+    fast, slow = filter_both([2**53 + 1, 1.5] * 1500, ">", 2**53)
+    assert fast == slow == [2**53 + 1] * 1500
+    with pytest.raises(SemanticError):
+        filter_both([1, 2], "=>", 1)
+
+def test_map_and_filter_commands_on_packed_literals():
+    interp = Interpreter()
+    result = run_command("map add 1 over [1, 2, 3]", interp)[0]
+    assert result == [2.0, 3.0, 4.0] and isinstance(result, list)
+    assert run_command("filter > 1 over [1, 2, 3]", interp)[0] == [2, 3]
+
+def test_parallel_backend_matches_numpy():
+    rng = random.Random(4)
+    parallel = ParallelBackend(workers=3, parallel_min_size=1000)
+    vectors = [NumericVector.pack([rng.randint(-10**6, 10**6) for _ in range(5001)]),
+               NumericVector.pack([rng.uniform(-1e3, 1e3) for _ in range(5001)]),
+               NumericVector.pack([2**62] * 3000)]
+    try:
+        for values in vectors:
+            for op in ("OP_SUM", "OP_MEAN", "OP_PRODUCT", "OP_MAX", "OP_MIN"):
+                fast = Interpreter(parallel).apply_compute(op, values)
+                serial = Interpreter(NumpyBackend()).apply_compute(op, values)
+                assert fast == pytest.approx(serial, rel=1e-12) and type(fast) is type(serial), op
+            for op, arg in (("add", 3), ("divide", 2), ("multiply", 2.5)):
+                node = ast.MapNode(op, arg, ast.ListNode([]))
+                fast = Interpreter(parallel).apply_map(node, values)
+                assert fast == Interpreter(NumpyBackend()).apply_map(node, values), op
+                assert fast.typecode == Interpreter(NumpyBackend()).apply_map(node, values).typecode
+            node = ast.FilterNode(">", ast.NumberNode(0), ast.ListNode([]))
+            assert Interpreter(parallel).apply_filter(node, values, 0) == \
+                Interpreter(NumpyBackend()).apply_filter(node, values, 0)
+        assert Interpreter(parallel).apply_compute("OP_SUM", vectors[2]) == 3000 * 2**62 # exact
+        assert len(parallel._segments) == len(vectors) # each vector is copied to shared memory once
+        # NaNs opening the second and third chunks are skipped, as max()/min() skip them
+        with_nan = [rng.uniform(-1e3, 1e3) for _ in range(5001)]
+        with_nan[1667] = with_nan[3334] = float("nan")
+        for op, builtin in (("OP_MAX", max), ("OP_MIN", min)):
+            assert Interpreter(parallel).apply_compute(op, NumericVector.pack(with_nan)) == builtin(with_nan)
+    finally:
+        parallel.close()
+    assert not parallel._segments
+
+def test_parallel_backend_stays_serial_below_threshold():
+    parallel = ParallelBackend(workers=2, parallel_min_size=1000)
+    interp = Interpreter(parallel)
+    interp.vars["x"] = NumericVector.pack(list(range(999)))
+    assert run_command("sum x", interp)[0] == sum(range(999))
+    assert run_command("map add 1 over x then reduce max over _", interp)[0] == 999
+    assert parallel._pool is None and not parallel._segments
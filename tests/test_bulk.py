@@ -0,0 +1,38 @@
+import pytest
+from src.bulk import PhraseMemo, parse_bulk
+from src.lexer import lex
+from src.parser import Parser, ParseError
+
+def fake_llm(calls):
+    def resolve(phrase):
+        calls.append(phrase)
+        return {"operator": "OP_SUM", "reasoning": "test"}
+    return resolve
+
+def test_bulk_matches_serial_parse_in_order():
+    commands = [f"sum [1, 2, {i}]" for i in range(40)] + ["set x to 3 * (2 + 1)", "sort [3, 1] descending"]
+    parsed = parse_bulk(commands, workers=2, chunksize=8)
+    assert [repr(n) for n in parsed] == [repr(Parser(lex(c)).parse()) for c in commands]
+
+def test_bulk_sends_each_unresolved_phrase_once():
+    calls = []
+    commands = ["tally up [1, 2]", "sum [1]", "Tally  up [3]"] * 10
+    results = parse_bulk(commands, workers=2, chunksize=4, as_results=True, llm_resolver=fake_llm(calls))
+    assert calls == ["tally up"]
+    assert all(r.success for r in results)
+    assert results[0].ast_node.is_llm_resolved
+
+def test_bulk_errors_raise_or_become_results():
+    commands = ["sum [1, 2]", "sum (1", "sum [3]"]
+    results = parse_bulk(commands, workers=1, as_results=True)
+    assert [r.success for r in results] == [True, False, True]
+    with pytest.raises(ParseError) as exc:
+        parse_bulk(commands, workers=2, chunksize=1)
+    assert exc.value.expected == "RPAREN"
+
+def test_phrase_memo_normalizes_phrases():
+    calls = []
+    memo = PhraseMemo(fake_llm(calls))
+    memo("Tally Up")
+    memo("tally   up")
+    assert calls == ["Tally Up"]
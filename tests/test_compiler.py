@@ -0,0 +1,63 @@
+import pytest
+from src.compiler import compile_ast
+from src.interpreter import Interpreter, SemanticError
+from src.lexer import lex
+from src.optimizer import optimize
+from src.parser import Parser
+
+COMMANDS = [
+    "set y to (x + 2) * -3 / 4",
+    "sum [1, 2, x]",
+    "mean [x, 2.5]",
+    "sort data descending",
+    "map add x over data",
+    "map divide 2 over [1, 2, 3]",
+    "reduce product over data",
+    "filter >= 3 over data",
+    "if x > 2 then print x",
+    "map add 1 over data then reduce sum over _",
+    "sort [3, 1, 2] then max _",
+    "map multiply 2 over filter > 2 over data then reduce max over _",
+    "map add x over data then filter > 3 over _ then map multiply 2 over _ then reduce sum over _",
+    "map add 1 over data then map add 1 over _ then print data then sort data then max _",
+    "set a to 1\nset b to a + x\nprint (b * 2)",
+    "set r to (max data) * (max data); set data to [2]; print (max data) + x",
+]
+
+def run_both(text, x, data, opt=False):
+    node = Parser(lex(text)).parse()
+    if opt:
+        node = optimize(node)
+    results = []
+    for run in (lambda i: i.eval(node), compile_ast(node)):
+        interp = Interpreter()
+        interp.vars.update(x=x, data=data)
+        try:
+            results.append((run(interp), interp.vars))
+        except SemanticError as e:
+            results.append(str(e))
+    return results
+
+@pytest.mark.parametrize("opt", [False, True])
+@pytest.mark.parametrize("text", COMMANDS)
+def test_compiled_matches_interpreter(text, opt):
+    interpreted, compiled = run_both(text, 5, [4, 1, 3.5, 9], opt)
+    assert interpreted == compiled
+
+def test_compiled_program_is_reusable_with_new_values():
+    program = compile_ast(Parser(lex("set r to sum [x, x * 2] + y")).parse())
+    interp = Interpreter()
+    for x in range(5):
+        interp.vars.update(x=x, y=1)
+        assert program(interp) == 3 * x + 1
+
+def test_compiled_errors_match_interpreter():
+    for text in ("sum z", "map add 1 over x", "reduce sum over []", "filter > 1 over x"):
+        interpreted, compiled = run_both(text, 5, [])
+        assert interpreted == compiled and isinstance(compiled, str)
+
+def test_compiled_deep_tree_falls_back_to_interpreter():
+    node = Parser(lex("set r to " + "(" * 2000 + "1" + ")" * 2000 + " + 1")).parse()
+    assert compile_ast(node)(Interpreter()) == 2
+    node = Parser(lex("set r to " + "-" * 1500 + "2")).parse()
+    assert compile_ast(node)(Interpreter()) == 2
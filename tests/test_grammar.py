@@ -0,0 +1,40 @@
+import os
+import re
+import pytest
+from src import grammar
+from src.grammar import GRAMMAR, GrammarError, load_tables, read_grammar
+
+DOCS = os.path.join(os.path.dirname(__file__), "..", "docs", "syntax_definition.md")
+
+def test_docs_grammar_matches_parser_grammar():
+    with open(DOCS, encoding="utf-8") as f:
+        docs = f.read()
+    section = docs.split("**PARSER DISPATCH GRAMMAR**", 1)[1]
+    block = re.search(r"```ebnf\n(.*?)```", section, re.S).group(1)
+    assert block.split() == GRAMMAR.split()
+
+def test_tables_dispatch_commands_and_factors():
+    tables = load_tables(use_cache=False)
+    assert tables.table["Command"]["SET"] == "AssignCommand"
+    assert tables.table["Command"]["MAP"] == "MapCommand"
+    assert tables.table["Command"]["IDENTIFIER"] == "ComputeCommand"
+    assert tables.table["Factor"]["LPAREN"] == "Group"
+    assert tables.table["Target"]["NUMBER"] == "ListShorthand"
+    assert "NUMBER" not in tables.table["Command"]
+    assert "THEN" in tables.follow["Sequence"]
+
+def test_ordered_choice_conflicts_are_reported():
+    tables = load_tables(use_cache=False)
+    assert ("Command", "MAP", "MapCommand", "ComputeCommand") in tables.conflicts
+    assert ("Target", "NUMBER", "ListShorthand", "Expression") in tables.conflicts
+
+def test_tables_are_cached_on_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(grammar, "CACHE_DIR", str(tmp_path))
+    built = load_tables()
+    assert len(os.listdir(tmp_path)) == 1
+    monkeypatch.setattr(grammar, "build_tables", None) # a rebuild would fail
+    assert load_tables() == built
+
+def test_undefined_rule_is_rejected():
+    with pytest.raises(GrammarError):
+        read_grammar('<A> ::= "sum" <B>')
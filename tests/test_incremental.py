@@ -0,0 +1,79 @@
+import random
+from src import ast
+from src.lexer import Token, lex
+from src.parser import Parser, ParseError
+from src.incremental import TOKEN_BLOCK_SIZE, IncrementalDocument, TextEdit, relex
+
+def as_tuples(tokens):
+    return [(t.type, t.value, t.pos) for t in tokens]
+
+def test_relex_matches_full_lex():
+    rng = random.Random(0)
+    words = ["sum", "find the mean", "map", "add", "2", "over", "[1,2,3]", "x", ",", "then", "1.5", " ", "the", "mean"]
+    chars = list("abc sum mean 12.5,[]()+-*/ \nfind the ")
+    for _ in range(2000):
+        text = "".join(rng.choice(words + [" "]) for _ in range(rng.randint(0, 10)))
+        offset = rng.randint(0, len(text))
+        deleted = rng.randint(0, min(4, len(text) - offset))
+        inserted = rng.choice(words) if rng.random() < 0.3 else "".join(rng.choice(chars) for _ in range(rng.randint(0, 3)))
+        edit = TextEdit(offset, deleted, inserted)
+        result = relex(text, lex(text), edit)
+        assert as_tuples(result.tokens) == as_tuples(lex(edit.apply(text)))
+
+def test_relex_reuses_unchanged_tokens():
+    text = "set x to [" + ", ".join(str(i) for i in range(200)) + "]"
+    old = lex(text)
+    result = relex(text, old, TextEdit(0, 0, "  "))
+    # Only the tokens near the edit are rescanned; the rest are shifted
+    assert result.prefix == 0 and result.new_resume <= 2
+    assert result.tokens[-2].pos == old[-2].pos + 2
+
+def test_document_reuses_list_subtrees():
+    doc = IncrementalDocument("sum [1, 2, 3] then max _")
+    lst = doc.ast.first.target
+    doc.edit(0, 3, "mean")
+    assert doc.ast.first.op == "OP_MEAN"
+    assert doc.ast.first.target is lst
+    assert doc.text == "mean [1, 2, 3] then max _"
+
+def test_document_reports_parse_errors():
+    doc = IncrementalDocument("set x to 5")
+    doc.edit(4, 1, "1")
+    assert doc.ast is None
+    assert doc.error is not None
+    doc.edit(4, 1, "y")
+    assert isinstance(doc.ast, ast.AssignNode)
+    assert doc.ast.varname == "y"
+
+def test_edit_work_does_not_grow_with_document(monkeypatch):
+    touched = []
+    def count_writes(tok, name, value):
+        touched.append(tok)
+        object.__setattr__(tok, name, value)
+    counts = []
+    for n in (1_000, 100_000):
+        doc = IncrementalDocument("sum [" + ", ".join(str(i) for i in range(n)) + "]")
+        assert doc.ast.target is not None
+        with monkeypatch.context() as m:
+            m.setattr(Token, "__setattr__", count_writes)
+            touched.clear()
+            doc.edit(6, 0, "9")  # "sum [0, ..." -> "sum [09, ..."
+            counts.append(len(touched))
+        assert doc.tokens[-2].pos == len(doc.text) - 1
+    # Tokens created or moved by the edit: the same for both sizes, at most a block
+    assert counts[0] == counts[1] <= 3 * (TOKEN_BLOCK_SIZE + 10)
+
+def test_document_tracks_random_edits():
+    rng = random.Random(1)
+    pieces = ["[", "]", ",", "1", " ", "sum ", "then ", "_", "max ", "[1, [2, 3]]", "\n", ";"]
+    doc = IncrementalDocument("set x to [[1, 2], [3, [4, 5]]]\nsum [1, [2, 3], 4] then max _")
+    for _ in range(300):
+        offset = rng.randint(0, len(doc.text))
+        deleted = rng.randint(0, min(3, len(doc.text) - offset))
+        doc.edit(offset, deleted, "".join(rng.choice(pieces) for _ in range(rng.randint(0, 2))))
+        assert as_tuples(doc.tokens) == as_tuples(lex(doc.text))
+        try:
+            expected = repr(Parser(lex(doc.text)).parse())
+        except ParseError:
+            expected = None
+        assert (None if doc.ast is None else repr(doc.ast)) == expected
@@ -1,7 +1,8 @@
 
 import pytest
 from src import ast 
-from src.interpreter import Interpreter
+from src.backends import PythonBackend
+from src.interpreter import Interpreter, SemanticError, StageProfile
 from src.parser import Parser
 from src.lexer import lex
 
@@ -53,3 +54,75 @@ def test_sort():
     assert res == [1, 2, 3]
     res2 = run("sort descending [3, 1, 2]")
     assert res2 == [3, 2, 1]
+
+def test_run_program():
+    interp = Interpreter()
+    node = Parser(lex("set x to [1, 2, 3]\nset y to sum x; map add y over x")).parse()
+    assert interp.eval(node) == [7, 8, 9]
+    assert interp.vars["y"] == 6
+
+def test_eval_numeric_vector():
+    assert run("sum [1, 2, 3]") == 6
+    assert run("max [1.5, 2.5]") == 2.5
+    assert run("map add 1 over [1, 2] then reduce sum over _") == 5
+
+def test_eval_deep_nesting_without_recursion(capsys):
+    depth = 5000
+    assert run("set x to " + "(" * depth + "1" + " + 1)" * depth) == depth + 1
+    assert run("map add 1 over " * depth + "[1, 2]") == [depth + 1, depth + 2]
+
+def test_product_matches_left_to_right_loop():
+    def loop(values):
+        prod = 1
+        for x in values:
+            prod *= x
+        return prod
+
+    interp = Interpreter()
+    ints = [(i * 7919) % 100003 + 2 for i in range(10_000)]
+    mixed = ints[:5000] + [1.0000001] + ints[:10]
+    for values in (ints, mixed, [], [2.5, 3], [10**400, 1e-300, 0]):
+        for source in (values, iter(values)):
+            try:
+                expected = loop(values)
+            except OverflowError:
+                with pytest.raises(OverflowError):
+                    interp._compute_product(source)
+                continue
+            result = interp._compute_product(source)
+            assert result == expected and type(result) is type(expected)
+
+def test_then_passes_values_without_rewriting_the_ast():
+    interp = Interpreter()
+    interp.vars["x"] = [3, 1.5, 2]
+    node = Parser(lex("filter > 1 over x then map multiply 2 over _")).parse()
+    target = node.second.target
+    assert interp.eval(node) == interp.eval(node) == [6, 3.0, 4]
+    assert node.second.target is target and "_" not in interp.vars
+    assert run("sum [5] then map add 1 over _") == [6.0]
+    with pytest.raises(SemanticError, match="List must be numeric"):
+        run("print [1, [2]] then reduce sum over _") # no longer read as [1, 0]
+
+def test_pipeline_streams_elementwise_stages():
+    interp = Interpreter(PythonBackend())
+    interp.vars["x"] = [3, 1.5, 2, 8]
+    calls = []
+    interp.backend.fused = lambda values, stages, sink: calls.append((stages, sink)) or NotImplemented
+    text = "map add 1 over x then filter > 3 over _ then map multiply 2 over _ then reduce sum over _"
+    assert interp.eval(Parser(lex(text)).parse()) == 26
+    assert calls == [([("map", "add", 1.0), ("filter", ">", 3), ("map", "multiply", 2.0)], ("reduce", "sum"))]
+    assert run("sum [1, 2] then map add 1 over _ then filter > 3 over _") == [4]
+    assert run("map add 1 over [1, 2] then print 5 then reduce sum over _") == 5
+    with pytest.raises(SemanticError, match="Undefined variable"):
+        run("print 1 then print 2 then print _")
+
+def test_pipeline_profile_records_each_stage():
+    interp = Interpreter(profile=True)
+    interp.vars["x"] = [3, 1.5, 2, 8]
+    node = Parser(lex("map add 1 over x then filter > 3 over _ then sort _ then max _")).parse()
+    assert interp.eval(node) == 9
+    [records] = interp.profiles
+    assert all(type(r) is StageProfile and r.seconds >= 0 for r in records)
+    assert [r.stage for r in records] == node.stages
+    assert [r.rows for r in records] == [4, 2, 2, 1]
+    assert Interpreter().profiles == []
@@ -0,0 +1,69 @@
+import tracemalloc
+import pytest
+from src.compiler import compile_ast
+from src.interpreter import Interpreter, SemanticError
+from src.lazy import Stream
+from src.lexer import lex
+from src.main import run_command
+from src.parser import Parser
+from src.vector import NumericVector
+
+COMMANDS = [
+    "map add 1 over x",
+    "sum map multiply 2 over x",
+    "filter > 2 over x then reduce max over _",
+    "map add 1 over filter > 1 over x then sort _ descending",
+    "set y to map add 1 over x; print (y + [1])",
+    "print [map subtract 1 over x, 2]",
+    "if (map add 1 over x) > [1] then print 1",
+]
+
+def parse(text):
+    return Parser(lex(text)).parse()
+
+@pytest.mark.parametrize("text", COMMANDS)
+def test_lazy_matches_eager(text):
+    results = []
+    for lazy in (False, True):
+        interp = Interpreter(lazy=lazy)
+        interp.vars["x"] = [4, 1, 3.5, 9]
+        results.append((run_command(text, interp)[0], interp.vars.get("y")))
+    assert results[0] == results[1]
+
+def test_map_and_filter_return_streams():
+    interp = Interpreter(lazy=True)
+    interp.vars["x"] = [4, 1, 3]
+    node = parse("map add 1 over filter > 1 over x")
+    stream = interp.eval_value(node)
+    assert isinstance(stream, Stream) and stream.source is interp.vars["x"]
+    assert [kind for kind, _, _ in stream.stages] == ["filter", "map"]
+    assert interp.eval(node) == [5, 4] and compile_ast(node)(interp) == [5, 4]
+    run_command("set y to map add 1 over x", interp)
+    assert isinstance(interp.vars["y"], NumericVector)
+
+def test_lazy_errors_match_eager():
+    interp = Interpreter(lazy=True)
+    interp.vars["x"] = [1, 2]
+    interp.vars["e"] = []
+    for text, message in (("map divide 0 over x", "Division by zero"),
+                          ("reduce sum over filter > 5 over x", "Cannot reduce empty list"),
+                          ("sum map add 1 over e", "List must be non-empty"),
+                          ("map add 1 over 3", "Map target must be a list")):
+        with pytest.raises(SemanticError, match=message):
+            interp.eval(parse(text))
+    assert interp.eval(parse("map divide 0 over e")) == []
+
+def test_stream_input_runs_in_constant_memory():
+    def numbers(n):
+        for i in range(n):
+            yield i
+
+    interp = Interpreter(lazy=True)
+    node = parse("map multiply 3 over filter > 10 over data then reduce sum over _")
+    interp.vars["data"] = Stream(numbers(200_000))
+    tracemalloc.start()
+    result = interp.eval(node)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert result == 3 * sum(range(11, 200_000))
+    assert peak < 100_000 # a list of the input alone takes several MB
@@ -43,3 +43,14 @@ def test_lex_unknown():
     # So '?' matches UNKNOWN and is ignored.
     assert len(tokens) == 1 # Just EOF
     assert tokens[0].type == "EOF"
+
+def test_line_index_lookup():
+    text = "set x to 5\nsum [1, 2]\n\nprint x"
+    tokens = lex(text)
+    index = tokens.line_index
+    assert index is tokens.line_index # built once
+    assert index.line_col(0) == (1, 1)
+    assert index.line_col(text.index("sum")) == (2, 1)
+    assert index.line_col(text.index("2]")) == (2, 9)
+    assert index.line_col(text.index("print")) == (4, 1)
+    assert index.line_bounds(text.index("[")) == (11, 21)
@@ -0,0 +1,228 @@
+import pytest
+from src import ast
+from src.backends import PythonBackend
+from src.interpreter import Interpreter, SemanticError
+from src.lexer import lex
+from src.optimizer import (
+    eliminate_common_subexpressions, fold_constants, fuse_loops, optimize, rewrite_algebra,
+)
+from src.parser import Parser
+
+def parse(text):
+    return Parser(lex(text)).parse()
+
+def run_both(text, data, backend=None):
+    results = []
+    for opt in (False, True):
+        interp = Interpreter(backend)
+        interp.vars["data"] = data
+        node = parse(text)
+        try:
+            results.append(interp.eval(optimize(node) if opt else node))
+        except SemanticError as e:
+            results.append(str(e))
+    return results
+
+PIPELINES = [
+    "map add 2 over map multiply 3 over filter > 5 in data then reduce sum over _",
+    "map subtract 1 over filter <= 50 over data",
+    "filter > 10 over map divide 4 over data then sort _ descending",
+    "mean (map add 1 over filter != 3 over data)",
+    "map multiply 2 over data then reduce max over _",
+    "map divide 0 over filter > 1000 over data",
+    "map divide 0 over filter > 1 over data",
+    "reduce min over filter > 1000 over data",
+]
+
+def test_fuse_nested_and_then_chains():
+    node = fuse_loops(parse(PIPELINES[0]))
+    assert isinstance(node, ast.FusedLoopNode)
+    assert [s[:2] for s in node.stages] == [("filter", ">"), ("map", "multiply"), ("map", "add")]
+    assert node.sink == ("reduce", "sum")
+    assert [n.op for n in node.logged] == ["add", "multiply"]
+    assert [n.op for n in node.after] == ["sum"]
+    # A single operation is left alone
+    assert isinstance(fuse_loops(parse("map add 1 over data")), ast.MapNode)
+
+@pytest.mark.parametrize("backend", [None, PythonBackend()])
+@pytest.mark.parametrize("text", PIPELINES)
+def test_fused_pipelines_match_unfused(text, backend):
+    data = [1, 8, 3, 9, 12, 4.5, 40, 3, 77]
+    plain, fused = run_both(text, data, backend)
+    assert plain == fused
+    assert type(plain) is type(fused)
+
+def run_both_output(text, data, capsys):
+    outputs = []
+    for opt in (False, True):
+        interp = Interpreter()
+        interp.vars["data"] = data
+        interp.vars["zero"] = 0
+        node = parse(text)
+        try:
+            result = interp.eval(optimize(node) if opt else node)
+        except (SemanticError, ZeroDivisionError) as e:
+            result = str(e)
+        outputs.append((result, capsys.readouterr().out))
+    return outputs
+
+def test_fused_errors_match_unfused(capsys):
+    assert run_both("map add 1 over filter > 1 over data", 5) == \
+        ["Filter target must be a list, got 5"] * 2
+    assert run_both("sum map add 1 over data", [1, "x"]) == ["List must be numeric"] * 2
+    # Stages after 'then' report their resolution only once the loop has run
+    capsys.readouterr()
+    for text, data in [("filter > 3 in data then mean _", 5),
+                       ("map divide 2 over data then reduce sum over _", 5),
+                       ("map divide zero over data then reduce sum over _", [1, 2]),
+                       ("sum map divide zero over data", [1, 2]),
+                       ("map add 1 over data then map multiply 2 over _", [1, 2])]:
+        plain, fused = run_both_output(text, data, capsys)
+        assert plain == fused, text
+
+def test_optimize_does_not_mutate_parsed_tree():
+    node = parse("map add 1 over map add 2 over [1, 2, 3]")
+    before = repr(node)
+    optimize(node)
+    assert repr(node) == before
+
+def test_fuse_deep_chain_without_recursion():
+    text = "map add 1 over " * 3000 + "[1, 2]"
+    node = fuse_loops(parse(text))
+    assert len(node.stages) == 3000
+    assert Interpreter().eval(node) == [3001.0, 3002.0]
+
+FOLDABLE = [
+    "if 5 > 3 then print 99",
+    "if 2 > 3 then print 1; print 5",
+    "print (sum [1, 2, 3]) * 2",
+    "set x to [1 + 1, 2 * 3]; print x",
+    "sum [1, 2, 3] then map add 1 over _",
+    "map add 2 over filter > 1 over [1, 2.5, 3]",
+    "print [sum [1, 2], 3, data]",
+    "print 1; set z to map divide 0 over [1, 2]",
+    "print 1; print 1 / 0",
+    "mean [1 - 1, 2] then map divide 0 over _",
+    "reduce max over []",
+]
+
+def run_printed(text, opt, capsys):
+    interp = Interpreter()
+    interp.vars["data"] = 7
+    node = parse(text)
+    try:
+        out = interp.eval(fold_constants(node) if opt else node)
+    except (SemanticError, ZeroDivisionError) as e:
+        out = repr(e)
+    return out, capsys.readouterr().out, interp.vars
+
+@pytest.mark.parametrize("text", FOLDABLE)
+def test_folded_programs_match_unfolded(text, capsys):
+    plain = run_printed(text, False, capsys)
+    folded = run_printed(text, True, capsys)
+    assert plain == folded
+    assert type(plain[0]) is type(folded[0])
+
+def test_fold_constants_shapes():
+    assert repr(fold_constants(parse("print 2 * 3 + 1"))) == "PrintNode(NumberNode(7))"
+    assert repr(fold_constants(parse("if 5 > 3 then print 99"))) == "PrintNode(NumberNode(99))"
+    assert repr(fold_constants(parse("if 2 > 3 then print 1; print 5"))) == \
+        "ProgramNode([PrintNode(NumberNode(5))])"
+    # Partial evaluation around a variable
+    assert repr(fold_constants(parse("print [1, x + 2 * 3]"))) == \
+        "PrintNode(ListNode([NumberNode(1), BinaryOpNode(VariableNode(x) + NumberNode(6))]))"
+    # Folded operations keep reporting their resolution
+    folded = fold_constants(parse("sum [1, 2, 3] then map add 1 over _"))
+    assert isinstance(folded, ast.FoldedNode)
+    assert [n.op for n in folded.logged] == ["OP_SUM", "add"]
+
+def test_failing_constants_are_not_folded():
+    node = parse("set z to map divide 0 over [1, 2]")
+    assert fold_constants(node) is node
+    with pytest.raises(SemanticError, match="Division by zero"):
+        Interpreter().eval(fold_constants(node))
+
+REWRITABLE = [
+    "sort x then max _",
+    "sort x descending then reduce min over _",
+    "sort x then sort _ descending",
+    "sum map add k over x",
+    "reduce sum over map multiply k over x",
+    "map subtract 2 over x then mean _",
+    "max map divide k over x",
+    "min map multiply k over x",
+]
+REWRITE_DATA = [[3, 1, 2], [2.5, -1.0, 7.25], [1, 2.0], [0, -0.0], [], ["a", "b"], 4, list(range(-3000, 3000, 7))]
+
+@pytest.mark.parametrize("backend", [None, PythonBackend()])
+@pytest.mark.parametrize("text", REWRITABLE)
+def test_rewrites_match_original(text, backend, capsys):
+    node = parse(text)
+    rewritten = rewrite_algebra(node)
+    assert isinstance(rewritten, ast.RewrittenNode)
+    for x in REWRITE_DATA:
+        for k in (2, 2.0, 0.5, 0, "s"):
+            outputs = []
+            for tree in (node, rewritten):
+                interp = Interpreter(backend)
+                interp.vars.update(x=x, k=k)
+                try:
+                    outputs.append(repr(interp.eval(tree)))
+                except (SemanticError, TypeError) as e:
+                    outputs.append(repr(e))
+                outputs.append(capsys.readouterr().out)
+            assert outputs[:2] == outputs[2:], (x, k)
+
+def test_rewrite_log_and_rule_selection():
+    fired = []
+    rewrite_algebra(parse("sort x then max _"), log=lambda name, node: fired.append(name))
+    assert fired == ["extremum_of_sort"]
+    optimize(parse("sort x then max _"), log=lambda name, node: fired.append(name))
+    assert fired == ["extremum_of_sort"] * 2
+    # Rules can be restricted; chains without a rule are left alone
+    node = parse("sort x then max _")
+    assert rewrite_algebra(node, rules={}) is node
+    node = parse("map add 1 over x then sort _")
+    assert rewrite_algebra(node) is node
+
+class CountingBackend(PythonBackend):
+    def __init__(self):
+        self.calls = 0
+    def compute(self, op, values):
+        self.calls += 1
+        return NotImplemented
+
+CSE_PROGRAMS = [
+    "print (sum x) / (mean x) + (sum x)",
+    "if max x > 2 then print max x",
+    "if max x > 100 then print max x",
+    "set r to (sum x) * (sum x); set x to [1]; print (sum x) + (sum x)",
+    "print [map add 1 over x, map add 1 over x]",
+    "print (sum x) + (sum [sum x, 1])",
+]
+
+@pytest.mark.parametrize("text", CSE_PROGRAMS)
+def test_cse_matches_original(text, capsys):
+    outputs = []
+    for tree in (parse(text), eliminate_common_subexpressions(parse(text))):
+        interp = Interpreter()
+        interp.vars["x"] = [1, 2, 3]
+        outputs.append((interp.eval(tree), capsys.readouterr().out, interp.vars))
+    assert outputs[0] == outputs[1]
+
+def test_cse_evaluates_repeats_once_per_run():
+    backend = CountingBackend()
+    interp = Interpreter(backend)
+    tree = eliminate_common_subexpressions(parse("print (sum x) / (mean x) + (sum x)"))
+    interp.vars["x"] = [1, 2, 3]
+    assert interp.eval(tree) == 9.0
+    assert backend.calls == 2
+    # Shared values do not outlive a run
+    interp.vars["x"] = [4]
+    assert interp.eval(tree) == 5.0
+    assert backend.calls == 4
+
+def test_cse_leaves_effects_and_then_stages_alone():
+    for text in ("print x; print x", "sum x then max _", "print (sum x) + (mean x)"):
+        node = parse(text)
+        assert eliminate_common_subexpressions(node) is node
@@ -0,0 +1,64 @@
+from src import ast
+from src.interpreter import Interpreter
+from src.parse_cache import ParseCache, token_key
+from src.lexer import lex
+
+def test_cache_shares_ast_across_spellings():
+    cache = ParseCache()
+    first = cache.parse("sum [1, 2, 3]")
+    assert cache.parse("sum [1, 2, 3]") is first
+    assert cache.parse("SUM   [1,2,3]") is first
+    info = cache.info()
+    assert (info.hits, info.misses) == (2, 1)
+
+def test_cache_optimizes_each_entry_once():
+    cache = ParseCache()
+    parsed = cache.parse("sort x then max _")
+    optimized = cache.optimized("sort x then max _")
+    assert isinstance(optimized, ast.RewrittenNode)
+    assert cache.optimized("SORT x then max _") is optimized
+    assert cache.parse("sort x then max _") is parsed
+    interp = Interpreter()
+    interp.vars["x"] = [3, 1, 2]
+    assert interp.eval(optimized) == interp.eval(parsed) == 3
+
+def test_cache_keeps_identifier_case():
+    assert token_key(lex("sum Sales")) != token_key(lex("sum sales"))
+
+def test_cache_evicts_least_recently_used():
+    cache = ParseCache(maxsize=2)
+    a = cache.parse("sum [1]")
+    cache.parse("sum [2]")
+    cache.parse("sum [1]")
+    cache.parse("sum [3]")
+    assert cache.info().currsize == 2
+    assert cache.parse("sum [1]") is a
+    assert cache.info().misses == 3
+
+def test_sequence_evaluation_does_not_mutate_ast():
+    cache = ParseCache()
+    node = cache.parse("map add 1 over [1, 2] then reduce sum over _")
+    interp = Interpreter()
+    assert interp.eval(node) == 5
+    assert isinstance(node.second.target, ast.VariableNode)
+    assert node.second.target.name == "_"
+    assert interp.eval(cache.parse("map add 1 over [1, 2] then reduce sum over _")) == 5
+    assert "_temp_composition" not in interp.vars
+
+def test_cache_is_safe_across_threads():
+    import threading
+    cache = ParseCache(maxsize=4)
+    errors = []
+    def work(offset):
+        try:
+            for i in range(300):
+                n = (i + offset) % 9
+                assert cache.parse(f"sum [{n}]").target.values[0] == n
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=work, args=(t,)) for t in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == [] and cache.info().currsize <= 4
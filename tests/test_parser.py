@@ -52,3 +52,123 @@ def test_parse_map_simple():
 def test_parse_error():
     with pytest.raises(Exception):
         parse("set 1 to 2") # Syntax error, expected Identifier
+
+def test_get_context_stays_on_line():
+    text = "set x to 5\nsum nums\nprint x"
+    parser = Parser(lex(text))
+    parser.set_source(text)
+    pos = text.index("nums")
+    assert parser.get_context(pos) == "sum nums"
+    assert parser.line_col(pos) == (2, 5)
+
+def test_failure_helpers_report_line_and_column():
+    from src.parse_result import create_syntax_failure
+    text = "set x to 5\nset 1 to 2"
+    tokens = lex(text)
+    failure = create_syntax_failure("IDENTIFIER", "1", text.index("1 to"), "set 1 to 2", line_index=tokens.line_index)
+    assert (failure.line, failure.column) == (2, 5)
+    assert "line 2, column 5" in failure.format_error()
+
+def test_parse_program_statements():
+    node = parse("set x to [1, 2,\n 3]\nsum x; print x\n")
+    assert isinstance(node, ast.ProgramNode)
+    assert [type(s) for s in node.statements] == [ast.AssignNode, ast.ComputeNode, ast.PrintNode]
+    assert len(node.statements[0].expr.values) == 3
+
+def test_parse_single_statement_unwrapped():
+    node = parse("\n sum [1, 2]\n\n")
+    assert isinstance(node, ast.ComputeNode)
+
+def test_parse_then_continues_on_next_line():
+    node = parse("if 5 > 3 then\n print 1")
+    assert isinstance(node, ast.IfNode)
+    assert isinstance(node.action, ast.PrintNode)
+
+def test_nodes_are_slotted_with_lazy_metadata():
+    node = parse("sum [1, 2, x]")
+    for n in [node, node.target] + node.target.values:
+        assert not hasattr(n, "__dict__")
+        assert n._debug_info is None # nothing stored without source tracking
+    assert node.llm_metadata["source"] == "Local"
+    bare = ast.ReduceNode("sum", ast.VariableNode("x"))
+    assert bare._llm_metadata is None
+    bare.llm_metadata["reasoning"] = "test"
+    assert bare.llm_metadata == {"reasoning": "test"}
+
+def test_constant_lists_are_packed():
+    node = parse("sum [1, 2, 3]")
+    assert isinstance(node.target, ast.NumericVectorNode)
+    assert node.target.typecode == "q"
+    assert list(node.target.values) == [1, 2, 3]
+    assert parse("sum 1.5, 2.5").target.typecode == "d"
+    # mixed int/float and non-literal elements keep one node per element
+    assert type(parse("sum [1, 2.5]").target) is ast.ListNode
+    assert type(parse("sum [1, x]").target) is ast.ListNode
+
+def test_parse_then_chain():
+    node = parse("map add 1 over x then filter > 2 over _ then\n sort _ then max _")
+    assert isinstance(node, ast.PipelineNode)
+    assert [type(s) for s in node.stages] == [ast.MapNode, ast.FilterNode, ast.ComputeNode, ast.ComputeNode]
+    assert isinstance(parse("sort x then max _"), ast.SequenceNode)
+    node = parse("if 5 > 3 then print 1 then sum _ then print 2")
+    assert isinstance(node.action, ast.PipelineNode) and len(node.action.stages) == 3
+
+def test_spans_materialize_source_on_demand():
+    text = "sum [1, 2, 3] then max _"
+    node = Parser(lex(text)).parse()
+    target = node.first.target
+    assert target._debug_info is None
+    assert target.span == (4, 14)
+    assert target.debug_info["source"] == "[1, 2, 3]"
+    assert node.first.source_text() == "sum [1, 2, 3]"
+
+def test_span_tracking_can_be_disabled():
+    node = Parser(lex("sum [1, 2, 3]"), track_spans=False).parse()
+    assert node.span is None and node.target.span is None
+    assert node.debug_info == {}
+
+def test_parse_result_success():
+    from src.parse_result import ParseResult
+    result = Parser(lex("sum [1, 2]; print 3")).parse_result()
+    assert isinstance(result, ParseResult)
+    assert result.success and result.errors == []
+    assert isinstance(result.ast_node, ast.ProgramNode)
+
+def test_parse_result_collects_every_error():
+    text = "set x to 5\nset 1 to 2\nprint x\nmap over [1]\nsum 1 2"
+    result = Parser(lex(text)).parse_result()
+    assert not result.success
+    assert result.ast_node is None
+    assert [(e.line, e.token) for e in result.errors] == [(2, "1"), (4, "over"), (5, "2")]
+    assert result.error is result.errors[0]
+    assert result.errors[0].error_type == "syntax_error"
+    assert result.errors[0].context == "set 1 to 2"
+
+def test_statement_parsers_record_failures_instead_of_raising():
+    from src.parser import FAILED
+    parser = Parser(lex("filter over [1] then sum _"))
+    assert parser.parse_command() is FAILED
+    assert "Expected operator" in str(parser.error)
+    errors = []
+    program = Parser(lex("set 1 to 2; print 3; sum (1; frobnicate 2")).parse_program(errors)
+    assert len(program.statements) == 1
+    assert [e.token for e in errors] == ["1", ";", "frobnicate"]
+
+def test_deeply_nested_parentheses_parse():
+    depth = 5000
+    node = parse("set x to " + "(" * depth + "1" + " + 1)" * depth)
+    assert isinstance(node.expr, ast.BinaryOpNode)
+
+def test_long_map_chain_parses():
+    node = parse("map add 1 over " * 5000 + "[1, 2]")
+    for _ in range(4999):
+        node = node.target
+    assert isinstance(node, ast.MapNode)
+    assert isinstance(node.target, ast.NumericVectorNode)
+
+def test_unary_minus_and_precedence():
+    node = parse("set z to -2 * 3 - 4 / 2")
+    expr = node.expr
+    assert expr.op == "-"
+    assert expr.left.op == "*" and expr.left.left.op == "-"
+    assert expr.right.op == "/"
@@ -0,0 +1,10 @@
+from src.lexer import lex
+from src.parser import Parser
+from src.streamlit_utils import format_ast_to_dot
+
+def test_dot_shows_every_pipeline_stage():
+    dot = format_ast_to_dot(Parser(lex("sum [1,2] then map add 1 over _ then max _")).parse())
+    assert "PipelineNode" in dot
+    for i in (1, 2, 3):
+        assert f'label="stage {i}"' in dot
+    assert "Op: OP_SUM" in dot and "Op: add" in dot and "Op: OP_MAX" in dot
@@ -0,0 +1,50 @@
+import math
+import random
+from fractions import Fraction
+import pytest
+from src.backends import PythonBackend
+from src.interpreter import Interpreter
+from src.main import run_command
+from src.summation import PAIRWISE_CHUNK, SUMMATION_ALGORITHMS, exact_sum, pairwise_sum
+
+def exact(values):
+    return float(sum(map(Fraction, values)))
+
+@pytest.mark.parametrize("name", sorted(SUMMATION_ALGORITHMS))
+def test_algorithms_read_lists_and_iterators_alike(name):
+    rng = random.Random(0)
+    algorithm = SUMMATION_ALGORITHMS[name]
+    for values in ([], [3, 4], [rng.randint(-10**20, 10**20) for _ in range(3000)],
+                   [rng.uniform(-1, 1) * 10**rng.randint(-8, 8) for _ in range(3000)] + [7]):
+        total, n = algorithm(values)
+        assert (total, n) == algorithm(iter(values)) and n == len(values)
+        if all(type(x) is int for x in values):
+            assert total == sum(values) and type(total) is int # ints are always exact
+
+def test_exact_sum_is_correctly_rounded():
+    rng = random.Random(1)
+    values = [rng.uniform(-1, 1) * 10**rng.randint(-20, 20) for _ in range(5000)] + [2**70 + 1]
+    assert exact_sum(values)[0] == exact(values)
+    assert exact_sum([1e16, 1.0, -1e16] * 1000)[0] == 1000.0
+    assert math.isnan(exact_sum([math.inf, -math.inf])[0])
+
+def test_pairwise_sum_beats_left_to_right_accumulation():
+    values = [0.1] * (100 * PAIRWISE_CHUNK)
+    naive = 0.0
+    for x in values:
+        naive += x
+    assert abs(pairwise_sum(values)[0] - exact(values)) < abs(naive - exact(values))
+
+def test_interpreter_summation_is_selectable():
+    values = [1e16, 1.0, -1e16] * 1000
+    results = {}
+    for name in SUMMATION_ALGORITHMS:
+        interp = Interpreter(PythonBackend(), summation=name)
+        interp.vars["x"] = values
+        results[name] = [run_command(text, interp)[0] for text in
+                         ("sum x", "reduce sum over x", "mean x", "map add 0 over x then reduce sum over _")]
+        assert results[name][0] == results[name][1] == results[name][3]
+        assert results[name][2] == results[name][0] / len(values)
+    assert results["exact"][0] == 1000.0
+    with pytest.raises(ValueError):
+        Interpreter(summation="kahan")
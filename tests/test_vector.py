@@ -0,0 +1,61 @@
+import sys
+import pytest
+from src.backends import PythonBackend
+from src.interpreter import Interpreter, SemanticError
+from src.lexer import lex
+from src.main import run_command
+from src.parser import Parser
+from src.vector import NumericVector, to_plain
+
+def parse(text):
+    return Parser(lex(text)).parse()
+
+def test_assignment_packs_numeric_lists():
+    interp = Interpreter()
+    run_command("set x to [1, 2, 3]; set y to [1, 2.5]; set z to map divide 2 over x", interp)
+    x, y, z = interp.vars["x"], interp.vars["y"], interp.vars["z"]
+    assert isinstance(x, NumericVector) and x.typecode == "q" and x == [1, 2, 3]
+    assert isinstance(y, list) # mixed ints and floats keep their exact types
+    assert isinstance(z, NumericVector) and z.element_type is float and z == [0.5, 1.0, 1.5]
+
+@pytest.mark.parametrize("backend", [None, PythonBackend()])
+def test_operations_on_vectors_match_lists(backend):
+    commands = ["sum x", "mean x", "max x", "sort x descending", "map multiply 3 over x",
+                "filter > 2 over x", "reduce product over x", "print (x + [9])", "if x > [2] then print 1",
+                "map add 1 over filter > 1 over x then reduce max over _"]
+    for text in commands:
+        results = []
+        for value in ([4, 1, 3], NumericVector.pack([4, 1, 3])):
+            interp = Interpreter(backend)
+            interp.vars["x"] = value
+            result = run_command(text, interp)[0]
+            results.append((result, type(result)))
+        assert results[0] == results[1], text
+
+def test_vectors_become_lists_at_the_boundary(capsys):
+    interp = Interpreter()
+    interp.vars["x"] = NumericVector.pack([1.5, 2.5])
+    node = parse("map add 1 over x")
+    assert isinstance(interp.eval_value(node), NumericVector)
+    assert interp.eval(node) == [2.5, 3.5] and isinstance(interp.eval(node), list)
+    capsys.readouterr()
+    interp.eval(parse("print [x, 1]"))
+    assert capsys.readouterr().out == "[[1.5, 2.5], 1]\n"
+    assert to_plain([interp.vars["x"], [interp.vars["x"]]]) == [[1.5, 2.5], [[1.5, 2.5]]]
+
+def test_vector_errors_match_lists():
+    interp = Interpreter()
+    interp.vars["e"] = NumericVector.pack([1.0])[0:0]
+    for text, message in (("sum e", "List must be non-empty"), ("reduce max over e", "Cannot reduce empty list")):
+        with pytest.raises(SemanticError, match=message):
+            interp.eval(parse(text))
+    interp.vars["x"] = NumericVector.pack([1, 2])
+    with pytest.raises(SemanticError, match="Division by zero"):
+        interp.eval(parse("map divide 0 over x"))
+
+def test_vector_storage_is_compact():
+    values = [float(i) for i in range(10_000)]
+    vector = NumericVector.pack(values)
+    boxed = sys.getsizeof(values) + sum(sys.getsizeof(v) for v in values)
+    assert vector.nbytes == 8 * len(values)
+    assert boxed > 3 * vector.nbytes